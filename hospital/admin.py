@@ -1,10 +1,23 @@
 from django.contrib import admin
-from .models import Doctor, Patient, Appointment, PatientDischargeDetails, AdminApproval
+from django.utils import timezone
+from .models import Doctor, Patient, Appointment, PatientDischargeDetails, AdminApproval, ProfileImageJob, ImportJob
+from . import approvals, billing, fragments, search, stats
+
+class IndexedSearchMixin:
+    """Answer the changelist search box from the full-text index instead of LIKE scans over joined tables"""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=search.matching(self.search_kind, search_term)), False
 
 # Register your models here.
-class DoctorAdmin(admin.ModelAdmin):
+class DoctorAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_kind = search.DOCTOR
     list_display = ('get_name', 'department', 'mobile', 'status', 'is_approved', 'get_id')
     list_filter = ('department', 'status', 'is_approved')
+    list_select_related = ('user',)
     search_fields = ('user__first_name', 'user__last_name', 'user__username', 'mobile')
     readonly_fields = ('get_id', 'approved_by', 'approved_date')
     actions = ['approve_doctors', 'reject_doctors']
@@ -18,7 +31,7 @@ class DoctorAdmin(admin.ModelAdmin):
     get_id.short_description = 'User ID'
     
     def approve_doctors(self, request, queryset):
-        queryset.update(is_approved=True)
+        approvals.approve_doctors(queryset.values_list('id', flat=True), request.user)
     approve_doctors.short_description = "Approve selected doctors"
     
     def reject_doctors(self, request, queryset):
@@ -27,9 +40,11 @@ class DoctorAdmin(admin.ModelAdmin):
 
 admin.site.register(Doctor, DoctorAdmin)
 
-class PatientAdmin(admin.ModelAdmin):
+class PatientAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_kind = search.PATIENT
     list_display = ('get_name', 'mobile', 'symptoms', 'assignedDoctor', 'admitDate', 'status', 'get_id')
     list_filter = ('status', 'admitDate', 'assignedDoctor')
+    list_select_related = ('user', 'assignedDoctor__user')
     search_fields = ('user__first_name', 'user__last_name', 'user__username', 'mobile', 'symptoms')
     readonly_fields = ('get_id', 'admitDate')
     
@@ -43,23 +58,38 @@ class PatientAdmin(admin.ModelAdmin):
 
 admin.site.register(Patient, PatientAdmin)
 
-class AppointmentAdmin(admin.ModelAdmin):
-    list_display = ('patientName', 'doctorName', 'appointmentDate', 'status', 'is_accepted_by_doctor', 'get_id')
+class AppointmentAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_kind = search.APPOINTMENT
+    list_display = ('get_patient_name', 'get_doctor_name', 'appointmentDate', 'status', 'is_accepted_by_doctor', 'get_id')
     list_filter = ('status', 'appointmentDate', 'is_accepted_by_doctor')
-    search_fields = ('patientName', 'doctorName', 'description')
+    list_select_related = ('patient__user', 'doctor__user')
+    search_fields = ('patient__user__first_name', 'patient__user__last_name', 'doctor__user__first_name', 'doctor__user__last_name', 'description')
     readonly_fields = ('appointmentDate', 'accepted_date')
+    raw_id_fields = ('patient', 'doctor')
     actions = ['approve_appointments', 'mark_doctor_accepted']
     
+    def get_patient_name(self, obj):
+        return obj.patient.get_name if obj.patient else None
+    get_patient_name.short_description = 'Patient'
+    
+    def get_doctor_name(self, obj):
+        return obj.doctor.get_name if obj.doctor else None
+    get_doctor_name.short_description = 'Doctor'
+    
     def get_id(self, obj):
         return obj.id
     get_id.short_description = 'Appointment ID'
     
     def approve_appointments(self, request, queryset):
-        queryset.update(status=True)
+        approved = queryset.filter(status=False).update(status=True, updated_at=timezone.now())
+        stats.adjust(pending_appointments=-approved, approved_appointments=approved)
+        # update() sends no signals, so cached fragments cannot know which rows changed
+        fragments.bump_all()
     approve_appointments.short_description = "Approve selected appointments"
     
     def mark_doctor_accepted(self, request, queryset):
-        queryset.update(is_accepted_by_doctor=True)
+        queryset.update(is_accepted_by_doctor=True, updated_at=timezone.now())
+        fragments.bump_all()
     mark_doctor_accepted.short_description = "Mark as accepted by doctor"
 
 admin.site.register(Appointment, AppointmentAdmin)
@@ -69,10 +99,17 @@ class PatientDischargeDetailsAdmin(admin.ModelAdmin):
     list_filter = ('admitDate', 'releaseDate')
     search_fields = ('patientName', 'assignedDoctorName', 'mobile')
     readonly_fields = ('get_id',)
+    raw_id_fields = ('patient',)
+    actions = ['recalculate_bills']
     
     def get_id(self, obj):
         return obj.id
     get_id.short_description = 'Discharge ID'
+    
+    def recalculate_bills(self, request, queryset):
+        run = billing.bill(queryset)
+        self.message_user(request, f'{run.updated} of {run.checked} bills recalculated.')
+    recalculate_bills.short_description = "Recalculate bills from the department tariffs"
 
 admin.site.register(PatientDischargeDetails, PatientDischargeDetailsAdmin)
 
@@ -84,7 +121,7 @@ class AdminApprovalAdmin(admin.ModelAdmin):
     actions = ['approve_admins', 'reject_admins']
     
     def approve_admins(self, request, queryset):
-        queryset.update(is_approved=True)
+        approvals.approve_admins(queryset.values_list('id', flat=True), request.user)
     approve_admins.short_description = "Approve selected admins"
     
     def reject_admins(self, request, queryset):
@@ -93,4 +130,25 @@ class AdminApprovalAdmin(admin.ModelAdmin):
         queryset.delete()
     reject_admins.short_description = "Reject and delete selected admins"
 
-admin.site.register(AdminApproval, AdminApprovalAdmin)
\ No newline at end of file
+admin.site.register(AdminApproval, AdminApprovalAdmin)
+
+
+class ProfileImageJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'doctor', 'patient', 'original_name', 'state', 'attempts', 'created_date')
+    list_filter = ('state',)
+    list_select_related = ('doctor__user', 'patient__user')
+    readonly_fields = ('staged_name', 'original_name', 'attempts', 'error', 'created_date', 'claimed_date')
+    raw_id_fields = ('doctor', 'patient')
+
+admin.site.register(ProfileImageJob, ProfileImageJobAdmin)
+
+
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'original_name', 'state', 'rows_done', 'imported', 'rejected', 'created_date')
+    list_filter = ('kind', 'state')
+    list_select_related = ('created_by',)
+    readonly_fields = ('source', 'original_name', 'rows_done', 'imported', 'rejected', 'error',
+                       'created_date', 'finished_date')
+    raw_id_fields = ('created_by',)
+
+admin.site.register(ImportJob, ImportJobAdmin)
@@ -0,0 +1,335 @@
+import hashlib
+import time
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable
+
+from django.db.models import Case, CharField, Exists, OuterRef, Q, Value, When
+from django.db.models.functions import Concat
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .models import Doctor, Patient, Appointment, PatientDischargeDetails
+from .pagination import decode_cursor, encode_cursor
+from .roles import get_roles
+
+VERSION = 'v1'
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _full_name(prefix):
+    return Concat(f'{prefix}first_name', Value(' '), f'{prefix}last_name', output_field=CharField())
+
+
+def _related_name(relation):
+    # Concat turns NULL into '' on some backends; a missing doctor or patient stays null
+    return Case(When(**{f'{relation}__isnull': True}, then=Value(None)),
+                default=_full_name(f'{relation}__user__'), output_field=CharField())
+
+
+@dataclass(frozen=True)
+class Resource:
+    """
+    One API collection. fields maps each public name to a model field path or
+    an expression, so a sparse ?fields= request only selects those columns.
+    """
+    model: type
+    fields: dict
+    defaults: tuple
+    # scope(roles, user) -> the rows this user may read, or None if none at all
+    scope: Callable
+    admin_fields: frozenset = field(default_factory=frozenset)
+
+    def rows(self, queryset, names):
+        """Dicts keyed by the public names, selecting only the columns behind them"""
+        # Public names may clash with model fields (an appointment's "doctor" is
+        # doctor_id), so select by path or under a private alias and rename here
+        columns, expressions = {}, {}
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, str):
+                columns[name] = spec
+            else:
+                columns[name] = f'api_{name}'
+                expressions[columns[name]] = spec
+        paths = [column for column in columns.values() if column not in expressions]
+        for row in queryset.values(*paths, **expressions):
+            yield {name: row[column] for name, column in columns.items()}
+
+
+def _doctor_scope(roles, user):
+    if roles.is_admin:
+        return Doctor.objects.all()
+    if roles.is_approved_doctor or roles.is_approved_patient:
+        return Doctor.objects.filter(status=True, is_approved=True)
+    return None
+
+
+def _patient_scope(roles, user):
+    if roles.is_admin:
+        return Patient.objects.all()
+    if roles.is_approved_doctor:
+        booked = Appointment.objects.filter(patient=OuterRef('pk'), doctor__user_id=user.pk)
+        return Patient.objects.filter(Q(assignedDoctor__user_id=user.pk) | Exists(booked))
+    if roles.is_approved_patient:
+        return Patient.objects.filter(user_id=user.pk)
+    return None
+
+
+def _appointment_scope(roles, user):
+    if roles.is_admin:
+        return Appointment.objects.all()
+    if roles.is_approved_doctor:
+        return Appointment.objects.filter(doctor__user_id=user.pk)
+    if roles.is_approved_patient:
+        return Appointment.objects.filter(patient__user_id=user.pk)
+    return None
+
+
+def _discharge_scope(roles, user):
+    if roles.is_admin:
+        return PatientDischargeDetails.objects.all()
+    if roles.is_approved_doctor:
+        return PatientDischargeDetails.objects.filter(patient__assignedDoctor__user_id=user.pk)
+    if roles.is_approved_patient:
+        return PatientDischargeDetails.objects.filter(patient__user_id=user.pk)
+    return None
+
+
+RESOURCES = {
+    'doctors': Resource(
+        model=Doctor,
+        fields={
+            'id': 'id',
+            'name': _full_name('user__'),
+            'first_name': 'user__first_name',
+            'last_name': 'user__last_name',
+            'department': 'department',
+            'address': 'address',
+            'mobile': 'mobile',
+            'status': 'status',
+            'is_approved': 'is_approved',
+            'work_start': 'work_start',
+            'work_end': 'work_end',
+            'slot_minutes': 'slot_minutes',
+            'updated_at': 'updated_at',
+        },
+        defaults=('id', 'name', 'department', 'updated_at'),
+        scope=_doctor_scope,
+        # Patients and doctors only ever see bookable doctors, and not their contact details
+        admin_fields=frozenset({'address', 'mobile', 'status', 'is_approved'}),
+    ),
+    'patients': Resource(
+        model=Patient,
+        fields={
+            'id': 'id',
+            'name': _full_name('user__'),
+            'first_name': 'user__first_name',
+            'last_name': 'user__last_name',
+            'address': 'address',
+            'mobile': 'mobile',
+            'symptoms': 'symptoms',
+            'status': 'status',
+            'assigned_doctor': 'assignedDoctor_id',
+            'admit_date': 'admitDate',
+            'updated_at': 'updated_at',
+        },
+        defaults=('id', 'name', 'symptoms', 'status', 'assigned_doctor', 'updated_at'),
+        scope=_patient_scope,
+    ),
+    'appointments': Resource(
+        model=Appointment,
+        fields={
+            'id': 'id',
+            'patient': 'patient_id',
+            'patient_name': _related_name('patient'),
+            'doctor': 'doctor_id',
+            'doctor_name': _related_name('doctor'),
+            'description': 'description',
+            'status': 'status',
+            'accepted': 'is_accepted_by_doctor',
+            'accepted_date': 'accepted_date',
+            'appointment_date': 'appointmentDate',
+            'appointment_time': 'appointmentTime',
+            'created_date': 'createdDate',
+            'updated_at': 'updated_at',
+        },
+        defaults=('id', 'patient', 'doctor', 'appointment_date', 'appointment_time', 'status', 'accepted',
+                  'updated_at'),
+        scope=_appointment_scope,
+    ),
+    'discharges': Resource(
+        model=PatientDischargeDetails,
+        fields={
+            'id': 'id',
+            'patient': 'patient_id',
+            'patient_name': 'patientName',
+            'doctor_name': 'assignedDoctorName',
+            'address': 'address',
+            'mobile': 'mobile',
+            'symptoms': 'symptoms',
+            'admit_date': 'admitDate',
+            'release_date': 'releaseDate',
+            'days_spent': 'daySpent',
+            'room_charge': 'roomCharge',
+            'medicine_cost': 'medicineCost',
+            'doctor_fee': 'doctorFee',
+            'other_charge': 'OtherCharge',
+            'total': 'total',
+            'updated_at': 'updated_at',
+        },
+        defaults=('id', 'patient', 'patient_name', 'admit_date', 'release_date', 'total', 'updated_at'),
+        scope=_discharge_scope,
+    ),
+}
+
+
+def api_view(view_func):
+    """Session-authenticated, read-only JSON view; errors come back as JSON too"""
+    @require_safe
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        try:
+            response = view_func(request, *args, **kwargs)
+        except ApiError as exc:
+            response = JsonResponse({'error': str(exc)}, status=exc.status)
+        # Every answer depends on who is asking, so shared caches must not keep it
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Cookie',))
+        return response
+    return _wrapped_view
+
+
+def _resource(request, name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError(f'Unknown resource "{name}".', status=404)
+    roles = get_roles(request)
+    queryset = resource.scope(roles, request.user)
+    if queryset is None:
+        raise ApiError('Not allowed.', status=403)
+    return resource, queryset, roles
+
+
+def _selected_fields(request, resource, roles):
+    """Names from ?fields=, always including id, in the order they were asked for"""
+    allowed = [name for name in resource.fields if roles.is_admin or name not in resource.admin_fields]
+    requested = request.GET.get('fields')
+    if not requested:
+        return [name for name in resource.defaults if name in allowed]
+    names = ['id']
+    for name in requested.split(','):
+        name = name.strip()
+        if not name or name in names:
+            continue
+        if name not in allowed:
+            raise ApiError(f'Unknown field "{name}". Choose from: {", ".join(allowed)}.')
+        names.append(name)
+    return names
+
+
+def _limit(request):
+    try:
+        return min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ApiError('limit must be a number.')
+
+
+def _etag(*parts):
+    return '"{}"'.format(hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def _conditional(request, etag, last_modified, build):
+    """
+    Answer 304 when the client's ETag or date is still current; otherwise
+    build the payload and stamp it with the validators.
+    """
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(build())
+    response['ETag'] = etag
+    # HTTP dates have whole seconds: a date in the current second could stay the
+    # same through a later write this second, so only a finished second is sent
+    if last_modified is not None and last_modified < int(time.time()):
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def list_response(request, name):
+    """
+    One page of a collection, newest first. The ETag is taken from the ids and
+    update stamps of just this page, read through the primary key index, so an
+    unchanged page costs the client a 304 and the database no full row fetch.
+    Lists carry no Last-Modified: a row leaving the page changes it without
+    any update stamp moving.
+    """
+    resource, queryset, roles = _resource(request, name)
+    names = _selected_fields(request, resource, roles)
+    limit = _limit(request)
+
+    after = None
+    if request.GET.get('after'):
+        after = decode_cursor(request.GET['after'], 1)
+        if after is None or type(after[0]) is not int:
+            raise ApiError('Invalid cursor.')
+        queryset = queryset.filter(id__lt=after[0])
+
+    # One row past the page, so a row arriving there changes the next link and the ETag
+    page = list(queryset.order_by('-id').values_list('id', 'updated_at')[:limit + 1])
+    etag = _etag(VERSION, name, request.user.pk, names, limit, after, page)
+
+    def build():
+        ids = [pk for pk, _ in page[:limit]]
+        rows = list(resource.rows(queryset.filter(id__in=ids).order_by('-id'), names))
+        next_url = None
+        if len(page) > limit:
+            params = request.GET.copy()
+            params['after'] = encode_cursor([ids[-1]])
+            next_url = f'{request.path}?{params.urlencode()}'
+        return {'results': rows, 'next': next_url}
+
+    return _conditional(request, etag, None, build)
+
+
+def detail_response(request, name, pk):
+    resource, queryset, roles = _resource(request, name)
+    names = _selected_fields(request, resource, roles)
+    row = next(resource.rows(queryset.filter(pk=pk), [*names, 'updated_at']), None)
+    if row is None:
+        raise ApiError('Not found.', status=404)
+    etag = _etag(VERSION, name, pk, names, row['updated_at'])
+    return _conditional(request, etag, row['updated_at'], lambda: {name: row[name] for name in names})
+
+
+# Version stamps for writes that bypass auto_now, wired up in hospital.signals
+def touch_user_rows(user_id):
+    """A rename changes the names served for the user's profile and appointments"""
+    now = timezone.now()
+    Doctor.objects.filter(user_id=user_id).update(updated_at=now)
+    Patient.objects.filter(user_id=user_id).update(updated_at=now)
+    Appointment.objects.filter(Q(doctor__user_id=user_id) | Q(patient__user_id=user_id)).update(updated_at=now)
+
+
+def touch_profile_rows(instance):
+    """Deleting a profile nulls its foreign keys with update(), which skips auto_now"""
+    now = timezone.now()
+    if isinstance(instance, Doctor):
+        Appointment.objects.filter(doctor=instance).update(updated_at=now)
+        Patient.objects.filter(assignedDoctor=instance).update(updated_at=now)
+    else:
+        Appointment.objects.filter(patient=instance).update(updated_at=now)
+        PatientDischargeDetails.objects.filter(patient=instance).update(updated_at=now)
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User, Group
+from django.db import transaction
+from django.utils import timezone
+
+from . import choices, fragments, stats
+from .models import Doctor, AdminApproval
+from .roles import invalidate_roles
+
+APPROVAL_FIELDS = ['is_approved', 'approved_by', 'approved_date']
+
+
+def _approve(queryset, approver):
+    """Mark every pending row approved by approver; returns the approved rows"""
+    # bulk_update skips auto_now, so models with an API version stamp set it here
+    fields = APPROVAL_FIELDS + [f.name for f in queryset.model._meta.concrete_fields if f.name == 'updated_at']
+    pending = list(queryset.filter(is_approved=False).select_for_update().only('id', 'user_id', *fields))
+    approved_at = timezone.now()
+    for row in pending:
+        row.is_approved = True
+        row.approved_by = approver
+        row.approved_date = approved_at
+        if 'updated_at' in fields:
+            row.updated_at = approved_at
+    queryset.model.objects.bulk_update(pending, fields, batch_size=500)
+    return pending
+
+
+def approve_doctors(doctor_ids, approver):
+    """Approve pending doctors in one transaction; returns how many were approved"""
+    with transaction.atomic():
+        approved = _approve(Doctor.objects.filter(id__in=doctor_ids), approver)
+        # bulk_update sends no signals, so keep the counters and role cache in step here
+        stats.adjust(pending_doctor_approvals=-len(approved))
+        fragments.bump('dashboard')
+        if approved:
+            choices.invalidate_doctor_choices()
+    invalidate_roles(*[doctor.user_id for doctor in approved])
+    return len(approved)
+
+
+def approve_admins(approval_ids, approver):
+    """Approve pending admins and add them all to the Admin group in one insert"""
+    with transaction.atomic():
+        approved = _approve(AdminApproval.objects.filter(id__in=approval_ids), approver)
+        if approved:
+            admin_group, _ = Group.objects.get_or_create(name='Admin')
+            Membership = User.groups.through
+            Membership.objects.bulk_create(
+                [Membership(user_id=approval.user_id, group_id=admin_group.id) for approval in approved],
+                ignore_conflicts=True,
+            )
+        stats.adjust(pending_admin_approvals=-len(approved))
+        fragments.bump('dashboard')
+    invalidate_roles(*[approval.user_id for approval in approved])
+    return len(approved)
+
+
+def reject_doctors(doctor_ids):
+    """Delete the accounts of pending doctors; returns how many were rejected"""
+    with transaction.atomic():
+        users = User.objects.filter(doctor__id__in=doctor_ids, doctor__is_approved=False)
+        # One counter update for the whole batch instead of one per deleted row
+        with stats.batched():
+            rejected = users.delete()[1].get(User._meta.label, 0)
+    return rejected
+
+
+def reject_admins(approval_ids, keep_user=None):
+    """Delete the accounts of pending admins, never keep_user's own"""
+    with transaction.atomic():
+        users = User.objects.filter(adminapproval__id__in=approval_ids, adminapproval__is_approved=False,
+                                    is_superuser=False)
+        if keep_user is not None:
+            users = users.exclude(pk=keep_user.pk)
+        # One counter update for the whole batch instead of one per deleted row
+        with stats.batched():
+            rejected = users.delete()[1].get(User._meta.label, 0)
+    return rejected
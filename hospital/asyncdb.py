@@ -0,0 +1,37 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connections
+
+
+def _on_own_connection(call):
+    def run():
+        try:
+            return call()
+        finally:
+            # Executor threads outlive requests, so tidy their connections like a request would
+            close_old_connections()
+    return run
+
+
+def in_transaction():
+    """Whether this thread has a transaction open that other connections cannot see into"""
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+async def gather(*calls):
+    """
+    Run independent blocking ORM calls at the same time and return their
+    results in order. Django's async ORM sends every query of a request to
+    the same thread one after another; these calls each get an executor
+    thread, and so a database connection, of their own.
+
+    Inside an open transaction (a test case, the view benchmark) other
+    connections cannot see its uncommitted rows and would wait on its write
+    lock, so the calls then run one after another on the request's thread.
+    """
+    if await sync_to_async(in_transaction)():
+        return [await sync_to_async(call)() for call in calls]
+    return await asyncio.gather(*(
+        sync_to_async(_on_own_connection(call), thread_sensitive=False)() for call in calls
+    ))
@@ -0,0 +1,13 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend whose atomic() blocks start with BEGIN IMMEDIATE. A plain
+    BEGIN reads first and upgrades to a write lock later, which fails at once
+    with "database is locked" if another request committed in between;
+    taking the write lock up front makes writers queue on busy_timeout instead.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,151 @@
+import importlib.util
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PatientDischargeDetails
+
+# What the engine writes back; medicineCost and OtherCharge stay as keyed in
+BILLED_FIELDS = ['daySpent', 'roomCharge', 'doctorFee', 'total', 'updated_at']
+
+# One row per discharge: the inputs, then the stored values the bill is compared with
+BILL_COLUMNS = ('id', 'admitDate', 'releaseDate', 'medicineCost', 'OtherCharge',
+                'patient__assignedDoctor__department', 'daySpent', 'roomCharge', 'doctorFee', 'total')
+
+TOTAL_COLUMNS = ('id', 'roomCharge', 'medicineCost', 'doctorFee', 'OtherCharge', 'total')
+
+
+def has_numpy():
+    # NumPy is an optional extra (requirements-optional.txt); without it the same arithmetic runs row by row
+    return importlib.util.find_spec('numpy') is not None
+
+
+def tariff(department):
+    """(daily room charge, daily doctor fee) for a doctor's department, or the default rates"""
+    rates = settings.HOSPITAL_BILLING_TARIFFS.get(department, settings.HOSPITAL_BILLING_DEFAULT_TARIFF)
+    return rates['room'], rates['doctor_fee']
+
+
+def _rates(departments):
+    known = {name: tariff(name) for name in set(departments)}
+    return [known[name] for name in departments]
+
+
+def _bills_numpy(rows):
+    import numpy as np
+
+    ids, admitted, released, medicine, other, departments, *stored = zip(*rows)
+    ids = np.array(ids, dtype=np.int64)
+    rates = np.array(_rates(departments), dtype=np.int64)
+    days = (np.array(released, dtype='datetime64[D]') - np.array(admitted, dtype='datetime64[D]')).astype(np.int64)
+    valid = days >= 0
+    # A same-day discharge is billed as one day
+    days = np.maximum(days, 1)
+    room = days * rates[:, 0]
+    fee = days * rates[:, 1]
+    total = room + fee + np.array(medicine, dtype=np.int64) + np.array(other, dtype=np.int64)
+    bills = np.stack([days, room, fee, total])
+    changed = valid & (np.array(stored, dtype=np.int64) != bills).any(axis=0)
+    return list(zip(ids[changed].tolist(), *bills[:, changed].tolist())), ids[~valid].tolist()
+
+
+def _bills_python(rows):
+    changed, invalid = [], []
+    for row, (room_rate, fee_rate) in zip(rows, _rates([row[5] for row in rows])):
+        pk, admitted, released, medicine, other, _, *stored = row
+        days = (released - admitted).days
+        if days < 0:
+            invalid.append(pk)
+            continue
+        days = max(days, 1)
+        bill = [days, days * room_rate, days * fee_rate, days * (room_rate + fee_rate) + medicine + other]
+        if bill != stored:
+            changed.append((pk, *bill))
+    return changed, invalid
+
+
+@dataclass
+class BillingRun:
+    checked: int = 0
+    updated: int = 0
+    # Discharges released before they were admitted; left for someone to correct
+    invalid: list = field(default_factory=list)
+
+
+def bill(queryset=None, batch_size=None, dry_run=False):
+    """
+    Compute day counts and tariff charges for every discharge in queryset, a
+    batch at a time as whole columns, and write back only the bills that
+    changed with one bulk_update per batch.
+    """
+    bills = _bills_numpy if has_numpy() else _bills_python
+    batch_size = batch_size or settings.HOSPITAL_BILLING_BATCH_SIZE
+    queryset = (PatientDischargeDetails.objects.all() if queryset is None else queryset).order_by('id')
+    run = BillingRun()
+    last_id = 0
+    while True:
+        # Keyset batches, so rows already written back are never read again
+        rows = list(queryset.filter(id__gt=last_id).values_list(*BILL_COLUMNS)[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        changed, invalid = bills(rows)
+        run.checked += len(rows)
+        run.invalid.extend(invalid)
+        if changed and not dry_run:
+            # bulk_update skips auto_now, so stamp the API version here
+            billed_at = timezone.now()
+            with transaction.atomic():
+                PatientDischargeDetails.objects.bulk_update([
+                    PatientDischargeDetails(id=pk, daySpent=days, roomCharge=room, doctorFee=fee, total=total,
+                                            updated_at=billed_at)
+                    for pk, days, room, fee, total in changed
+                ], BILLED_FIELDS, batch_size=500)
+        run.updated += len(changed)
+    return run
+
+
+@dataclass
+class Reconciliation:
+    checked: int = 0
+    # (id, stored total, sum of the components)
+    mismatches: list = field(default_factory=list)
+
+
+def _mismatches_numpy(rows):
+    import numpy as np
+
+    table = np.array(rows, dtype=np.int64)
+    expected = table[:, 1:5].sum(axis=1)
+    wrong = table[:, 5] != expected
+    return list(zip(table[wrong, 0].tolist(), table[wrong, 5].tolist(), expected[wrong].tolist()))
+
+
+def _mismatches_python(rows):
+    return [(pk, total, sum(parts)) for pk, *parts, total in rows if sum(parts) != total]
+
+
+def reconcile(chunk_size=None):
+    """Stored totals that differ from roomCharge + medicineCost + doctorFee + OtherCharge, in one pass over the table"""
+    mismatches = _mismatches_numpy if has_numpy() else _mismatches_python
+    chunk_size = chunk_size or settings.HOSPITAL_BILLING_BATCH_SIZE
+    rows = PatientDischargeDetails.objects.order_by().values_list(*TOTAL_COLUMNS).iterator(chunk_size=chunk_size)
+    result = Reconciliation()
+    for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+        result.checked += len(chunk)
+        result.mismatches.extend(mismatches(chunk))
+    return result
+
+
+def fix_totals(mismatches):
+    """Set each mismatched total to the sum of its components"""
+    fixed_at = timezone.now()
+    with transaction.atomic():
+        PatientDischargeDetails.objects.bulk_update(
+            [PatientDischargeDetails(id=pk, total=expected, updated_at=fixed_at) for pk, _, expected in mismatches],
+            ['total', 'updated_at'], batch_size=500,
+        )
+    return len(mismatches)
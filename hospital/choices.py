@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Doctor, Patient
+
+DOCTOR_CHOICES_KEY = 'hospital:choices:doctors'
+
+# Autocomplete results per request
+AUTOCOMPLETE_LIMIT = 20
+
+
+def _timeout():
+    return getattr(settings, 'HOSPITAL_CHOICES_TIMEOUT', 3600)
+
+
+def bookable_doctors():
+    return Doctor.objects.filter(status=True, is_approved=True).select_related('user')
+
+
+def active_patients():
+    return Patient.objects.filter(status=True).select_related('user')
+
+
+def _search_words(user):
+    return tuple(word.lower() for word in (user.first_name, user.last_name, user.username) if word)
+
+
+def _doctor_entries():
+    """Cached (id, label, department, search words) for every bookable doctor"""
+    entries = cache.get(DOCTOR_CHOICES_KEY)
+    if entries is None:
+        doctors = bookable_doctors().order_by('department', 'user__first_name', 'user__last_name')
+        entries = [(doctor.pk, f'Dr. {doctor.get_name}', doctor.department, _search_words(doctor.user))
+                   for doctor in doctors]
+        cache.set(DOCTOR_CHOICES_KEY, entries, _timeout())
+    return entries
+
+
+def doctor_choices():
+    """Bookable doctors as select choices grouped by department"""
+    groups = {}
+    for pk, label, department, _ in _doctor_entries():
+        groups.setdefault(department, []).append((pk, label))
+    return list(groups.items())
+
+
+def patient_labels(ids):
+    """Choices for just these patient ids, for rendering a selected value"""
+    wanted = [int(pk) for pk in ids if str(pk).isdigit()]
+    return [(patient.pk, str(patient)) for patient in active_patients().filter(pk__in=wanted)]
+
+
+def _matches(words, terms):
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def search_doctors(query, limit=AUTOCOMPLETE_LIMIT):
+    terms = query.lower().split()
+    return [{'id': pk, 'text': label, 'department': department}
+            for pk, label, department, words in _doctor_entries() if _matches(words, terms)][:limit]
+
+
+def search_patients(query, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Patients are too many to cache as one list, so every term is a prefix
+    match in the database, on the case-insensitive auth_user name indexes that
+    migration 0018 and hospital.database.ensure_user_name_indexes maintain.
+    """
+    patients = active_patients()
+    for term in query.split()[:4]:
+        patients = patients.filter(Q(user__first_name__istartswith=term) | Q(user__last_name__istartswith=term)
+                                   | Q(user__username__istartswith=term))
+    patients = patients.order_by('user__first_name', 'user__last_name', 'id')[:limit]
+    return [{'id': patient.pk, 'text': str(patient)} for patient in patients]
+
+
+def _forget(key):
+    cache.delete(key)
+    # Again once committed, in case a reader cached the old rows meanwhile
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_doctor_choices():
+    _forget(DOCTOR_CHOICES_KEY)
+
+
+# Invalidation, wired up in hospital.signals
+DOCTOR_FIELDS = ('status', 'is_approved', 'department', 'user_id')
+
+
+def remember_choice_state(instance):
+    instance._choice_state = tuple(instance.__dict__.get(field) for field in DOCTOR_FIELDS)
+
+
+def _listed_state_changed(instance, created):
+    if created:
+        return True
+    current = tuple(instance.__dict__.get(field) for field in DOCTOR_FIELDS)
+    return current != getattr(instance, '_choice_state', None)
+
+
+def doctor_saved(instance, created):
+    if _listed_state_changed(instance, created):
+        invalidate_doctor_choices()
+    remember_choice_state(instance)
+
+
+USER_FIELDS = ('first_name', 'last_name', 'username')
+
+
+def remember_user_names(instance):
+    instance._choice_names = tuple(instance.__dict__.get(field) for field in USER_FIELDS)
+
+
+def user_renamed(instance):
+    names = tuple(instance.__dict__.get(field) for field in USER_FIELDS)
+    return names != getattr(instance, '_choice_names', names)
+
+
+def user_saved(instance, created):
+    # A rename changes the labels; new users have no profile listed yet
+    if not created and user_renamed(instance):
+        invalidate_doctor_choices()
+    remember_user_names(instance)
@@ -0,0 +1,12 @@
+from django.contrib.messages import get_messages
+from django.utils.functional import SimpleLazyObject
+
+
+def alert_message(request):
+    """
+    Pending flash messages joined into the text of the pages' alert() popup.
+    Lazy, so messages are only consumed by templates that show the popup.
+    """
+    def pending():
+        return '\n'.join(str(message) for message in get_messages(request))
+    return {'alert_message': SimpleLazyObject(pending)}
@@ -0,0 +1,64 @@
+from django.conf import settings
+
+
+def configure_sqlite(connection):
+    """
+    Apply HOSPITAL_SQLITE_PRAGMAS to a new SQLite connection. WAL lets readers
+    carry on while one request writes, and busy_timeout makes writers queue for
+    the lock instead of failing with "database is locked".
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'HOSPITAL_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def describe(connection):
+    """Short description of the database behind connection, for benchmark reports"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        return f'sqlite ({journal_mode} journal)'
+    settings_dict = connection.settings_dict
+    if 'pool' in settings_dict.get('OPTIONS', {}):
+        return f'{connection.vendor} (driver pool)'
+    return f'{connection.vendor} (CONN_MAX_AGE={settings_dict["CONN_MAX_AGE"]})'
+
+
+# Case-insensitive prefix indexes for patient autocomplete (hospital.choices).
+# They live on auth_user, a table django.contrib.auth owns and Django does not
+# know they exist: an auth migration that rebuilds the table on SQLite drops
+# them, so ensure_user_name_indexes() puts them back after every migrate.
+USER_NAME_INDEX_MIGRATION = ('hospital', '0018_user_name_indexes')
+USER_NAME_COLUMNS = ('first_name', 'last_name', 'username')
+
+
+def user_name_index(column):
+    return f'hospital_user_{column}_ci'
+
+
+def user_name_index_sql(vendor):
+    """CREATE INDEX statements matching how each backend compiles istartswith"""
+    if vendor == 'sqlite':
+        # SQLite turns a LIKE prefix into an index range only on a NOCASE index
+        expression = '{column} COLLATE NOCASE'
+    elif vendor == 'postgresql':
+        # PostgreSQL compiles istartswith to UPPER(column::text) LIKE UPPER(%s)
+        expression = 'UPPER({column}::text) text_pattern_ops'
+    else:
+        return []
+    return [f'CREATE INDEX IF NOT EXISTS {user_name_index(column)} ON auth_user ({expression.format(column=column)})'
+            for column in USER_NAME_COLUMNS]
+
+
+def ensure_user_name_indexes(connection):
+    """Recreate the auth_user name indexes if migration 0018 is applied but they are gone"""
+    from django.db.migrations.recorder import MigrationRecorder
+
+    if USER_NAME_INDEX_MIGRATION not in MigrationRecorder(connection).applied_migrations():
+        return
+    with connection.cursor() as cursor:
+        for statement in user_name_index_sql(connection.vendor):
+            cursor.execute(statement)
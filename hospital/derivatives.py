@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+# Square edge lengths, in pixels, that may be generated
+SIZES = (40, 80, 160, 320)
+
+# Extension -> (Pillow format, content type, save options)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_DIGEST_LENGTH = 20
+
+
+def derivative_root():
+    return settings.HOSPITAL_DERIVATIVE_ROOT
+
+
+@lru_cache(maxsize=None)
+def available_formats():
+    from PIL import features
+    return tuple(ext for ext in FORMATS if ext != 'webp' or features.check('webp'))
+
+
+# On-disk index: source name -> content hash (checked against the file's size
+# and mtime) and content hash -> source name, one small JSON file per entry
+def _index_path(kind, key):
+    return os.path.join(derivative_root(), 'index', kind, key[:2], f'{key}.json')
+
+
+def _read_index(kind, key):
+    try:
+        with open(_index_path(kind, key)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f'{path}.{os.getpid()}.tmp'
+    with open(partial, 'wb') as handle:
+        write(handle)
+    os.replace(partial, path)
+
+
+def _write_index(kind, key, entry):
+    _write_atomic(_index_path(kind, key), lambda handle: handle.write(json.dumps(entry).encode()))
+
+
+def _name_key(name):
+    return hashlib.sha1(name.encode()).hexdigest()
+
+
+def source_hash(name):
+    """Content hash of a stored picture, or None if the file is gone"""
+    try:
+        path = default_storage.path(name)
+        stat = os.stat(path)
+    except (FileNotFoundError, NotImplementedError):
+        return None
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    key = _name_key(name)
+    cache_key = f'hospital:derivatives:{key}'
+    entry = cache.get(cache_key) or _read_index('names', key)
+    if entry is None or entry['stamp'] != stamp:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(1 << 16), b''):
+                digest.update(chunk)
+        entry = {'name': name, 'stamp': stamp, 'hash': digest.hexdigest()[:_DIGEST_LENGTH]}
+        _write_index('names', key, entry)
+        _write_index('hashes', entry['hash'], {'name': name})
+    cache.set(cache_key, entry, None)
+    return entry['hash']
+
+
+def derivative_path(digest, size, ext, root=None):
+    return os.path.join(root or derivative_root(), digest[:2], f'{digest}-{size}.{ext}')
+
+
+def render_derivative(source_path, target_path, size, ext):
+    """Write one square derivative of the source picture; safe to run in a worker process"""
+    from PIL import Image, ImageOps
+    from .images import _flatten
+
+    pillow_format, _, options = FORMATS[ext]
+    with Image.open(source_path) as image:
+        image.draft('RGB', (size * 2, size * 2))
+        image = _flatten(ImageOps.exif_transpose(image))
+    image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    _write_atomic(target_path, lambda handle: image.save(handle, pillow_format, **options))
+
+
+def build_all(source_path, digest, root, formats):
+    """Every size and format for one picture, skipping those already on disk"""
+    built = 0
+    for size in SIZES:
+        for ext in formats:
+            target = derivative_path(digest, size, ext, root)
+            if not os.path.exists(target):
+                render_derivative(source_path, target, size, ext)
+                built += 1
+    return built
+
+
+def prepare(name):
+    """Arguments for build_all, so callers can hand the work to a process pool"""
+    digest = source_hash(name)
+    if digest is None:
+        return None
+    return default_storage.path(name), digest, derivative_root(), available_formats()
+
+
+def ensure(digest, size, ext):
+    """Path of one derivative, rendering it on first request; None if it cannot exist"""
+    if size not in SIZES or ext not in available_formats():
+        return None
+    target = derivative_path(digest, size, ext)
+    if os.path.exists(target):
+        return target
+    entry = _read_index('hashes', digest)
+    if entry is None or source_hash(entry['name']) != digest:
+        return None
+    render_derivative(default_storage.path(entry['name']), target, size, ext)
+    return target
+
+
+def content_type(ext):
+    return FORMATS[ext][1]
+
+
+def picture_sources(name, display_size):
+    """
+    srcset strings per format for a picture shown at display_size CSS pixels,
+    offering 1x and 2x; None if the source file is missing.
+    """
+    digest = source_hash(name)
+    if digest is None:
+        return None
+    densities = [(size, f'{size // display_size}x') for size in SIZES
+                 if size >= display_size and size % display_size == 0 and size // display_size <= 2]
+    if not densities:
+        densities = [(min(SIZES, key=lambda size: abs(size - display_size)), '1x')]
+    sources = {}
+    for ext in available_formats():
+        urls = [(reverse('profile-derivative', args=[digest, size, ext]), density) for size, density in densities]
+        sources[ext] = {'src': urls[0][0], 'srcset': ', '.join(f'{url} {density}' for url, density in urls)}
+    return sources
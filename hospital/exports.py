@@ -0,0 +1,221 @@
+import csv
+import importlib.util
+import io
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Concat
+from django.http import StreamingHttpResponse
+
+from .models import Appointment, PatientDischargeDetails
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportUnavailable(Exception):
+    """The requested format needs a library that is not installed"""
+
+
+def available_formats():
+    # Parquet needs pyarrow, an optional extra listed in requirements-optional.txt
+    return [name for name in FORMATS if name != 'parquet' or importlib.util.find_spec('pyarrow')]
+
+
+def _chunk_size():
+    return getattr(settings, 'HOSPITAL_EXPORT_CHUNK_SIZE', 2000)
+
+
+def _full_name(relation):
+    # Rows without a doctor or patient export an empty name, not a lone space
+    return Case(When(**{f'{relation}__isnull': True}, then=Value(None)),
+                default=Concat(f'{relation}__user__first_name', Value(' '), f'{relation}__user__last_name'),
+                output_field=CharField())
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    An exportable table. columns are (name, field path or expression, type),
+    the type being what Parquet stores the column as.
+    """
+    model: type
+    columns: tuple
+    date_field: str
+    doctor_field: str
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self.columns]
+
+    def queryset(self, date_from=None, date_to=None, doctor=None):
+        queryset = self.model.objects.all()
+        if date_from:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': date_from})
+        if date_to:
+            queryset = queryset.filter(**{f'{self.date_field}__lte': date_to})
+        if doctor:
+            queryset = queryset.filter(**{self.doctor_field: doctor})
+        # Plain tuples, walked in primary key order through a cursor: memory stays flat
+        return queryset.order_by('pk').values_list(*(source for _, source, _ in self.columns))
+
+
+DATASETS = {
+    'appointments': Dataset(
+        model=Appointment,
+        columns=(
+            ('id', 'id', 'int'),
+            ('patient_id', 'patient_id', 'int'),
+            ('patient_name', _full_name('patient'), 'str'),
+            ('doctor_id', 'doctor_id', 'int'),
+            ('doctor_name', _full_name('doctor'), 'str'),
+            ('description', 'description', 'str'),
+            ('appointment_date', 'appointmentDate', 'date'),
+            ('appointment_time', 'appointmentTime', 'time'),
+            ('created_date', 'createdDate', 'date'),
+            ('approved', 'status', 'bool'),
+            ('accepted_by_doctor', 'is_accepted_by_doctor', 'bool'),
+        ),
+        date_field='appointmentDate',
+        doctor_field='doctor_id',
+    ),
+    # Discharge billing; the doctor filter follows the patient's assigned doctor
+    'discharges': Dataset(
+        model=PatientDischargeDetails,
+        columns=(
+            ('id', 'id', 'int'),
+            ('patient_id', 'patient_id', 'int'),
+            ('patient_name', 'patientName', 'str'),
+            ('doctor_name', 'assignedDoctorName', 'str'),
+            ('admit_date', 'admitDate', 'date'),
+            ('release_date', 'releaseDate', 'date'),
+            ('days_spent', 'daySpent', 'int'),
+            ('room_charge', 'roomCharge', 'int'),
+            ('medicine_cost', 'medicineCost', 'int'),
+            ('doctor_fee', 'doctorFee', 'int'),
+            ('other_charge', 'OtherCharge', 'int'),
+            ('total', 'total', 'int'),
+        ),
+        date_field='releaseDate',
+        doctor_field='patient__assignedDoctor_id',
+    ),
+}
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv(dataset, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(dataset.names)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(dataset, batches):
+    names = dataset.names
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for batch in batches:
+        yield ''.join(encoder.encode(dict(zip(names, row))) + '\n' for row in batch).encode()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file whose bytes are handed out as soon as pyarrow writes them"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def _parquet(dataset, batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'int': pa.int64(), 'str': pa.string(), 'bool': pa.bool_(), 'date': pa.date32(), 'time': pa.time64('us')}
+    schema = pa.schema([(name, types[kind]) for name, _, kind in dataset.columns])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        # One row group per batch, so only one batch is ever held in memory
+        for batch in batches:
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=schema.field(index).type) for index, column in enumerate(zip(*batch))],
+                schema=schema,
+            ))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+WRITERS = {'csv': _csv, 'ndjson': _ndjson, 'parquet': _parquet}
+
+
+def export(name, fmt, date_from=None, date_to=None, doctor=None, chunk_size=None):
+    """Encoded chunks of the export, read from the database chunk_size rows at a time"""
+    if fmt not in available_formats():
+        raise ExportUnavailable(f'{fmt} export needs pyarrow, which is not installed '
+                                '(pip install -r requirements-optional.txt).')
+    dataset = DATASETS[name]
+    chunk_size = chunk_size or _chunk_size()
+    rows = dataset.queryset(date_from, date_to, doctor).iterator(chunk_size=chunk_size)
+    return WRITERS[fmt](dataset, _batches(rows, chunk_size))
+
+
+async def _aiter(chunks):
+    # Pull every chunk on the request's own thread, where the cursor was opened
+    pull = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await pull(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def streaming_response(request, chunks, fmt, filename):
+    """
+    Stream chunks as a download. Under ASGI the chunks are pulled one at a
+    time, since Django would otherwise read a sync iterator into a list first.
+    """
+    content_type, extension = FORMATS[fmt]
+    if isinstance(request, ASGIRequest):
+        chunks = _aiter(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
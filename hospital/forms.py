@@ -1,15 +1,109 @@
 from django import forms
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from . import models
-from datetime import datetime
+from django.core.validators import FileExtensionValidator
+from django.template.defaultfilters import filesizeformat
+from django.urls import reverse_lazy
+from . import choices, exports, images, models, search
+from .validators import PASSWORD_MIN_LENGTH, validate_mobile
+from datetime import date, datetime, timedelta
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField whose options come from a cached choice loader instead of
+    iterating the queryset. The queryset is still used to validate submissions.
+    """
+
+    def __init__(self, queryset, choice_loader, **kwargs):
+        self.choice_loader = choice_loader
+        super().__init__(queryset, **kwargs)
+
+    def _get_choices(self):
+        options = list(self.choice_loader())
+        if self.empty_label is not None:
+            options.insert(0, ('', self.empty_label))
+        return options
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    Select that only renders the current value; static/js/autocomplete.js
+    fetches the other options from url as the user types.
+    """
+
+    def __init__(self, url, label_loader, placeholder='', attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.label_loader = label_loader
+        self.placeholder = placeholder
+
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete-url'] = str(self.url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [item for item in value if item]
+        self.choices = [('', self.placeholder)] + (self.label_loader(selected) if selected else [])
+        return super().optgroups(name, value, attrs)
+
+
+class SearchInput(forms.TextInput):
+    """Search box; static/js/search.js suggests matches of kind from url as the user types"""
+    input_type = 'search'
+
+    def __init__(self, url, kind, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.kind = kind
+
+    class Media:
+        js = ('js/search.js',)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs'].update({'data-search-url': str(self.url), 'data-search-kind': self.kind})
+        return context
+
+
+class StagedImageField(forms.FileField):
+    """
+    Profile picture upload with only cheap checks in the request; decoding and
+    re-encoding happen later in hospital.images.
+    """
+    default_validators = [FileExtensionValidator(images.IMAGE_EXTENSIONS)]
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('widget', forms.FileInput(attrs={
+            'accept': 'image/*',
+            'class': 'w-full px-4 py-2 border border-gray-300 rounded-full focus:outline-none focus:ring-2 focus:ring-blue-500'
+        }))
+        super().__init__(**kwargs)
+
+    def validate(self, value):
+        super().validate(value)
+        limit = settings.HOSPITAL_MAX_UPLOAD_BYTES
+        if value and getattr(value, 'size', 0) > limit:
+            raise ValidationError(f"Profile picture must be smaller than {filesizeformat(limit)}")
+
+
+def doctor_field(**kwargs):
+    return CachedModelChoiceField(choices.bookable_doctors(), choices.doctor_choices, **kwargs)
 
 class BaseUserForm(forms.ModelForm):
     """Base form for user creation with common fields"""
     password = forms.CharField(widget=forms.PasswordInput(attrs={
         'placeholder': 'Enter a strong password',
         'class': 'w-full px-4 py-2 border border-gray-300 rounded-full focus:outline-none focus:ring-2 focus:ring-blue-500'
-    }), min_length=8)
+    }), min_length=PASSWORD_MIN_LENGTH)
     confirm_password = forms.CharField(widget=forms.PasswordInput(attrs={
         'placeholder': 'Confirm your password',
         'class': 'w-full px-4 py-2 border border-gray-300 rounded-full focus:outline-none focus:ring-2 focus:ring-blue-500'
@@ -65,6 +159,8 @@ class DoctorUserForm(BaseUserForm):
     pass
 
 class DoctorForm(forms.ModelForm):
+    profile_pic = StagedImageField()
+
     class Meta:
         model = models.Doctor
         fields = ['address', 'mobile', 'department', 'status', 'profile_pic']
@@ -83,15 +179,11 @@ class DoctorForm(forms.ModelForm):
             'status': forms.CheckboxInput(attrs={
                 'class': 'h-4 w-4 text-blue-600 focus:ring-blue-500 border-gray-300 rounded'
             }),
-            'profile_pic': forms.FileInput(attrs={
-                'class': 'w-full px-4 py-2 border border-gray-300 rounded-full focus:outline-none focus:ring-2 focus:ring-blue-500'
-            }),
         }
 
     def clean_mobile(self):
         mobile = self.cleaned_data.get('mobile')
-        if len(str(mobile)) != 10:
-            raise ValidationError("Mobile number must be 10 digits")
+        validate_mobile(mobile)
         return mobile
 
 # Patient forms
@@ -99,18 +191,11 @@ class PatientUserForm(BaseUserForm):
     pass
 
 class PatientForm(forms.ModelForm):
+    profile_pic = StagedImageField()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Safely filter doctors based on available fields
-        try:
-            # Try to filter by is_approved if the field exists
-            doctors = models.Doctor.objects.filter(status=True, is_approved=True)
-        except:
-            # Fallback to just status if is_approved doesn't exist
-            doctors = models.Doctor.objects.filter(status=True)
-        
-        self.fields['assignedDoctor'] = forms.ModelChoiceField(
-            queryset=doctors,
+        self.fields['assignedDoctor'] = doctor_field(
             empty_label="Select Doctor",
             label="Assigned Doctor",
             help_text="Select your primary doctor",
@@ -137,36 +222,21 @@ class PatientForm(forms.ModelForm):
             'status': forms.CheckboxInput(attrs={
                 'class': 'h-4 w-4 text-blue-600 focus:ring-blue-500 border-gray-300 rounded'
             }),
-            'profile_pic': forms.FileInput(attrs={
-                'class': 'w-full px-4 py-2 border border-gray-300 rounded-full focus:outline-none focus:ring-2 focus:ring-blue-500'
-            }),
         }
 
 # Appointment forms
 class AppointmentForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Safely filter doctors based on available fields
-        try:
-            doctors = models.Doctor.objects.filter(status=True, is_approved=True)
-        except:
-            doctors = models.Doctor.objects.filter(status=True)
-        
-        try:
-            patients = models.Patient.objects.filter(status=True)
-        except:
-            patients = models.Patient.objects.all()
-        
-        self.fields['doctorId'] = forms.ModelChoiceField(
-            queryset=doctors,
+        self.fields['doctor'] = doctor_field(
             empty_label="Select Doctor",
-            to_field_name="user_id",
             label="Doctor"
         )
-        self.fields['patientId'] = forms.ModelChoiceField(
-            queryset=patients,
-            empty_label="Select Patient",
-            to_field_name="user_id",
+        # The patient list can be long, so it is searched rather than rendered inline
+        self.fields['patient'] = forms.ModelChoiceField(
+            queryset=choices.active_patients(),
+            widget=AutocompleteSelect(reverse_lazy('autocomplete-patients'), choices.patient_labels,
+                                      placeholder="Select Patient"),
             label="Patient"
         )
     
@@ -189,7 +259,7 @@ class AppointmentForm(forms.ModelForm):
 
     class Meta:
         model = models.Appointment
-        fields = ['description', 'status', 'admin_scheduled_date', 'admin_scheduled_time']
+        fields = ['patient', 'doctor', 'description', 'status', 'admin_scheduled_date', 'admin_scheduled_time']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
         }
@@ -197,22 +267,14 @@ class AppointmentForm(forms.ModelForm):
 class PatientAppointmentForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Safely filter doctors based on available fields
-        try:
-            doctors = models.Doctor.objects.filter(status=True, is_approved=True)
-        except:
-            doctors = models.Doctor.objects.filter(status=True)
-        
-        self.fields['doctorId'] = forms.ModelChoiceField(
-            queryset=doctors,
+        self.fields['doctor'] = doctor_field(
             empty_label="Select Doctor",
-            to_field_name="user_id",
             label="Doctor"
         )
 
     class Meta:
         model = models.Appointment
-        fields = ['description']
+        fields = ['doctor', 'description']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Describe your symptoms and reason for appointment'}),
         }
@@ -262,4 +324,117 @@ class AdminApprovalForm(forms.ModelForm):
         fields = ['is_approved']
         widgets = {
             'is_approved': forms.CheckboxInput(attrs={'class': 'form-checkbox'}),
-        }
\ No newline at end of file
+        }
+
+# Admin listing filters
+FILTER_INPUT_CLASS = 'px-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500'
+
+
+class ListingFilterForm(forms.Form):
+    """Base for the GET filter bars on the admin listing pages"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.required = False
+            field.widget.attrs.setdefault('class', FILTER_INPUT_CLASS)
+
+    def filter_queryset(self, queryset):
+        if not self.is_valid():
+            return queryset
+        return self.apply(queryset, self.cleaned_data)
+
+    def apply(self, queryset, data):
+        return queryset
+
+
+class DoctorFilterForm(ListingFilterForm):
+    department = forms.ChoiceField(choices=[('', 'All departments')] + models.departments)
+    status = forms.ChoiceField(choices=[('', 'Any status'), ('active', 'Active'), ('inactive', 'Inactive')])
+    approval = forms.ChoiceField(choices=[('', 'Any approval'), ('approved', 'Approved'), ('pending', 'Pending')])
+
+    def apply(self, queryset, data):
+        if data['department']:
+            queryset = queryset.filter(department=data['department'])
+        if data['status']:
+            queryset = queryset.filter(status=data['status'] == 'active')
+        if data['approval']:
+            queryset = queryset.filter(is_approved=data['approval'] == 'approved')
+        return queryset
+
+
+class PatientFilterForm(ListingFilterForm):
+    q = forms.CharField(label='Search', max_length=200, widget=SearchInput(
+        reverse_lazy('search'), search.PATIENT, attrs={'placeholder': 'Name, symptoms, mobile'}))
+    status = forms.ChoiceField(choices=[('', 'Any status'), ('approved', 'Approved'), ('pending', 'Pending')])
+    admitted_from = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    admitted_to = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def apply(self, queryset, data):
+        if data['q']:
+            queryset = queryset.filter(pk__in=search.matching(search.PATIENT, data['q']))
+        if data['status']:
+            queryset = queryset.filter(status=data['status'] == 'approved')
+        if data['admitted_from']:
+            queryset = queryset.filter(admitDate__gte=data['admitted_from'])
+        if data['admitted_to']:
+            queryset = queryset.filter(admitDate__lte=data['admitted_to'])
+        return queryset
+
+
+class AppointmentFilterForm(ListingFilterForm):
+    q = forms.CharField(label='Search', max_length=200, widget=SearchInput(
+        reverse_lazy('search'), search.APPOINTMENT, attrs={'placeholder': 'Patient, doctor, description'}))
+    status = forms.ChoiceField(choices=[('', 'Any status'), ('approved', 'Approved'), ('pending', 'Pending')])
+    created_from = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    created_to = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def apply(self, queryset, data):
+        if data['q']:
+            queryset = queryset.filter(pk__in=search.matching(search.APPOINTMENT, data['q']))
+        if data['status']:
+            queryset = queryset.filter(status=data['status'] == 'approved')
+        if data['created_from']:
+            queryset = queryset.filter(createdDate__gte=data['created_from'])
+        if data['created_to']:
+            queryset = queryset.filter(createdDate__lte=data['created_to'])
+        return queryset
+
+
+class ExportForm(ListingFilterForm):
+    """Format and filters for the streaming exports"""
+    format = forms.ChoiceField(choices=[(name, name.upper()) for name in exports.FORMATS])
+    date_from = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    doctor = forms.IntegerField(min_value=1)
+
+    def clean_format(self):
+        fmt = self.cleaned_data['format'] or 'csv'
+        if fmt not in exports.available_formats():
+            raise ValidationError(f'{fmt.upper()} export is not available on this server.')
+        return fmt
+
+    def clean(self):
+        data = super().clean()
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise ValidationError('The start date must not be after the end date.')
+        return data
+
+
+class ReportForm(ListingFilterForm):
+    """Date range of the reports page, the last 30 days unless given"""
+    date_from = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def date_range(self):
+        data = self.cleaned_data if self.is_valid() else {}
+        date_to = data.get('date_to') or date.today()
+        date_from = data.get('date_from') or date_to - timedelta(days=29)
+        return min(date_from, date_to), max(date_from, date_to)
+
+
+class ImportForm(forms.Form):
+    """CSV upload for the bulk import queue; the rows are checked when the job runs"""
+    kind = forms.ChoiceField(choices=models.ImportJob.KINDS, widget=forms.Select(attrs={'class': FILTER_INPUT_CLASS}))
+    file = forms.FileField(validators=[FileExtensionValidator(['csv'])],
+                           widget=forms.FileInput(attrs={'accept': '.csv,text/csv', 'class': FILTER_INPUT_CLASS}))
@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+
+# Bumping this one invalidates every fragment, for writes that bypass signals
+GLOBAL_SCOPE = 'all'
+
+
+def _key(scope):
+    return f'hospital:fragver:{scope}'
+
+
+def scope_name(kind, *parts):
+    return ':'.join([kind, *(str(part) for part in parts)])
+
+
+def _fresh():
+    # Never restart from a small number after eviction: old fragments could
+    # still be cached under it
+    return time.time_ns()
+
+
+def _version_keys(kind, parts):
+    return [_key(GLOBAL_SCOPE), _key(scope_name(kind, *parts))]
+
+
+def fragment_version(kind, *parts):
+    """Version string for a cache fragment; changes whenever its scope is bumped"""
+    keys = _version_keys(kind, parts)
+    versions = cache.get_many(keys)
+    missing = {key: _fresh() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return f'{versions[keys[0]]}.{versions[keys[1]]}'
+
+
+async def afragment_version(kind, *parts):
+    """fragment_version() for async views, through the async cache API"""
+    keys = _version_keys(kind, parts)
+    versions = await cache.aget_many(keys)
+    missing = {key: _fresh() for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, None)
+        versions.update(missing)
+    return f'{versions[keys[0]]}.{versions[keys[1]]}'
+
+
+def _advance(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh(), None)
+
+
+def bump(kind, *parts):
+    """Invalidate every fragment rendered for this scope"""
+    key = _key(scope_name(kind, *parts))
+    _advance(key)
+    # Again once committed, in case a reader re-cached the old rows meanwhile
+    transaction.on_commit(lambda: _advance(key))
+
+
+def bump_all():
+    bump(GLOBAL_SCOPE)
+
+
+def fragment_timeout():
+    return getattr(settings, 'HOSPITAL_FRAGMENT_TIMEOUT', 600)
+
+
+def _fragment_cache():
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+async def acached_fragments(*fragments):
+    """
+    The cached HTML of each (fragment_name, *vary_on) that a {% cache %} block
+    stores, or None where it is missing, in one async round trip. An async
+    view renders the HTML it got here instead of letting the template ask
+    again, so a fragment that expires in between never leaves the view
+    without the rows that block needs.
+    """
+    keys = [make_template_fragment_key(name, vary_on) for name, *vary_on in fragments]
+    found = await _fragment_cache().aget_many(keys)
+    return [found.get(key) for key in keys]
+
+
+# Invalidation, wired up in hospital.signals
+def remember_owners(instance):
+    instance._fragment_owners = (instance.__dict__.get('doctor_id'), instance.__dict__.get('patient_id'))
+
+
+def appointment_changed(instance):
+    previous_doctor, previous_patient = getattr(instance, '_fragment_owners', (None, None))
+    bump('dashboard')
+    for doctor_id in {previous_doctor, instance.doctor_id} - {None}:
+        bump('doctor', doctor_id)
+    for patient_id in {previous_patient, instance.patient_id} - {None}:
+        bump('patient', patient_id)
+    remember_owners(instance)
+
+
+def doctor_changed(instance):
+    bump('dashboard')
+    bump('doctor', instance.pk)
+
+
+def patient_changed(instance):
+    bump('dashboard')
+    bump('patient', instance.pk)
+
+
+def admin_approval_changed(instance):
+    bump('dashboard')
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth import hashers
+from django.db import close_old_connections
+
+from . import asyncdb
+
+
+# Hashers whose cost comes from settings. They keep the stock algorithm names,
+# so raising a cost makes must_update() true and Django rehashes the password
+# the next time its owner logs in.
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.HOSPITAL_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.HOSPITAL_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.HOSPITAL_ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.HOSPITAL_SCRYPT_WORK_FACTOR
+
+
+class LoginBusy(Exception):
+    """Too many logins are already waiting for a hashing thread"""
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = settings.HOSPITAL_LOGIN_HASH_THREADS or os.cpu_count() or 1
+                _slots = threading.BoundedSemaphore(workers + settings.HOSPITAL_LOGIN_HASH_QUEUE)
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _pool, _slots
+
+
+def _authenticate(request, credentials):
+    try:
+        return authenticate(request, **credentials)
+    finally:
+        # Pool threads outlive requests, so tidy their connections like a request would
+        close_old_connections()
+
+
+def _reserve():
+    pool, slots = _executor()
+    if not slots.acquire(blocking=False):
+        raise LoginBusy('Too many logins in progress.')
+    return pool, slots
+
+
+def submit_authenticate(request, **credentials):
+    """
+    Run authenticate() on the bounded hashing pool and return its Future.
+    The hashers release the GIL, so the pool hashes on every core while never
+    running more hashes at once than there are threads; LoginBusy is raised
+    instead of queueing past HOSPITAL_LOGIN_HASH_QUEUE waiting logins.
+    """
+    pool, slots = _reserve()
+    future = pool.submit(_authenticate, request, credentials)
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _authenticate_here(request, credentials):
+    _, slots = _reserve()
+    try:
+        return authenticate(request, **credentials)
+    finally:
+        slots.release()
+
+
+async def aauthenticate_bounded(request, **credentials):
+    """authenticate() for async views; the event loop keeps serving while the hash runs"""
+    if await sync_to_async(asyncdb.in_transaction)():
+        # As in asyncdb.gather: a pool thread could not see the transaction's
+        # rows, so the hash runs on the request's thread, still within the bound
+        return await sync_to_async(_authenticate_here)(request, credentials)
+    return await asyncio.wrap_future(submit_authenticate(request, **credentials))
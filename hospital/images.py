@@ -0,0 +1,180 @@
+import os
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Doctor, Patient, ProfileImageJob
+
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp', 'tiff']
+
+# Attempts before a job that keeps crashing is given up on
+MAX_ATTEMPTS = 3
+
+# A job claimed this long ago belongs to a worker that died
+STALE_AFTER = timedelta(minutes=10)
+
+
+class InvalidImage(Exception):
+    """The staged upload is not an image Pillow can safely decode"""
+
+
+def staging_storage():
+    # Outside MEDIA_ROOT so unvalidated uploads are never served
+    return FileSystemStorage(location=settings.HOSPITAL_UPLOAD_STAGING_ROOT)
+
+
+def image_settings():
+    return {
+        'max_size': settings.HOSPITAL_PROFILE_IMAGE_SIZE,
+        'thumbnail_size': settings.HOSPITAL_PROFILE_THUMBNAIL_SIZE,
+        'quality': settings.HOSPITAL_PROFILE_IMAGE_QUALITY,
+    }
+
+
+# Request side
+def detach_upload(form, field='profile_pic'):
+    """
+    Take a new upload off the form's unsaved instance so saving it does not
+    write the file; the instance keeps its previous picture until the job runs.
+    """
+    upload = form.cleaned_data.get(field)
+    if not isinstance(upload, UploadedFile):
+        return None
+    setattr(form.instance, field, form.initial.get(field))
+    return upload
+
+
+def stage_upload(owner, upload):
+    """Move the upload into the staging area and queue it for processing"""
+    if upload is None:
+        return None
+    extension = os.path.splitext(upload.name)[1].lower()
+    # Temporary uploads are moved, not copied; small in-memory ones are written in chunks
+    staged_name = staging_storage().save(f'{uuid.uuid4().hex}{extension}', upload)
+    owner_field = 'doctor' if isinstance(owner, Doctor) else 'patient'
+    return ProfileImageJob.objects.create(staged_name=staged_name, original_name=os.path.basename(upload.name),
+                                          **{owner_field: owner})
+
+
+def enqueue_existing():
+    """Queue pictures saved before thumbnails existed; returns how many were queued"""
+    storage = staging_storage()
+    queued = 0
+    for model in (Doctor, Patient):
+        owners = model.objects.exclude(profile_pic='').exclude(profile_pic__isnull=True).filter(
+            Q(profile_thumbnail='') | Q(profile_thumbnail__isnull=True)).exclude(image_jobs__state__in=[
+                ProfileImageJob.PENDING, ProfileImageJob.PROCESSING])
+        for owner in owners.iterator():
+            try:
+                with owner.profile_pic.open('rb') as original:
+                    extension = os.path.splitext(original.name)[1].lower()
+                    staged_name = storage.save(f'{uuid.uuid4().hex}{extension}', File(original))
+            except FileNotFoundError:
+                continue
+            ProfileImageJob.objects.create(staged_name=staged_name,
+                                           original_name=os.path.basename(owner.profile_pic.name),
+                                           **{model._meta.model_name: owner})
+            queued += 1
+    return queued
+
+
+# Worker side; render_profile_image runs in a child process, the rest in the parent
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        from PIL import Image
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, quality):
+    buffer = BytesIO()
+    # No exif= argument, so EXIF (GPS, device, timestamps) is not written back
+    image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render_profile_image(path, max_size, thumbnail_size, quality):
+    """Decode, re-encode and thumbnail one staged upload; returns (image, thumbnail) JPEG bytes"""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        with Image.open(path) as image:
+            # JPEGs can be decoded straight at a reduced scale, which is much cheaper
+            image.draft('RGB', (max_size, max_size))
+            image = ImageOps.exif_transpose(image)
+            image = _flatten(image)
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise InvalidImage(str(exc) or exc.__class__.__name__)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    thumbnail = ImageOps.fit(image, (thumbnail_size, thumbnail_size), Image.LANCZOS)
+    return _encode(image, quality), _encode(thumbnail, quality)
+
+
+def claim_jobs(limit):
+    """Mark up to limit queued jobs as processing by this worker and return them"""
+    now = timezone.now()
+    claimable = Q(state=ProfileImageJob.PENDING) | Q(state=ProfileImageJob.PROCESSING,
+                                                     claimed_date__lt=now - STALE_AFTER)
+    with transaction.atomic():
+        queue = ProfileImageJob.objects.filter(claimable).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            queue = queue.select_for_update(skip_locked=True)
+        ids = list(queue.values_list('id', flat=True)[:limit])
+        ProfileImageJob.objects.filter(claimable, id__in=ids).update(
+            state=ProfileImageJob.PROCESSING, claimed_date=now, attempts=F('attempts') + 1)
+    return list(ProfileImageJob.objects.filter(id__in=ids, state=ProfileImageJob.PROCESSING, claimed_date=now)
+                .select_related('doctor__user', 'patient__user').order_by('id'))
+
+
+def staged_path(job):
+    return staging_storage().path(job.staged_name)
+
+
+def _discard_staged(job):
+    staging_storage().delete(job.staged_name)
+
+
+def finish_job(job, image_bytes, thumbnail_bytes):
+    """Store the processed picture and thumbnail on the owner and close the job"""
+    owner = job.owner
+    if owner is None:
+        job.delete()
+        _discard_staged(job)
+        return
+    previous = {owner.profile_pic.name, owner.profile_thumbnail.name} - {None, ''}
+    base = os.path.splitext(job.original_name or job.staged_name)[0] or 'profile'
+    owner.profile_pic.save(f'{base}.jpg', ContentFile(image_bytes), save=False)
+    owner.profile_thumbnail.save(f'{base}.jpg', ContentFile(thumbnail_bytes), save=False)
+    # A regular save, so the signals refresh the cached dashboards showing this
+    # picture; auto_now only stamps updated_at (the API's ETag) when it is listed
+    owner.save(update_fields=['profile_pic', 'profile_thumbnail', 'updated_at'])
+    for name in previous - {owner.profile_pic.name, owner.profile_thumbnail.name}:
+        owner.profile_pic.storage.delete(name)
+    job.state = ProfileImageJob.DONE
+    job.error = ''
+    job.save(update_fields=['state', 'error'])
+    _discard_staged(job)
+
+
+def fail_job(job, error, retry=False):
+    """Record why a job failed; retry puts it back in the queue until MAX_ATTEMPTS"""
+    job.error = str(error)
+    if retry and job.attempts < MAX_ATTEMPTS:
+        job.state = ProfileImageJob.PENDING
+    else:
+        job.state = ProfileImageJob.FAILED
+        _discard_staged(job)
+    job.save(update_fields=['state', 'error'])
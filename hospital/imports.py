@@ -0,0 +1,414 @@
+import csv
+import os
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import choices, fragments, search, stats
+from .images import staging_storage
+from .models import Appointment, Doctor, ImportJob, Patient
+from .validators import validate_mobile, validate_password
+
+# Staged uploads and error reports live here, inside the upload staging area
+IMPORT_DIR = 'imports'
+
+
+# Spellings accepted in boolean columns, compared case-insensitively
+BOOLEANS = {'true': True, 't': True, 'yes': True, 'y': True, '1': True,
+            'false': False, 'f': False, 'no': False, 'n': False, '0': False}
+
+
+class ImportFailed(Exception):
+    """The file as a whole cannot be imported (unreadable, wrong columns)"""
+
+
+@contextmanager
+def without_auto_now(model, *field_names):
+    """Let bulk inserts keep historical dates in auto_now and auto_now_add fields"""
+    fields = [(field, field.auto_now, field.auto_now_add)
+              for field in map(model._meta.get_field, field_names)]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@dataclass(frozen=True)
+class Column:
+    """
+    One CSV column, cleaned with the rules of the model field it fills (the
+    ones the signup ModelForms apply) plus any extra validators. Columns
+    without a model field are passed through as stripped text.
+    """
+    name: str
+    model: type = None
+    field: str = None
+    required: bool = False
+    validators: tuple = ()
+
+    def clean(self, raw):
+        raw = (raw or '').strip()
+        model_field = self.model._meta.get_field(self.field) if self.model else None
+        if not raw:
+            if self.required or (model_field is not None and not model_field.blank
+                                 and not model_field.has_default()):
+                raise ValidationError('This field is required.')
+            return model_field.get_default() if model_field is not None else None
+        if isinstance(model_field, models.BooleanField):
+            if raw.lower() not in BOOLEANS:
+                raise ValidationError(f'“{raw}” must be true or false.')
+            raw = BOOLEANS[raw.lower()]
+        value = model_field.clean(raw, None) if model_field is not None else raw
+        for validator in self.validators:
+            validator(value)
+        return value
+
+
+USER_COLUMNS = (
+    Column('username', User, 'username', required=True),
+    Column('first_name', User, 'first_name'),
+    Column('last_name', User, 'last_name'),
+    # Left empty, the account gets an unusable password and must be reset
+    Column('password', validators=(validate_password,)),
+)
+
+
+class Importer:
+    columns = ()
+
+    @property
+    def header(self):
+        return [column.name for column in self.columns]
+
+    def check_header(self, fieldnames):
+        if not fieldnames:
+            raise ImportFailed('The file is empty.')
+        unknown = [name for name in fieldnames if name not in self.header]
+        if unknown:
+            raise ImportFailed(f'Unknown columns: {", ".join(unknown)}. Expected: {", ".join(self.header)}.')
+        missing = [column.name for column in self.columns if column.required and column.name not in fieldnames]
+        if missing:
+            raise ImportFailed(f'Missing required columns: {", ".join(missing)}.')
+
+    def clean(self, raw):
+        """Cleaned values and a list of (column, message) problems for one row"""
+        values, problems = {}, []
+        if None in raw:
+            problems.append(('', 'The row has more fields than the header.'))
+        for column in self.columns:
+            try:
+                values[column.name] = column.clean(raw.get(column.name))
+            except ValidationError as exc:
+                problems.append((column.name, ' '.join(exc.messages)))
+        return values, problems
+
+    def resolve(self, rows):
+        """Check a cleaned batch against the database; returns (rows, rejected) with one query per lookup"""
+        return rows, []
+
+    def prepare(self, rows, pool):
+        """CPU work done before the batch's transaction opens"""
+
+    def create(self, rows):
+        raise NotImplementedError
+
+
+class UserImporter(Importer):
+    def resolve(self, rows):
+        rejected = []
+        existing = set(User.objects.filter(username__in=[values['username'] for _, values in rows])
+                       .values_list('username', flat=True))
+        seen = set()
+        kept = []
+        for number, values in rows:
+            username = values['username']
+            if username in existing or username in seen:
+                rejected.append((number, [('username', 'A user with that username already exists.')]))
+                continue
+            seen.add(username)
+            kept.append((number, values))
+        return kept, rejected
+
+    def prepare(self, rows, pool):
+        passwords = [values['password'] for _, values in rows if values['password']]
+        # The hashers are deliberately slow, so hash in worker processes on every core
+        hashes = iter(pool.map(make_password, passwords, chunksize=64) if pool else map(make_password, passwords))
+        unusable = make_password(None)
+        for _, values in rows:
+            values['password_hash'] = next(hashes) if values['password'] else unusable
+
+    def create_users(self, rows):
+        users = [User(username=values['username'], first_name=values['first_name'],
+                      last_name=values['last_name'], password=values['password_hash']) for _, values in rows]
+        User.objects.bulk_create(users)
+        # Not every backend returns primary keys from bulk_create, so read them back
+        return dict(User.objects.filter(username__in=[user.username for user in users])
+                    .values_list('username', 'id'))
+
+
+class PatientImporter(UserImporter):
+    columns = USER_COLUMNS + (
+        Column('address', Patient, 'address'),
+        Column('mobile', Patient, 'mobile'),
+        Column('symptoms', Patient, 'symptoms'),
+        Column('status', Patient, 'status'),
+        Column('assigned_doctor'),
+        Column('admit_date', Patient, 'admitDate'),
+    )
+
+    def resolve(self, rows):
+        rows, rejected = super().resolve(rows)
+        # Same choices as the signup form: only bookable doctors
+        wanted = {values['assigned_doctor'] for _, values in rows if values['assigned_doctor']}
+        doctors = dict(choices.bookable_doctors().filter(user__username__in=wanted)
+                       .values_list('user__username', 'id'))
+        kept = []
+        for number, values in rows:
+            if values['assigned_doctor'] and values['assigned_doctor'] not in doctors:
+                rejected.append((number, [('assigned_doctor', 'No bookable doctor with this username.')]))
+                continue
+            values['assigned_doctor_id'] = doctors.get(values['assigned_doctor'])
+            kept.append((number, values))
+        return kept, rejected
+
+    def create(self, rows):
+        user_ids = self.create_users(rows)
+        today = date.today()
+        with without_auto_now(Patient, 'admitDate'):
+            Patient.objects.bulk_create([
+                Patient(user_id=user_ids[values['username']], address=values['address'], mobile=values['mobile'],
+                        symptoms=values['symptoms'], status=values['status'],
+                        assignedDoctor_id=values['assigned_doctor_id'], admitDate=values['admit_date'] or today)
+                for _, values in rows
+            ])
+        search.index(search.PATIENT, Patient.objects.filter(user_id__in=user_ids.values()).values_list('id', flat=True))
+        stats.adjust(total_patients=len(rows))
+
+
+class DoctorImporter(UserImporter):
+    columns = USER_COLUMNS + (
+        Column('address', Doctor, 'address'),
+        Column('mobile', Doctor, 'mobile', validators=(validate_mobile,)),
+        Column('department', Doctor, 'department'),
+        Column('status', Doctor, 'status'),
+        Column('is_approved', Doctor, 'is_approved'),
+    )
+
+    def create(self, rows):
+        user_ids = self.create_users(rows)
+        Doctor.objects.bulk_create([
+            Doctor(user_id=user_ids[values['username']], address=values['address'], mobile=values['mobile'],
+                   department=values['department'], status=values['status'], is_approved=values['is_approved'])
+            for _, values in rows
+        ])
+        search.index(search.DOCTOR, Doctor.objects.filter(user_id__in=user_ids.values()).values_list('id', flat=True))
+        stats.adjust(total_doctors=len(rows),
+                     pending_doctor_approvals=sum(1 for _, values in rows if not values['is_approved']))
+        choices.invalidate_doctor_choices()
+
+
+class AppointmentImporter(Importer):
+    columns = (
+        Column('patient', required=True),
+        Column('doctor', required=True),
+        Column('description', Appointment, 'description'),
+        Column('appointment_date', Appointment, 'appointmentDate'),
+        Column('appointment_time', Appointment, 'appointmentTime'),
+        Column('created_date', Appointment, 'createdDate'),
+        Column('status', Appointment, 'status'),
+        Column('accepted', Appointment, 'is_accepted_by_doctor'),
+    )
+
+    def resolve(self, rows):
+        patients = dict(Patient.objects.filter(user__username__in={values['patient'] for _, values in rows})
+                        .values_list('user__username', 'id'))
+        doctors = dict(Doctor.objects.filter(user__username__in={values['doctor'] for _, values in rows})
+                       .values_list('user__username', 'id'))
+        slots = [(doctors.get(values['doctor']), values['appointment_date'], values['appointment_time'])
+                 for _, values in rows]
+        days = {day for _, day, at in slots if day and at}
+        booked = set(Appointment.objects.filter(doctor_id__in=set(doctors.values()), appointmentDate__in=days)
+                     .values_list('doctor_id', 'appointmentDate', 'appointmentTime')) if days else set()
+
+        kept, rejected = [], []
+        for (number, values), slot in zip(rows, slots):
+            problems = []
+            if values['patient'] not in patients:
+                problems.append(('patient', 'No patient with this username.'))
+            if values['doctor'] not in doctors:
+                problems.append(('doctor', 'No doctor with this username.'))
+            elif slot[1] and slot[2] and slot in booked:
+                # The same rule as the appt_unique_doctor_slot constraint
+                problems.append(('appointment_time', 'The doctor already has an appointment in this slot.'))
+            if problems:
+                rejected.append((number, problems))
+                continue
+            # Only rows that will be inserted take their slot
+            if slot[1] and slot[2]:
+                booked.add(slot)
+            values['patient_id'] = patients[values['patient']]
+            values['doctor_id'] = doctors[values['doctor']]
+            kept.append((number, values))
+        return kept, rejected
+
+    def create(self, rows):
+        today = date.today()
+        with without_auto_now(Appointment, 'createdDate'):
+            appointments = Appointment.objects.bulk_create([
+                Appointment(patient_id=values['patient_id'], doctor_id=values['doctor_id'],
+                            description=values['description'], appointmentDate=values['appointment_date'],
+                            appointmentTime=values['appointment_time'], createdDate=values['created_date'] or today,
+                            status=values['status'], is_accepted_by_doctor=values['accepted'])
+                for _, values in rows
+            ])
+        # Backends that return no primary keys here need rebuild_search_index afterwards
+        search.index(search.APPOINTMENT, [appointment.pk for appointment in appointments if appointment.pk])
+        approved = sum(1 for _, values in rows if values['status'])
+        stats.adjust(total_appointments=len(rows), approved_appointments=approved,
+                     pending_appointments=len(rows) - approved)
+
+
+IMPORTERS = {
+    ImportJob.PATIENTS: PatientImporter(),
+    ImportJob.DOCTORS: DoctorImporter(),
+    ImportJob.APPOINTMENTS: AppointmentImporter(),
+}
+
+
+def _batch_size():
+    return getattr(settings, 'HOSPITAL_IMPORT_BATCH_SIZE', 500)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Jobs
+def stage_upload(kind, upload, user=None):
+    """Keep an uploaded CSV in the staging area and queue it for import_records"""
+    name = staging_storage().save(f'{IMPORT_DIR}/{uuid.uuid4().hex}.csv', upload)
+    return ImportJob.objects.create(kind=kind, source=staging_storage().path(name),
+                                    original_name=os.path.basename(upload.name), created_by=user)
+
+
+def job_for_file(kind, path, restart=False):
+    """The unfinished job for this file to resume, or a new one"""
+    source = os.path.abspath(path)
+    job = None
+    if not restart:
+        job = (ImportJob.objects.filter(kind=kind, source=source).exclude(state=ImportJob.DONE)
+               .order_by('-id').first())
+    return job or ImportJob.objects.create(kind=kind, source=source, original_name=os.path.basename(path))
+
+
+def claim_pending():
+    """The oldest queued upload, marked as processing so no other worker takes it"""
+    with transaction.atomic():
+        job = ImportJob.objects.filter(state=ImportJob.PENDING).order_by('id').first()
+        if job is None or not ImportJob.objects.filter(id=job.id, state=ImportJob.PENDING).update(
+                state=ImportJob.PROCESSING):
+            return None
+    job.state = ImportJob.PROCESSING
+    return job
+
+
+def error_report_path(job):
+    return staging_storage().path(f'{IMPORT_DIR}/{job.id}-errors.csv')
+
+
+class _ErrorReport:
+    """Rejected rows with their problems, appended batch by batch so a resumed job keeps them"""
+
+    def __init__(self, job, header):
+        self.path = error_report_path(job)
+        self.header = header
+
+    def write(self, rejected, raw_rows):
+        if not rejected:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        new = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle)
+            if new:
+                writer.writerow(['row', 'errors', *self.header])
+            for number, problems in rejected:
+                raw = raw_rows[number]
+                message = '; '.join(f'{column}: {text}' if column else text for column, text in problems)
+                writer.writerow([number, message, *(raw.get(name, '') for name in self.header)])
+
+
+def run(job, pool=None, batch_size=None, progress=None):
+    """
+    Import the job's CSV from its checkpoint on. Every batch is inserted and
+    its checkpoint advanced in one transaction, so after a failure the job
+    resumes exactly after the last committed batch.
+    """
+    importer = IMPORTERS[job.kind]
+    batch_size = batch_size or _batch_size()
+    ImportJob.objects.filter(id=job.id).update(state=ImportJob.PROCESSING, error='')
+    try:
+        with open(job.source, newline='', encoding='utf-8-sig') as handle:
+            reader = csv.DictReader(handle)
+            importer.check_header(reader.fieldnames)
+            report = _ErrorReport(job, importer.header)
+            rows = ((number, raw) for number, raw in enumerate(reader, start=1) if number > job.rows_done)
+            for batch in _batches(rows, batch_size):
+                _import_batch(job, importer, batch, pool, report)
+                if progress:
+                    progress(job)
+    except Exception as exc:
+        job.state = ImportJob.FAILED
+        job.error = str(exc) or exc.__class__.__name__
+        job.save(update_fields=['state', 'error'])
+        raise
+    job.state = ImportJob.DONE
+    job.finished_date = timezone.now()
+    job.save(update_fields=['state', 'finished_date'])
+    if job.source.startswith(os.path.abspath(staging_storage().location)):
+        os.remove(job.source)
+    return job
+
+
+def _import_batch(job, importer, batch, pool, report):
+    raw_rows = dict(batch)
+    cleaned, rejected = [], []
+    for number, raw in batch:
+        values, problems = importer.clean(raw)
+        if problems:
+            rejected.append((number, problems))
+        else:
+            cleaned.append((number, values))
+    if cleaned:
+        cleaned, conflicts = importer.resolve(cleaned)
+        rejected.extend(conflicts)
+    importer.prepare(cleaned, pool)
+
+    with transaction.atomic():
+        if cleaned:
+            importer.create(cleaned)
+            # Bulk inserts send no signals
+            fragments.bump_all()
+        job.rows_done = batch[-1][0]
+        job.imported += len(cleaned)
+        job.rejected += len(rejected)
+        job.save(update_fields=['rows_done', 'imported', 'rejected'])
+    report.write(sorted(rejected), raw_rows)
@@ -0,0 +1,282 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template as BackendTemplate, reraise
+
+logger = logging.getLogger('hospital.instrumentation')
+
+# Upper bounds, in seconds, of the request duration histogram
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current = ContextVar('hospital_request_metrics', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'HOSPITAL_INSTRUMENTATION', False)
+
+
+class RequestMetrics:
+    """What one request spent its time on"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # asyncdb.gather runs a request's queries on several threads at once
+        self._lock = threading.Lock()
+        self.db_time = 0.0
+        self.queries = 0
+        self.statements = {}
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    @property
+    def duplicate_queries(self):
+        # The same SQL shape run more than once is usually an N+1 in a loop
+        return sum(count - 1 for count in self.statements.values())
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.db_time += elapsed
+                self.queries += 1
+                self.statements[sql] = self.statements.get(sql, 0) + 1
+
+
+class _ViewStats:
+    __slots__ = ('requests', 'errors', 'duration', 'db_time', 'queries', 'duplicate_queries',
+                 'template_time', 'buckets')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.duration = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.duplicate_queries = 0
+        self.template_time = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+
+class MetricsRegistry:
+    """Per-view aggregates for this process plus a rolling log of slow requests"""
+
+    def __init__(self, slow_log_size=100):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.slow_requests = deque(maxlen=slow_log_size)
+
+    def record(self, view, status, duration, metrics):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = _ViewStats()
+            stats.requests += 1
+            if status >= 500:
+                stats.errors += 1
+            stats.duration += duration
+            stats.db_time += metrics.db_time
+            stats.queries += metrics.queries
+            stats.duplicate_queries += metrics.duplicate_queries
+            stats.template_time += metrics.template_time
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[index] += 1
+
+    def log_slow(self, entry):
+        with self._lock:
+            self.slow_requests.append(entry)
+
+    def slow_log(self):
+        with self._lock:
+            return list(reversed(self.slow_requests))
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self.slow_requests.clear()
+
+    def prometheus(self):
+        """The aggregates in the Prometheus text exposition format"""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            def family(name, kind, description, rows):
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(rows)
+
+            def label(view):
+                return view.replace('\\', '\\\\').replace('"', '\\"')
+
+            histogram = []
+            for view, stats in views:
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    histogram.append(f'hospital_request_duration_seconds_bucket{{view="{label(view)}",le="{bound}"}} {count}')
+                histogram.append(f'hospital_request_duration_seconds_bucket{{view="{label(view)}",le="+Inf"}} {stats.requests}')
+                histogram.append(f'hospital_request_duration_seconds_sum{{view="{label(view)}"}} {stats.duration:.6f}')
+                histogram.append(f'hospital_request_duration_seconds_count{{view="{label(view)}"}} {stats.requests}')
+            family('hospital_request_duration_seconds', 'histogram', 'Wall time per request.', histogram)
+
+            counters = (
+                ('hospital_requests_total', 'Requests handled.', 'requests', '{}'),
+                ('hospital_request_errors_total', 'Requests that ended in a 5xx response.', 'errors', '{}'),
+                ('hospital_db_seconds_total', 'Time spent executing SQL.', 'db_time', '{:.6f}'),
+                ('hospital_db_queries_total', 'SQL statements executed.', 'queries', '{}'),
+                ('hospital_db_duplicate_queries_total',
+                 'Statements whose SQL already ran earlier in the same request.', 'duplicate_queries', '{}'),
+                ('hospital_template_seconds_total', 'Time spent rendering templates.', 'template_time', '{:.6f}'),
+            )
+            for name, description, attribute, fmt in counters:
+                family(name, 'counter', description, [
+                    f'{name}{{view="{label(view)}"}} {fmt.format(getattr(stats, attribute))}'
+                    for view, stats in views
+                ])
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(getattr(settings, 'HOSPITAL_SLOW_REQUEST_LOG_SIZE', 100))
+
+
+class TimedTemplate(BackendTemplate):
+    """A template that adds its render time to the current request's metrics"""
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        # Only the outermost render counts; templates rendered inside it are part of its time
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, handing out TimedTemplate. Configured in
+    settings.TEMPLATES, so template time is measured without patching
+    Django's classes; outside an instrumented request it adds one lookup.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def _record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper on every connection. The request is found through the
+    context variable, which sync_to_async copies into whichever thread runs
+    the query, so queries on executor threads count towards their request too.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _wrap_connection(connection, **kwargs):
+    # Connections are per thread and reconnect, so each one is wrapped once as it opens
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class InstrumentationMiddleware:
+    """
+    Record wall time, SQL time, query and duplicate-query counts and template
+    render time per view. Switched on with settings.HOSPITAL_INSTRUMENTATION;
+    the numbers are served by the metrics views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.slow_threshold = getattr(settings, 'HOSPITAL_SLOW_REQUEST_MS', 500) / 1000
+        # Record the queries on every configured database, not just default
+        connection_created.connect(_wrap_connection, dispatch_uid='hospital_instrumentation')
+        for connection in connections.all(initialized_only=True):
+            _wrap_connection(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.started
+        view = _view_name(request)
+        registry.record(view, response.status_code, duration, metrics)
+        if duration >= self.slow_threshold:
+            self.slow_request(request, view, response, duration, metrics)
+        return response
+
+    def slow_request(self, request, view, response, duration, metrics):
+        entry = {
+            'time': time.time(),
+            'view': view,
+            'method': request.method,
+            # Never the query string: filters and searches carry patient names
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'queries': metrics.queries,
+            'duplicate_queries': metrics.duplicate_queries,
+            'template_ms': round(metrics.template_time * 1000, 2),
+        }
+        registry.log_slow(entry)
+        logger.warning(
+            'Slow request %(method)s %(path)s (%(view)s): %(duration_ms)sms, %(queries)s queries '
+            '(%(duplicate_queries)s duplicate), db %(db_ms)sms, templates %(template_ms)sms', entry
+        )
+
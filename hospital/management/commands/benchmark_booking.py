@@ -0,0 +1,133 @@
+import json
+import random
+import statistics
+import threading
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from hospital.database import describe
+from hospital.models import Doctor, Patient, Appointment
+from hospital.scheduling import SlotUnavailable, next_free_slots, reserve_slot
+
+FIXTURE_PREFIX = '__bench_booking_'
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Book appointments from N parallel clients against the configured database and report '
+        'throughput, latency and lock errors. Run it once per HOSPITAL_DB_ENGINE to compare '
+        'setups. It writes real rows, so point it at a scratch database; its fixtures are '
+        'deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Parallel booking clients (default 8)')
+        parser.add_argument('--bookings', type=int, default=25, help='Booking attempts per client (default 25)')
+        parser.add_argument('--doctors', type=int, default=4,
+                            help='Doctors the clients compete for; fewer means more slot conflicts (default 4)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        clients = max(options['clients'], 1)
+        self.cleanup()
+        try:
+            doctors, patients = self.create_fixtures(max(options['doctors'], 1), clients)
+            results = self.run(doctors, patients, max(options['bookings'], 1))
+        finally:
+            self.cleanup()
+
+        latencies = sorted(results['latencies'])
+        report = {
+            'database': describe(connection),
+            'clients': clients,
+            'booked': results['booked'],
+            'conflicts': results['conflicts'],
+            'lock_errors': results['lock_errors'],
+            'seconds': round(results['elapsed'], 3),
+            'bookings_per_second': round(results['booked'] / results['elapsed'], 1) if results['elapsed'] else 0,
+            'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        }
+        for key, value in report.items():
+            self.stdout.write(f'{key}: {value}')
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}.'))
+
+    def create_fixtures(self, doctor_count, patient_count):
+        password = make_password(None)
+        doctors = [
+            Doctor.objects.create(
+                user=User.objects.create(username=f'{FIXTURE_PREFIX}doctor{i}', first_name='Bench', password=password),
+                address='Bench', mobile='0000000000', status=True, is_approved=True,
+            )
+            for i in range(doctor_count)
+        ]
+        patients = [
+            Patient.objects.create(
+                user=User.objects.create(username=f'{FIXTURE_PREFIX}patient{i}', first_name='Bench', password=password),
+                address='Bench', mobile='0000000000', symptoms='Benchmark', status=True,
+            )
+            for i in range(patient_count)
+        ]
+        return doctors, patients
+
+    def cleanup(self):
+        # Cascades to the fixtures' profiles and appointments; signals keep the counters right
+        User.objects.filter(username__startswith=FIXTURE_PREFIX).delete()
+
+    def run(self, doctors, patients, bookings):
+        lock = threading.Lock()
+        results = {'booked': 0, 'conflicts': 0, 'lock_errors': 0, 'latencies': []}
+        start_line = threading.Barrier(len(patients) + 1)
+
+        def client(patient):
+            rng = random.Random(patient.id)
+            start_line.wait()
+            booked = conflicts = lock_errors = 0
+            latencies = []
+            try:
+                for _ in range(bookings):
+                    doctor = rng.choice(doctors)
+                    started = time.perf_counter()
+                    try:
+                        slots = next_free_slots(doctor=doctor, count=3)
+                        if not slots:
+                            conflicts += 1
+                            continue
+                        day, at, _ = rng.choice(slots)
+                        reserve_slot(Appointment(patient=patient, description='Benchmark booking'),
+                                     doctor, day, at, status=True)
+                        booked += 1
+                    except SlotUnavailable:
+                        conflicts += 1
+                    except OperationalError:
+                        lock_errors += 1
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                results['booked'] += booked
+                results['conflicts'] += conflicts
+                results['lock_errors'] += lock_errors
+                results['latencies'].extend(latencies)
+
+        threads = [threading.Thread(target=client, args=(patient,)) for patient in patients]
+        for thread in threads:
+            thread.start()
+        start_line.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        results['elapsed'] = time.perf_counter() - started
+        return results
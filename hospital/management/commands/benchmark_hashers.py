@@ -0,0 +1,69 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure password verification cost for every configured hasher: latency on one '
+        'thread and login throughput per core through a thread pool, the way the login '
+        'views hash.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Verifications per hasher and mode (default 20)')
+        parser.add_argument('--threads', type=int, default=os.cpu_count() or 1,
+                            help='Pool size for the throughput run (default: one per CPU)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        iterations = max(options['iterations'], 1)
+        threads = max(options['threads'], 1)
+        preferred = get_hashers()[0].algorithm
+        results = {}
+
+        for hasher in get_hashers():
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as exc:
+                # Optional backend (argon2-cffi, bcrypt) not installed
+                self.stdout.write(f'{hasher.algorithm}: skipped ({exc})')
+                continue
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                hasher.verify(PASSWORD, encoded)
+            latency = (time.perf_counter() - start) / iterations
+
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                start = time.perf_counter()
+                list(pool.map(lambda _: hasher.verify(PASSWORD, encoded), range(iterations * threads)))
+                elapsed = time.perf_counter() - start
+            throughput = iterations * threads / elapsed
+
+            results[hasher.algorithm] = {
+                'preferred': hasher.algorithm == preferred,
+                'latency_ms': round(latency * 1000, 2),
+                'logins_per_second': round(throughput, 1),
+                'logins_per_second_per_core': round(throughput / min(threads, os.cpu_count() or 1), 1),
+            }
+
+        self.stdout.write(f'{"hasher":<22} {"latency ms":>11} {"logins/s":>10} {"per core":>10}')
+        for algorithm, row in results.items():
+            marker = ' *' if row['preferred'] else ''
+            self.stdout.write(f'{algorithm + marker:<22} {row["latency_ms"]:>11} {row["logins_per_second"]:>10} '
+                              f'{row["logins_per_second_per_core"]:>10}')
+        self.stdout.write(f'* preferred (HOSPITAL_PASSWORD_HASHER={settings.HOSPITAL_PASSWORD_HASHER}); '
+                          f'throughput measured with {threads} threads')
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump({'threads': threads, 'hashers': results}, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}.'))
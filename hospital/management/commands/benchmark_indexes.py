@@ -0,0 +1,128 @@
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from hospital.models import Doctor, Patient, Appointment, AdminApproval
+
+INDEXED_MODELS = (Doctor, Patient, Appointment, AdminApproval)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def hot_queries(doctor, patient, today):
+    """(label, queryset, how to execute it) for every dashboard query shape"""
+    return [
+        ('doctor_dashboard pending',
+         Appointment.objects.filter(doctor=doctor, is_accepted_by_doctor=False).order_by('-createdDate')[:50], list),
+        ('doctor_dashboard accepted',
+         Appointment.objects.filter(doctor=doctor, is_accepted_by_doctor=True).order_by('-createdDate')[:50], list),
+        ('patient_dashboard',
+         Appointment.objects.filter(patient=patient).order_by('-createdDate')[:50], list),
+        ('admin_dashboard cancelled',
+         Appointment.objects.filter(status=False, appointmentDate__lt=today), lambda qs: qs.count()),
+        ('admin_appointments page',
+         Appointment.objects.order_by('-createdDate', '-id')[:26], list),
+        ('pending doctor approvals',
+         Doctor.objects.filter(is_approved=False).order_by('-id')[:50], list),
+        ('pending admin approvals',
+         AdminApproval.objects.filter(is_approved=False).order_by('-id')[:50], list),
+        ('pending patients',
+         Patient.objects.filter(status=False).order_by('-id')[:26], list),
+        ('approved doctor choices',
+         Doctor.objects.filter(status=True, is_approved=True).order_by('department'), list),
+        # Every doctor's appointments on a day, which the (doctor, date, time)
+        # constraint cannot seek and the pending-only partial index does not hold
+        ('rollup day rebuild',
+         Appointment.objects.filter(appointmentDate__in=[today, today - timedelta(days=1)]), list),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Show query plans and latency for the dashboard queries, with and without '
+        'the indexes declared in Meta.indexes. Run it against a seeded database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Executions per query (default 20)')
+        parser.add_argument('--no-compare', action='store_true',
+                            help='Only measure the current schema, do not drop the indexes for a baseline')
+        parser.add_argument('--no-plans', action='store_true', help='Skip the EXPLAIN output')
+
+    def handle(self, *args, **options):
+        doctor = Doctor.objects.order_by('id').first()
+        patient = Patient.objects.order_by('id').first()
+        if doctor is None or patient is None:
+            raise CommandError('Seed some doctors, patients and appointments first.')
+        queries = hot_queries(doctor, patient, date.today())
+
+        self.stdout.write(f'Database: {connection.vendor}, {Appointment.objects.count()} appointments')
+        self.analyze()
+        after = self.measure(queries, options, 'with indexes')
+        if options['no_compare']:
+            self.report(after, None)
+            return
+
+        before = None
+        # SQLite refuses schema changes inside a transaction unless foreign key
+        # checks were switched off before it started
+        connection.disable_constraint_checking()
+        try:
+            with transaction.atomic():
+                with connection.schema_editor(atomic=False) as schema_editor:
+                    for model in INDEXED_MODELS:
+                        for index in model._meta.indexes:
+                            schema_editor.remove_index(model, index)
+                self.analyze()
+                before = self.measure(queries, options, 'without indexes')
+                # Dropping the indexes was only for the baseline
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            connection.enable_constraint_checking()
+        self.report(after, before)
+
+    def analyze(self):
+        # Fresh planner statistics, so both runs are judged on the same footing
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def measure(self, queries, options, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {title} =='))
+        results = {}
+        for label, queryset, execute in queries:
+            if not options['no_plans']:
+                self.stdout.write(self.style.MIGRATE_LABEL(label))
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f'    {line}')
+            execute(queryset.all())  # warm the page cache
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                execute(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[label] = (
+                statistics.median(timings),
+                timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            )
+        return results
+
+    def report(self, after, before):
+        self.stdout.write(self.style.MIGRATE_HEADING('\n== latency (ms) =='))
+        if before is None:
+            self.stdout.write(f'{"query":<28}{"p50":>10}{"p95":>10}')
+            for label, (p50, p95) in after.items():
+                self.stdout.write(f'{label:<28}{p50:>10.2f}{p95:>10.2f}')
+            return
+        self.stdout.write(f'{"query":<28}{"p50 before":>12}{"p50 after":>12}{"speedup":>10}')
+        for label, (p50, _) in after.items():
+            baseline = before[label][0]
+            speedup = baseline / p50 if p50 else float('inf')
+            self.stdout.write(f'{label:<28}{baseline:>12.2f}{p50:>12.2f}{speedup:>9.1f}x')
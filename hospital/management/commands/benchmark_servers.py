@@ -0,0 +1,200 @@
+import http.client
+import importlib
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+FIXTURE_USERNAME = '__bench_servers_admin'
+
+PAGES = ['admin-dashboard', 'admin-doctors', 'admin-patients', 'admin-appointments']
+
+# How each server is started; {port}, {workers} and {threads} are filled in per run
+SERVERS = {
+    'uvicorn': ('uvicorn', ['-m', 'uvicorn', 'hospital_management.asgi:application',
+                            '--host', '127.0.0.1', '--port', '{port}', '--workers', '{workers}',
+                            '--log-level', 'warning', '--no-access-log']),
+    'gunicorn': ('gunicorn', ['-m', 'gunicorn', 'hospital_management.wsgi:application',
+                              '--bind', '127.0.0.1:{port}', '--workers', '{workers}',
+                              '--threads', '{threads}', '--log-level', 'warning']),
+}
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests per second for the dashboards and admin listings under uvicorn '
+        '(ASGI, async views on the event loop) and gunicorn (WSGI, one thread per request). '
+        'Each server is started against the configured database, which must be shared between '
+        'processes; a fixture admin and its session are created and deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='uvicorn,gunicorn',
+                            help=f'Comma-separated servers to run (default uvicorn,gunicorn; known: {", ".join(SERVERS)})')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes per server (default: one per CPU)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker (default 4)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Parallel keep-alive clients (default 16)')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per client and page (default 100)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE == 'django.contrib.sessions.backends.cache' and \
+                settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            raise CommandError('Sessions in a local-memory cache are not shared with the server processes; '
+                               'set HOSPITAL_SESSION_ENGINE or HOSPITAL_CACHE_BACKEND.')
+        names = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in SERVERS]
+        if unknown:
+            raise CommandError(f'Unknown server(s): {", ".join(unknown)}')
+
+        paths = [reverse(name) for name in PAGES]
+        results = {}
+        user, cookie = self.create_fixture()
+        try:
+            for name in names:
+                module, _ = SERVERS[name]
+                if importlib.util.find_spec(module) is None:
+                    self.stdout.write(f'{name}: skipped (not installed)')
+                    continue
+                results[name] = self.run_server(name, paths, cookie, options)
+        finally:
+            user.delete()
+
+        self.stdout.write(f'{"server":<10} {"page":<22} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"errors":>7}')
+        for name, pages in results.items():
+            for path, row in pages.items():
+                self.stdout.write(f'{name:<10} {path:<22} {row["requests_per_second"]:>9} {row["p50_ms"]:>8} '
+                                  f'{row["p95_ms"]:>8} {row["errors"]:>7}')
+
+        if options['output']:
+            report = {
+                'workers': options['workers'],
+                'threads': options['threads'],
+                'concurrency': options['concurrency'],
+                'servers': results,
+            }
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}.'))
+
+    def create_fixture(self):
+        User.objects.filter(username=FIXTURE_USERNAME).delete()
+        user = User.objects.create(username=FIXTURE_USERNAME, first_name='Bench', is_superuser=True,
+                                   password=make_password(None))
+        # Log in the way django.contrib.auth.login() would, without a request
+        session = importlib.import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return user, f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def run_server(self, name, paths, cookie, options):
+        port = free_port()
+        _, arguments = SERVERS[name]
+        arguments = [argument.format(port=port, workers=max(options['workers'], 1),
+                                     threads=max(options['threads'], 1)) for argument in arguments]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                        'hospital_management.settings'))
+        process = subprocess.Popen([sys.executable, *arguments], cwd=settings.BASE_DIR, env=env)
+        try:
+            self.wait_until_up(process, port, paths[0], cookie)
+            return {path: self.load(port, path, cookie, options) for path in paths}
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def wait_until_up(self, process, port, path, cookie, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'Server exited with status {process.returncode}.')
+            try:
+                status = self.fetch(http.client.HTTPConnection('127.0.0.1', port, timeout=5), path, cookie)
+            except OSError:
+                time.sleep(0.2)
+                continue
+            if status != 200:
+                raise CommandError(f'{path} answered {status}; is the database shared with the server?')
+            return
+        raise CommandError(f'Server did not start within {timeout} seconds.')
+
+    def fetch(self, connection, path, cookie):
+        connection.request('GET', path, headers={'Cookie': cookie})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def load(self, port, path, cookie, options):
+        clients = max(options['concurrency'], 1)
+        per_client = max(options['requests'], 1)
+        lock = threading.Lock()
+        latencies = []
+        errors = 0
+        start_line = threading.Barrier(clients + 1)
+
+        def client():
+            nonlocal errors
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            timings, failed = [], 0
+            start_line.wait()
+            for _ in range(per_client):
+                started = time.perf_counter()
+                try:
+                    if self.fetch(connection, path, cookie) != 200:
+                        failed += 1
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                timings.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                latencies.extend(timings)
+                errors += failed
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        start_line.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0,
+            'p50_ms': round(statistics.median(latencies) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        }
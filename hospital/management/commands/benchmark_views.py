@@ -0,0 +1,190 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from hospital.models import Doctor, Patient, Appointment, AdminApproval, ImportJob
+from hospital.roles import invalidate_roles
+
+ROLES = ('anonymous', 'patient', 'doctor', 'admin')
+
+# URL names that are not part of the hospital app's own pages, or that need
+# files the fixtures cannot provide (derivatives are cut from an uploaded picture)
+SKIPPED_URLS = {'logout', 'profile-derivative'}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every named URL in the project as each role through the test client and '
+        'report p50/p95 latency and query counts. Nothing is written: the run happens '
+        'inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Requests per URL and role (default 20)')
+        parser.add_argument('--roles', default=','.join(ROLES), help=f'Comma separated subset of {", ".join(ROLES)}')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare against a JSON file written by --output')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 slowdown against the baseline, as a fraction (default 0.25)')
+
+    def handle(self, *args, **options):
+        roles = [role.strip() for role in options['roles'].split(',') if role.strip()]
+        unknown = set(roles) - set(ROLES)
+        if unknown:
+            raise CommandError(f'Unknown roles: {", ".join(sorted(unknown))}')
+
+        results = {}
+        fixture_user_ids = []
+        try:
+            with transaction.atomic():
+                fixtures = self.create_fixtures()
+                fixture_user_ids = list(User.objects.filter(username__startswith='__bench_').values_list('id', flat=True))
+                clients = self.make_clients(fixtures)
+                for name, url in self.urls(fixtures):
+                    for role in roles:
+                        results[f'{name} [{role}]'] = self.measure(clients[role], url, options['iterations'])
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            # The rolled-back ids can be handed out again, so forget their cached roles
+            invalidate_roles(*fixture_user_ids)
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}')
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    def create_fixtures(self):
+        """Users for each role plus rows for the URLs that take an id"""
+        def user(username, **extra):
+            return User.objects.create_user(username, password='benchmark-password',
+                                            first_name='Bench', last_name=username, **extra)
+
+        admin = user('__bench_admin', is_superuser=True, is_staff=True)
+        doctor = Doctor.objects.create(user=user('__bench_doctor'), address='Bench', mobile='9000000000',
+                                       status=True, is_approved=True)
+        patient = Patient.objects.create(user=user('__bench_patient'), address='Bench', mobile='9000000001',
+                                         symptoms='Benchmark', assignedDoctor=doctor)
+        pending_doctor = Doctor.objects.create(user=user('__bench_pending_doctor'), address='Bench',
+                                               mobile='9000000002')
+        pending_admin = AdminApproval.objects.create(user=user('__bench_pending_admin'))
+        appointment = Appointment.objects.create(patient=patient, doctor=doctor, description='Benchmark',
+                                                 status=True)
+        import_job = ImportJob.objects.create(kind=ImportJob.PATIENTS, source='benchmark.csv', state=ImportJob.DONE,
+                                              created_by=admin)
+        return {
+            'admin': admin,
+            'doctor': doctor,
+            'patient': patient,
+            'appointment_id': appointment.id,
+            'doctor_id': pending_doctor.id,
+            'admin_id': pending_admin.id,
+            'patient_id': patient.id,
+            'job_id': import_job.id,
+            # JSON API and export URLs
+            'resource': 'appointments',
+            'pk': appointment.id,
+            'dataset': 'appointments',
+        }
+
+    def make_clients(self, fixtures):
+        host = {'HTTP_HOST': 'localhost'}
+        clients = {'anonymous': Client(**host)}
+        for role, account in (('admin', fixtures['admin']),
+                              ('doctor', fixtures['doctor'].user),
+                              ('patient', fixtures['patient'].user)):
+            client = Client(**host)
+            client.force_login(account)
+            clients[role] = client
+        return clients
+
+    def urls(self, fixtures):
+        """(name, path) for every named URL pattern, with ids filled in from the fixtures"""
+        for pattern in get_resolver().url_patterns:
+            if isinstance(pattern, URLResolver) or not isinstance(pattern, URLPattern):
+                continue
+            name = pattern.name
+            if not name or name in SKIPPED_URLS:
+                continue
+            # Named groups cover both path() converters and re_path() patterns
+            missing = set(pattern.pattern.regex.groupindex) - set(fixtures)
+            if missing:
+                raise CommandError(f'No fixture for {", ".join(sorted(missing))} in URL {name!r}; '
+                                   f'add one in create_fixtures or list the URL in SKIPPED_URLS')
+            kwargs = {key: fixtures[key] for key in pattern.pattern.regex.groupindex}
+            yield name, reverse(name, kwargs=kwargs)
+
+    def measure(self, client, url, iterations):
+        timings, queries, status = [], [], None
+        for iteration in range(iterations + 1):
+            # Each request runs in a savepoint so views that act on GET change nothing
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        response = client.get(url)
+                        raise _Rollback
+                except _Rollback:
+                    pass
+                elapsed = (time.perf_counter() - started) * 1000
+            if iteration == 0:
+                continue  # warm-up
+            timings.append(elapsed)
+            queries.append(len(captured.captured_queries))
+            status = response.status_code
+        timings.sort()
+        return {
+            'status': status,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'queries': max(queries),
+        }
+
+    def report(self, results):
+        self.stdout.write(f'{"view [role]":<48}{"status":>7}{"p50 ms":>10}{"p95 ms":>10}{"queries":>9}')
+        for key, row in results.items():
+            self.stdout.write(
+                f'{key:<48}{row["status"]:>7}{row["p50_ms"]:>10.2f}{row["p95_ms"]:>10.2f}{row["queries"]:>9}'
+            )
+
+    def compare(self, results, path, tolerance):
+        try:
+            with open(path) as handle:
+                baseline = json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+        regressions = []
+        for key, row in results.items():
+            previous = baseline.get(key)
+            if previous is None:
+                continue
+            if row['queries'] > previous['queries']:
+                regressions.append(f'{key}: {previous["queries"]} -> {row["queries"]} queries')
+            if row['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(f'{key}: p95 {previous["p95_ms"]:.2f} -> {row["p95_ms"]:.2f} ms')
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f'{len(regressions)} regression(s) against {path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path}'))
@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from hospital import billing
+from hospital.management.commands.export_data import date_argument
+from hospital.models import PatientDischargeDetails
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute day counts, room charges, doctor fees and totals of discharge records from their '
+        'dates and the department tariffs (HOSPITAL_BILLING_TARIFFS), a batch at a time, writing back '
+        'only the bills that changed. With --reconcile, instead check every stored total against '
+        'its components in one pass over the table. Batches are computed with numpy when the optional '
+        'extra from requirements-optional.txt is installed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=date_argument, help='First release date to bill (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=date_argument, help='Last release date to bill (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, help='Discharges per batch (default HOSPITAL_BILLING_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Only check that each total equals the sum of its components')
+        parser.add_argument('--fix', action='store_true', help='With --reconcile, rewrite the totals that do not add up')
+        parser.add_argument('--output', help='Write the result as JSON to this file')
+
+    def handle(self, *args, **options):
+        engine = 'numpy' if billing.has_numpy() else 'python'
+        if options['reconcile']:
+            result = billing.reconcile(chunk_size=options['batch_size'])
+            fixed = billing.fix_totals(result.mismatches) if options['fix'] and result.mismatches else 0
+            for pk, stored, expected in result.mismatches[:20]:
+                self.stdout.write(f'  discharge {pk}: total {stored}, components add up to {expected}')
+            if len(result.mismatches) > 20:
+                self.stdout.write(f'  ... and {len(result.mismatches) - 20} more')
+            self.stdout.write(self.style.SUCCESS(
+                f'Checked {result.checked} discharges ({engine}): {len(result.mismatches)} totals do not add up'
+                + (f', {fixed} fixed.' if options['fix'] else '.')))
+            report = {'engine': engine, 'checked': result.checked, 'fixed': fixed,
+                      'mismatches': [{'id': pk, 'total': stored, 'expected': expected}
+                                     for pk, stored, expected in result.mismatches]}
+        else:
+            queryset = PatientDischargeDetails.objects.all()
+            if options['date_from']:
+                queryset = queryset.filter(releaseDate__gte=options['date_from'])
+            if options['date_to']:
+                queryset = queryset.filter(releaseDate__lte=options['date_to'])
+            run = billing.bill(queryset, batch_size=options['batch_size'], dry_run=options['dry_run'])
+            if run.invalid:
+                self.stderr.write(f'{len(run.invalid)} discharges end before they start and were skipped: '
+                                  f'{", ".join(map(str, run.invalid[:20]))}')
+            verb = 'would change' if options['dry_run'] else 'updated'
+            self.stdout.write(self.style.SUCCESS(
+                f'Billed {run.checked} discharges ({engine}): {run.updated} {verb}, {len(run.invalid)} skipped.'))
+            report = {'engine': engine, 'checked': run.checked, 'updated': run.updated,
+                      'dry_run': options['dry_run'], 'invalid': run.invalid}
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}.'))
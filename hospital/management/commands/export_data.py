@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from hospital import exports
+
+
+def date_argument(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream appointments or discharge billing to a CSV, NDJSON or Parquet file in constant '
+        'memory, optionally limited to a date range (appointment date or release date) and a doctor.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(exports.DATASETS))
+        parser.add_argument('--format', default='csv', choices=list(exports.FORMATS),
+                            help='Output format (default csv; parquet needs pyarrow from requirements-optional.txt)')
+        parser.add_argument('--from', dest='date_from', type=date_argument, help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=date_argument, help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--doctor', type=int, help='Only rows for this doctor id')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Rows fetched and written at a time (default HOSPITAL_EXPORT_CHUNK_SIZE)')
+        parser.add_argument('--output', help='File to write; standard output when omitted (not for parquet)')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        if fmt == 'parquet' and not options['output']:
+            raise CommandError('Parquet is binary; pass --output.')
+        try:
+            chunks = exports.export(options['dataset'], fmt, options['date_from'], options['date_to'],
+                                    options['doctor'], chunk_size=options['chunk_size'])
+        except exports.ExportUnavailable as exc:
+            raise CommandError(str(exc))
+
+        if not options['output']:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {written} bytes to {options["output"]}.'))
@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hospital import imports
+from hospital.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import patients, doctors or historical appointments from a CSV file, or with --pending '
+        'the files uploaded on the admin import page. Rows are validated with the signup rules and '
+        'inserted in batched transactions; rejected rows go to an error report, and a failed run '
+        'resumes after the last committed batch when run again on the same file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', nargs='?', choices=[kind for kind, _ in ImportJob.KINDS])
+        parser.add_argument('csv', nargs='?', help='CSV file with a header row')
+        parser.add_argument('--restart', action='store_true',
+                            help='Start over instead of resuming an unfinished import of the same file')
+        parser.add_argument('--pending', action='store_true', help='Process queued admin uploads instead of a file')
+        parser.add_argument('--loop', action='store_true', help='With --pending, keep polling the queue')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+        parser.add_argument('--batch-size', type=int, help='Rows per transaction (default HOSPITAL_IMPORT_BATCH_SIZE)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Password hashing processes (default: one per CPU)')
+
+    def handle(self, *args, **options):
+        if options['pending'] == bool(options['kind'] and options['csv']):
+            raise CommandError('Give a kind and a CSV file, or --pending.')
+        if options['csv'] and not os.path.isfile(options['csv']):
+            raise CommandError(f'No such file: {options["csv"]}')
+
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            if not options['pending']:
+                job = imports.job_for_file(options['kind'], options['csv'], restart=options['restart'])
+                if job.rows_done:
+                    self.stdout.write(f'Resuming import {job.id} after row {job.rows_done}.')
+                if not self.run_job(job, pool, options):
+                    raise CommandError(f'Import {job.id} failed; run the same command again to resume.')
+                return
+            while True:
+                job = imports.claim_pending()
+                if job is None:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                self.run_job(job, pool, options)
+
+    def run_job(self, job, pool, options):
+        def progress(job):
+            self.stdout.write(f'  {job.rows_done} rows: {job.imported} imported, {job.rejected} rejected')
+
+        try:
+            imports.run(job, pool=pool, batch_size=options['batch_size'], progress=progress if options['verbosity'] > 1 else None)
+        except Exception as exc:
+            self.stderr.write(f'Import {job.id} ({job.original_name}): {exc.__class__.__name__}: {exc}')
+            return False
+        message = f'Import {job.id} ({job.original_name}): {job.imported} imported, {job.rejected} rejected.'
+        if job.rejected:
+            message += f' Error report: {imports.error_report_path(job)}'
+        self.stdout.write(self.style.SUCCESS(message))
+        return True
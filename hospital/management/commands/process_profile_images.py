@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from hospital import derivatives, images
+
+
+class Command(BaseCommand):
+    help = ('Validate, re-encode and thumbnail staged profile picture uploads. '
+            'Signups only stage the file; run this alongside the web workers, '
+            'with --loop to keep polling the queue.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Image decoding processes (default: one per CPU)')
+        parser.add_argument('--batch', type=int, default=50, help='Jobs claimed per round')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when the queue is empty')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+        parser.add_argument('--backfill', action='store_true',
+                            help='First queue existing pictures that have no thumbnail yet')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.stdout.write(f'Queued {images.enqueue_existing()} existing pictures.')
+
+        done = failed = 0
+        settings = images.image_settings()
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            while True:
+                jobs = images.claim_jobs(options['batch'])
+                if not jobs:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                futures = {pool.submit(images.render_profile_image, images.staged_path(job), **settings): job
+                           for job in jobs}
+                resizes = []
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        images.finish_job(job, *future.result())
+                    except images.InvalidImage as exc:
+                        images.fail_job(job, exc)
+                        failed += 1
+                        self.stderr.write(f'Job {job.id}: not a usable image ({exc}).')
+                        continue
+                    except Exception as exc:
+                        images.fail_job(job, exc, retry=True)
+                        failed += 1
+                        self.stderr.write(f'Job {job.id}: {exc.__class__.__name__}: {exc}')
+                        continue
+                    done += 1
+                    # Pre-render the responsive sizes so the first page view does not have to
+                    arguments = derivatives.prepare(job.owner.profile_pic.name) if job.owner else None
+                    if arguments:
+                        resizes.append(pool.submit(derivatives.build_all, *arguments))
+                for future in as_completed(resizes):
+                    try:
+                        future.result()
+                    except Exception as exc:
+                        # The view renders anything missing on first request
+                        self.stderr.write(f'Could not pre-render derivatives: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {done} pictures, {failed} failed.'))
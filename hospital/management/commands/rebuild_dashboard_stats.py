@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from hospital.fragments import bump
+from hospital.stats import COUNTERS, rebuild_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Recount the admin dashboard counter snapshot from the tables'
+
+    def handle(self, *args, **options):
+        counters = rebuild_snapshot()
+        bump('dashboard')
+        for name in COUNTERS:
+            self.stdout.write(f'{name}: {counters[name]}')
+        self.stdout.write(self.style.SUCCESS('Dashboard counters rebuilt.'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Bring the daily reporting rollups up to date: only the days that appointments or discharges '
+        'saved since the last run, or deleted or moved since, fall on are recounted. Run it from cron, '
+        'or with --loop next to the web workers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rollup', choices=list(rollups.ROLLUPS),
+                            help='Refresh only this rollup (default: all)')
+        parser.add_argument('--rebuild', action='store_true', help='Recount every day, ignoring the watermark')
+        parser.add_argument('--loop', action='store_true', help='Keep refreshing instead of exiting')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between refreshes with --loop')
+
+    def handle(self, *args, **options):
+        names = [options['rollup']] if options['rollup'] else list(rollups.ROLLUPS)
+        rebuild = options['rebuild']
+        while True:
+            for name in names:
+                started = time.perf_counter()
+                days = rollups.refresh(name, rebuild=rebuild)
+                self.stdout.write(f'{name}: {days} days recounted in {time.perf_counter() - started:.2f}s')
+            rebuild = False
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Rollups refreshed.'))
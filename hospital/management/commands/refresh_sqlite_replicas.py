@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from hospital.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the SQLite primary into every replica file from HOSPITAL_DB_REPLICAS with the '
+        'online backup API, standing in for replication when testing replica routing locally.'
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Replicas are only refreshed for SQLite; PostgreSQL replicates by itself.')
+        replicas = replica_aliases()
+        if not replicas:
+            raise CommandError('No replicas configured; set HOSPITAL_DB_REPLICAS.')
+
+        primary.ensure_connection()
+        for alias in replicas:
+            connections[alias].close()
+            name = connections[alias].settings_dict['NAME']
+            target = sqlite3.connect(name)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: copied to {name}')
+        self.stdout.write(self.style.SUCCESS('Replicas refreshed.'))
@@ -0,0 +1,221 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from hospital.models import Doctor, Patient, Appointment, PatientDischargeDetails, departments
+from hospital.billing import tariff
+from hospital.choices import invalidate_doctor_choices
+from hospital.fragments import bump_all
+from hospital.imports import without_auto_now
+from hospital.search import rebuild as rebuild_search_index
+from hospital.stats import rebuild_snapshot
+
+FIRST_NAMES = ['Aarav', 'Diya', 'Ishaan', 'Meera', 'Kabir', 'Anaya', 'Rohan', 'Saanvi', 'Vihaan', 'Zara',
+               'Arjun', 'Kiara', 'Dev', 'Myra', 'Neel', 'Riya', 'Yash', 'Tara', 'Om', 'Leela']
+LAST_NAMES = ['Patel', 'Shah', 'Mehta', 'Desai', 'Joshi', 'Rao', 'Iyer', 'Nair', 'Gupta', 'Kapoor']
+SYMPTOMS = ['Fever', 'Chest pain', 'Skin rash', 'Allergic reaction', 'Back pain', 'Headache',
+            'Shortness of breath', 'Abdominal pain', 'Fatigue', 'Persistent cough']
+
+
+class Command(BaseCommand):
+    help = 'Seed doctors, patients, appointments and discharge records with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--patients', type=int, default=1000)
+        parser.add_argument('--appointments', type=int, default=10000)
+        parser.add_argument('--discharges', type=int, default=None,
+                            help='Discharge records to create (default: a fifth of the patients)')
+        parser.add_argument('--days', type=int, default=365, help='Spread history over this many past days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='password123', help='Password for every seeded user')
+        parser.add_argument('--prefix', default='seed', help='Username prefix for seeded users')
+        parser.add_argument('--random-seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['random_seed'])
+        self.batch_size = options['batch_size']
+        self.today = date.today()
+        self.days = max(options['days'], 1)
+        # Hash once; every seeded account shares the same password
+        self.password_hash = make_password(options['password'])
+
+        doctors = self.seed_doctors(options['doctors'], options['prefix'])
+        patients = self.seed_patients(options['patients'], options['prefix'], doctors)
+        self.seed_appointments(options['appointments'], doctors, patients)
+        discharges = options['discharges']
+        if discharges is None:
+            discharges = options['patients'] // 5
+        self.seed_discharges(discharges, patients)
+
+        rebuild_snapshot()
+        # Bulk inserts send no signals
+        bump_all()
+        invalidate_doctor_choices()
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Seeding complete.'))
+
+    def random_day(self):
+        return self.today - timedelta(days=self.rng.randrange(self.days))
+
+    def create_users(self, count, username_prefix):
+        start = User.objects.filter(username__startswith=username_prefix).count()
+        usernames = []
+        for offset in range(0, count, self.batch_size):
+            batch = [
+                User(
+                    username=f'{username_prefix}{start + number}',
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                    password=self.password_hash,
+                )
+                for number in range(offset, min(offset + self.batch_size, count))
+            ]
+            User.objects.bulk_create(batch, batch_size=self.batch_size)
+            usernames.extend(user.username for user in batch)
+        # Not every backend returns primary keys from bulk_create, so read them back
+        user_ids = []
+        for offset in range(0, len(usernames), self.batch_size):
+            chunk = usernames[offset:offset + self.batch_size]
+            by_name = dict(User.objects.filter(username__in=chunk).values_list('username', 'id'))
+            user_ids.extend(by_name[name] for name in chunk)
+        return user_ids
+
+    def seed_doctors(self, count, prefix):
+        if count <= 0:
+            return list(Doctor.objects.filter(is_approved=True).values_list('id', flat=True))
+        user_ids = self.create_users(count, f'{prefix}_doctor_')
+        with transaction.atomic():
+            Doctor.objects.bulk_create(
+                [
+                    Doctor(
+                        user_id=user_id,
+                        address=f'{self.rng.randint(1, 999)} Hospital Road',
+                        mobile=f'9{self.rng.randint(100000000, 999999999)}',
+                        department=self.rng.choice(departments)[0],
+                        status=self.rng.random() < 0.9,
+                        is_approved=self.rng.random() < 0.85,
+                    )
+                    for user_id in user_ids
+                ],
+                batch_size=self.batch_size,
+            )
+        self.stdout.write(f'Created {count} doctors')
+        return list(Doctor.objects.filter(user_id__in=user_ids).values_list('id', flat=True))
+
+    def seed_patients(self, count, prefix, doctor_ids):
+        if count <= 0:
+            return list(Patient.objects.values_list('id', 'admitDate'))
+        user_ids = self.create_users(count, f'{prefix}_patient_')
+        with transaction.atomic(), without_auto_now(Patient, 'admitDate'):
+            for offset in range(0, count, self.batch_size):
+                Patient.objects.bulk_create([
+                    Patient(
+                        user_id=user_id,
+                        address=f'{self.rng.randint(1, 999)} Market Street',
+                        mobile=f'8{self.rng.randint(100000000, 999999999)}',
+                        symptoms=self.rng.choice(SYMPTOMS),
+                        assignedDoctor_id=self.rng.choice(doctor_ids) if doctor_ids else None,
+                        admitDate=self.random_day(),
+                        status=self.rng.random() < 0.7,
+                    )
+                    for user_id in user_ids[offset:offset + self.batch_size]
+                ])
+        self.stdout.write(f'Created {count} patients')
+        return list(Patient.objects.filter(user_id__in=user_ids).values_list('id', 'admitDate'))
+
+    def seed_appointments(self, count, doctor_ids, patients):
+        if count <= 0 or not doctor_ids or not patients:
+            return
+        # Slots already taken, so seeding respects the one-booking-per-slot constraint
+        self.booked = set(
+            Appointment.objects.filter(doctor_id__in=doctor_ids, appointmentDate__isnull=False,
+                                       appointmentTime__isnull=False)
+            .values_list('doctor_id', 'appointmentDate', 'appointmentTime')
+        )
+        created = 0
+        with without_auto_now(Appointment, 'createdDate'):
+            while created < count:
+                batch = [self.make_appointment(doctor_ids, patients)
+                         for _ in range(min(self.batch_size, count - created))]
+                with transaction.atomic():
+                    Appointment.objects.bulk_create(batch)
+                created += len(batch)
+                self.stdout.write(f'Created {created}/{count} appointments')
+
+    def make_appointment(self, doctor_ids, patients):
+        created = self.random_day()
+        doctor_id = self.rng.choice(doctor_ids)
+        approved = self.rng.random() < 0.6
+        if approved:
+            scheduled, slot = self.free_slot(doctor_id, created)
+            # A fully booked month leaves the request pending instead
+            approved = slot is not None
+        accepted = approved and self.rng.random() < 0.7
+        appointment = Appointment(
+            patient_id=self.rng.choice(patients)[0],
+            doctor_id=doctor_id,
+            createdDate=created,
+            description=self.rng.choice(SYMPTOMS),
+            status=approved,
+            is_accepted_by_doctor=accepted,
+        )
+        if approved:
+            appointment.appointmentDate = scheduled
+            appointment.appointmentTime = slot
+        if accepted:
+            appointment.accepted_date = timezone.make_aware(
+                datetime.combine(created, time(12)) + timedelta(hours=self.rng.randint(1, 72))
+            )
+            appointment.doctor_scheduled_date = scheduled
+            appointment.doctor_scheduled_time = slot
+        return appointment
+
+    def free_slot(self, doctor_id, created, attempts=20):
+        """A random unbooked half-hour slot (the default doctor hours, 09:00-16:30) within a month of created"""
+        for _ in range(attempts):
+            scheduled = created + timedelta(days=self.rng.randint(1, 30))
+            slot = time(9 + self.rng.randrange(8), self.rng.choice((0, 30)))
+            if (doctor_id, scheduled, slot) not in self.booked:
+                self.booked.add((doctor_id, scheduled, slot))
+                return scheduled, slot
+        return None, None
+
+    def seed_discharges(self, count, patients):
+        if count <= 0 or not patients:
+            return
+        sample = [patient_id for patient_id, _ in self.rng.sample(patients, min(count, len(patients)))]
+        discharges = []
+        for offset in range(0, len(sample), self.batch_size):
+            chunk = Patient.objects.filter(id__in=sample[offset:offset + self.batch_size]).select_related(
+                'user', 'assignedDoctor__user'
+            )
+            for patient in chunk:
+                days = self.rng.randint(1, 14)
+                room_rate, fee_rate = tariff(patient.assignedDoctor.department if patient.assignedDoctor else None)
+                room, medicine, fee, other = (days * room_rate, self.rng.randint(200, 5000),
+                                              days * fee_rate, self.rng.randint(0, 2000))
+                discharges.append(PatientDischargeDetails(
+                    patient=patient,
+                    patientName=patient.get_name[:40],
+                    assignedDoctorName=patient.assignedDoctor.get_name[:40] if patient.assignedDoctor else '',
+                    address=patient.address,
+                    mobile=patient.mobile,
+                    symptoms=patient.symptoms,
+                    admitDate=patient.admitDate,
+                    releaseDate=patient.admitDate + timedelta(days=days),
+                    daySpent=days,
+                    roomCharge=room,
+                    medicineCost=medicine,
+                    doctorFee=fee,
+                    OtherCharge=other,
+                    total=room + medicine + fee + other,
+                ))
+        with transaction.atomic():
+            PatientDischargeDetails.objects.bulk_create(discharges, batch_size=self.batch_size)
+        self.stdout.write(f'Created {len(discharges)} discharge records')
@@ -0,0 +1,76 @@
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+# Rows per UPDATE. Each batch commits on its own so the table is never
+# locked for the whole backfill and an interrupted run simply resumes.
+BATCH_SIZE = 5000
+
+
+def _backfill(model, using, assignments):
+    last_id = model.objects.using(using).aggregate(last=Max('id'))['last'] or 0
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        batch = model.objects.using(using).filter(id__gte=start, id__lt=start + BATCH_SIZE)
+        with transaction.atomic(using=using):
+            for fk_name, legacy_name, target in assignments:
+                batch.filter(**{
+                    f'{fk_name}__isnull': True,
+                    f'{legacy_name}__isnull': False,
+                }).update(**{
+                    fk_name: Subquery(
+                        target.objects.using(using).filter(user_id=OuterRef(legacy_name)).values('pk')[:1]
+                    ),
+                })
+
+
+def backfill_foreign_keys(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Appointment = apps.get_model('hospital', 'Appointment')
+    PatientDischargeDetails = apps.get_model('hospital', 'PatientDischargeDetails')
+    Doctor = apps.get_model('hospital', 'Doctor')
+    Patient = apps.get_model('hospital', 'Patient')
+
+    # The legacy columns hold the *user* id of the doctor or patient
+    _backfill(Appointment, using, [
+        ('patient', 'patientId', Patient),
+        ('doctor', 'doctorId', Doctor),
+    ])
+    _backfill(PatientDischargeDetails, using, [
+        ('patient', 'patientId', Patient),
+    ])
+
+
+def _full_name(profile):
+    return f'{profile.user.first_name} {profile.user.last_name}'
+
+
+def restore_legacy_ids(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Appointment = apps.get_model('hospital', 'Appointment')
+    PatientDischargeDetails = apps.get_model('hospital', 'PatientDischargeDetails')
+
+    appointments = Appointment.objects.using(using).select_related('patient__user', 'doctor__user')
+    for appointment in appointments.iterator(chunk_size=BATCH_SIZE):
+        if appointment.patient:
+            appointment.patientId = appointment.patient.user_id
+            appointment.patientName = _full_name(appointment.patient)
+        if appointment.doctor:
+            appointment.doctorId = appointment.doctor.user_id
+            appointment.doctorName = _full_name(appointment.doctor)
+        appointment.save(update_fields=['patientId', 'patientName', 'doctorId', 'doctorName'])
+
+    discharges = PatientDischargeDetails.objects.using(using).select_related('patient')
+    for discharge in discharges.filter(patient__isnull=False).iterator(chunk_size=BATCH_SIZE):
+        discharge.patientId = discharge.patient.user_id
+        discharge.save(update_fields=['patientId'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('hospital', '0008_appointment_patient_doctor_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_foreign_keys, restore_legacy_ids),
+    ]
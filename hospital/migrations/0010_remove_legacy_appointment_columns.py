@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0009_backfill_appointment_fks'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='appointment',
+            name='patientId',
+        ),
+        migrations.RemoveField(
+            model_name='appointment',
+            name='doctorId',
+        ),
+        migrations.RemoveField(
+            model_name='appointment',
+            name='patientName',
+        ),
+        migrations.RemoveField(
+            model_name='appointment',
+            name='doctorName',
+        ),
+        migrations.RemoveField(
+            model_name='patientdischargedetails',
+            name='patientId',
+        ),
+    ]
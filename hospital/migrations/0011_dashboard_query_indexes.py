@@ -0,0 +1,45 @@
+# Generated by Django 4.2.18 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0010_remove_legacy_appointment_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adminapproval',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['-id'], name='adminapproval_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', '-createdDate'], name='appt_doctor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-createdDate'], name='appt_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', False)), fields=['appointmentDate'], name='appt_pending_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-createdDate', '-id'], name='appt_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(condition=models.Q(('is_approved', True), ('status', True)), fields=['department'], name='doctor_bookable_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['-id'], name='doctor_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(condition=models.Q(('status', False)), fields=['-id'], name='patient_pending_idx'),
+        ),
+    ]
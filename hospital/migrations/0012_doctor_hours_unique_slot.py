@@ -0,0 +1,63 @@
+# Generated by Django 4.2.18 on 2026-10-18 20:27
+
+import datetime
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def release_double_bookings(apps, schema_editor):
+    """
+    Keep the earliest booking of every doubly-booked doctor slot and send the
+    others back to the pending queue, so the unique constraint can be added.
+    """
+    using = schema_editor.connection.alias
+    Appointment = apps.get_model('hospital', 'Appointment')
+    DashboardCounter = apps.get_model('hospital', 'DashboardCounter')
+
+    clashes = (
+        Appointment.objects.using(using)
+        .filter(doctor__isnull=False, appointmentDate__isnull=False, appointmentTime__isnull=False)
+        .values('doctor', 'appointmentDate', 'appointmentTime')
+        .annotate(bookings=Count('id'), keep=Min('id'))
+        .filter(bookings__gt=1)
+    )
+    released = 0
+    for clash in clashes:
+        released += Appointment.objects.using(using).filter(
+            doctor=clash['doctor'],
+            appointmentDate=clash['appointmentDate'],
+            appointmentTime=clash['appointmentTime'],
+        ).exclude(id=clash['keep']).update(appointmentDate=None, appointmentTime=None, status=False)
+    if released:
+        # Approved/pending counts moved; the snapshot is rebuilt on next read
+        DashboardCounter.objects.using(using).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0011_dashboard_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=30),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='work_end',
+            field=models.TimeField(default=datetime.time(17, 0)),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='work_start',
+            field=models.TimeField(default=datetime.time(9, 0)),
+        ),
+        migrations.RunPython(release_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('doctor', 'appointmentDate', 'appointmentTime'), name='appt_unique_doctor_slot'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.18 on 2026-10-18 20:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0012_doctor_hours_unique_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_pic/DoctorProfilePic/thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_pic/PatientProfilePic/thumbnails/'),
+        ),
+        migrations.CreateModel(
+            name='ProfileImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('staged_name', models.CharField(max_length=255)),
+                ('original_name', models.CharField(blank=True, max_length=255)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('claimed_date', models.DateTimeField(blank=True, null=True)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='hospital.doctor')),
+                ('patient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='hospital.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'id'], name='imagejob_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.18 on 2026-10-18 21:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0015_import_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DischargeDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('discharges', models.PositiveIntegerField(default=0)),
+                ('days_spent', models.PositiveIntegerField(default=0)),
+                ('room_charge', models.BigIntegerField(default=0)),
+                ('medicine_cost', models.BigIntegerField(default=0)),
+                ('doctor_fee', models.BigIntegerField(default=0)),
+                ('other_charge', models.BigIntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DoctorDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('appointments', models.PositiveIntegerField(default=0)),
+                ('approved', models.PositiveIntegerField(default=0)),
+                ('accepted', models.PositiveIntegerField(default=0)),
+                ('acceptance_seconds', models.BigIntegerField(default=0)),
+                ('latency_samples', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupStaleDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='createdDate',
+            field=models.DateField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['updated_at'], name='appt_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointmentDate'], name='appt_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientdischargedetails',
+            index=models.Index(fields=['updated_at'], name='discharge_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientdischargedetails',
+            index=models.Index(fields=['releaseDate'], name='discharge_release_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='rollupstaleday',
+            constraint=models.UniqueConstraint(fields=('name', 'day'), name='rollupstale_unique_name_day'),
+        ),
+        migrations.AddField(
+            model_name='doctordayrollup',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_rollups', to='hospital.doctor'),
+        ),
+        migrations.AddField(
+            model_name='dischargedayrollup',
+            name='doctor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='discharge_rollups', to='hospital.doctor'),
+        ),
+        migrations.AddConstraint(
+            model_name='doctordayrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'doctor'), name='doctorday_unique_day_doctor'),
+        ),
+        migrations.AddConstraint(
+            model_name='dischargedayrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'doctor'), name='dischargeday_unique_day_doctor'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.18 on 2026-10-18 21:12
+
+from django.db import migrations, models
+
+# SQLite: an external-content FTS5 table over hospital_searchentry, kept in
+# step by triggers. Prefix indexes make search-as-you-type prefix queries cheap.
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE hospital_searchentry_fts USING fts5(
+        title, body, content='hospital_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER hospital_searchentry_ai AFTER INSERT ON hospital_searchentry BEGIN
+        INSERT INTO hospital_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER hospital_searchentry_ad AFTER DELETE ON hospital_searchentry BEGIN
+        INSERT INTO hospital_searchentry_fts(hospital_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER hospital_searchentry_au AFTER UPDATE ON hospital_searchentry BEGIN
+        INSERT INTO hospital_searchentry_fts(hospital_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO hospital_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS hospital_searchentry_au',
+    'DROP TRIGGER IF EXISTS hospital_searchentry_ad',
+    'DROP TRIGGER IF EXISTS hospital_searchentry_ai',
+    'DROP TABLE IF EXISTS hospital_searchentry_fts',
+]
+
+# PostgreSQL: a GIN index over the same weighted tsvector hospital.search queries
+POSTGRES_FORWARD = [
+    """CREATE INDEX hospital_searchentry_fts_idx ON hospital_searchentry USING GIN (
+        (setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')))""",
+]
+POSTGRES_BACKWARD = ['DROP INDEX IF EXISTS hospital_searchentry_fts_idx']
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def _run(schema_editor, sqlite, postgres):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        # Without FTS5 compiled in, hospital.search falls back to LIKE over the entries
+        statements = sqlite if _sqlite_has_fts5(connection) else []
+    elif connection.vendor == 'postgresql':
+        statements = postgres
+    else:
+        statements = []
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_full_text_index(apps, schema_editor):
+    _run(schema_editor, SQLITE_FORWARD, POSTGRES_FORWARD)
+
+
+def drop_full_text_index(apps, schema_editor):
+    _run(schema_editor, SQLITE_BACKWARD, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0016_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('doctor', 'Doctor'), ('patient', 'Patient'), ('appointment', 'Appointment')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='searchentry_unique_kind_object'),
+        ),
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.18 on 2026-10-18 23:40
+
+from django.conf import settings
+from django.db import migrations
+
+# Patient autocomplete filters user names with istartswith. These indexes
+# match the case-insensitive prefix test each backend compiles it to.
+#
+# This migration touches auth_user, a table owned by django.contrib.auth.
+# Django does not track these indexes, so their names carry the hospital_
+# prefix to stay clear of auth's own, the reverse drops exactly what the
+# forward step created, and hospital.database.ensure_user_name_indexes puts
+# them back if a later auth migration rebuilds the table without them.
+COLUMNS = ('first_name', 'last_name', 'username')
+
+
+def _name(column):
+    return f'hospital_user_{column}_ci'
+
+
+# SQLite turns a LIKE prefix into an index range only on a NOCASE index
+SQLITE_FORWARD = [f'CREATE INDEX IF NOT EXISTS {_name(column)} ON auth_user ({column} COLLATE NOCASE)'
+                  for column in COLUMNS]
+
+# PostgreSQL compiles istartswith to UPPER(column::text) LIKE UPPER(%s)
+POSTGRES_FORWARD = [f'CREATE INDEX IF NOT EXISTS {_name(column)} ON auth_user (UPPER({column}::text) text_pattern_ops)'
+                    for column in COLUMNS]
+
+BACKWARD = [f'DROP INDEX IF EXISTS {_name(column)}' for column in COLUMNS]
+
+
+def _run(schema_editor, sqlite, postgres):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': sqlite, 'postgresql': postgres}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_name_indexes(apps, schema_editor):
+    _run(schema_editor, SQLITE_FORWARD, POSTGRES_FORWARD)
+
+
+def drop_name_indexes(apps, schema_editor):
+    _run(schema_editor, BACKWARD, BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hospital', '0017_search_entries'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_name_indexes, drop_name_indexes, elidable=False),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.18 on 2026-10-19 09:10
+
+from django.db import migrations
+
+# Entries written per bulk_create; on SQLite the FTS5 triggers from 0017 index them too
+BATCH_SIZE = 500
+
+
+# Frozen copies of the documents hospital.search builds, on historical models
+def _name(first, last):
+    return f'{first or ""} {last or ""}'.strip()
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def _doctor_entries(apps):
+    rows = apps.get_model('hospital', 'Doctor').objects.order_by('id').values_list(
+        'id', 'user__first_name', 'user__last_name', 'user__username', 'department', 'mobile', 'address')
+    for pk, first, last, username, department, mobile, address in rows.iterator(chunk_size=BATCH_SIZE):
+        yield 'doctor', pk, f'Dr. {_name(first, last)}', _join(username, department, mobile, address)
+
+
+def _patient_entries(apps):
+    rows = apps.get_model('hospital', 'Patient').objects.order_by('id').values_list(
+        'id', 'user__first_name', 'user__last_name', 'user__username', 'symptoms', 'mobile', 'address')
+    for pk, first, last, username, symptoms, mobile, address in rows.iterator(chunk_size=BATCH_SIZE):
+        yield 'patient', pk, _name(first, last), _join(username, symptoms, mobile, address)
+
+
+def _appointment_entries(apps):
+    rows = apps.get_model('hospital', 'Appointment').objects.order_by('id').values_list(
+        'id', 'patient__user__first_name', 'patient__user__last_name',
+        'doctor__user__first_name', 'doctor__user__last_name', 'description', 'appointmentDate')
+    for pk, patient_first, patient_last, doctor_first, doctor_last, description, day in rows.iterator(
+            chunk_size=BATCH_SIZE):
+        patient, doctor = _name(patient_first, patient_last), _name(doctor_first, doctor_last)
+        title = _join(patient or 'Unknown patient', f'with Dr. {doctor}' if doctor else '', f'on {day}' if day else '')
+        yield 'appointment', pk, title[:200], _join(description, day)
+
+
+def index_existing_rows(apps, schema_editor):
+    """Fill the search index from the rows that existed before it, so filters find them at once"""
+    SearchEntry = apps.get_model('hospital', 'SearchEntry')
+    for entries in (_doctor_entries, _patient_entries, _appointment_entries):
+        batch = []
+        for kind, pk, title, body in entries(apps):
+            batch.append(SearchEntry(kind=kind, object_id=pk, title=title, body=body))
+            if len(batch) == BATCH_SIZE:
+                SearchEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        SearchEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0018_user_name_indexes'),
+    ]
+
+    operations = [
+        # Unapplying keeps the entries; 0017 drops them with the table
+        migrations.RunPython(index_existing_rows, migrations.RunPython.noop),
+    ]
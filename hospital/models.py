@@ -1,3 +1,5 @@
+import datetime
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -13,6 +15,8 @@ departments=[('Cardiologist','Cardiologist'),
 class Doctor(models.Model):
     user=models.OneToOneField(User,on_delete=models.CASCADE)
     profile_pic= models.ImageField(upload_to='profile_pic/DoctorProfilePic/',null=True,blank=True)
+    # Written by hospital.images once the staged upload has been processed
+    profile_thumbnail = models.ImageField(upload_to='profile_pic/DoctorProfilePic/thumbnails/', null=True, blank=True, editable=False)
     address = models.CharField(max_length=40)
     mobile = models.CharField(max_length=20,null=True)
     department= models.CharField(max_length=50,choices=departments,default='Cardiologist')
@@ -20,6 +24,20 @@ class Doctor(models.Model):
     is_approved = models.BooleanField(default=False)  # Admin approval required
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_doctors')
     approved_date = models.DateTimeField(null=True, blank=True)
+    # Consulting hours, split into slot_minutes slots by hospital.scheduling
+    work_start = models.TimeField(default=datetime.time(9, 0))
+    work_end = models.TimeField(default=datetime.time(17, 0))
+    slot_minutes = models.PositiveSmallIntegerField(default=30)
+    # Version stamp for the JSON API's ETag and Last-Modified headers
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Bookable doctors for the appointment forms, grouped by department
+            models.Index(fields=['department'], name='doctor_bookable_idx', condition=models.Q(status=True, is_approved=True)),
+            # Pending-approvals queue; stays tiny once doctors are approved
+            models.Index(fields=['-id'], name='doctor_pending_idx', condition=models.Q(is_approved=False)),
+        ]
     
     @property
     def get_name(self):
@@ -35,6 +53,7 @@ class Doctor(models.Model):
 class Patient(models.Model):
     user=models.OneToOneField(User,on_delete=models.CASCADE)
     profile_pic= models.ImageField(upload_to='profile_pic/PatientProfilePic/',null=True,blank=True)
+    profile_thumbnail = models.ImageField(upload_to='profile_pic/PatientProfilePic/thumbnails/', null=True, blank=True, editable=False)
     address = models.CharField(max_length=40)
     mobile = models.CharField(max_length=20,null=False)
     symptoms = models.CharField(max_length=100,null=False)
@@ -44,6 +63,12 @@ class Patient(models.Model):
     is_approved = models.BooleanField(default=False)
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_patients')
     approved_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-id'], name='patient_pending_idx', condition=models.Q(status=False)),
+        ]
     
     @property
     def get_name(self):
@@ -56,13 +81,11 @@ class Patient(models.Model):
 
 
 class Appointment(models.Model):
-    patientId=models.PositiveIntegerField(null=True)
-    doctorId=models.PositiveIntegerField(null=True)
-    patientName=models.CharField(max_length=40,null=True)
-    doctorName=models.CharField(max_length=40,null=True)
+    patient=models.ForeignKey('Patient', on_delete=models.SET_NULL, null=True, blank=True, related_name='appointments')
+    doctor=models.ForeignKey('Doctor', on_delete=models.SET_NULL, null=True, blank=True, related_name='appointments')
     appointmentDate=models.DateField(null=True, blank=True)  # Manual appointment date
     appointmentTime=models.TimeField(null=True, blank=True)  # Appointment time
-    createdDate=models.DateField(auto_now=True)  # When appointment was created
+    createdDate=models.DateField(auto_now_add=True)  # When appointment was created
     description=models.TextField(max_length=500)
     status=models.BooleanField(default=False)
     is_accepted_by_doctor = models.BooleanField(default=False)  # Doctor acceptance
@@ -71,11 +94,42 @@ class Appointment(models.Model):
     admin_scheduled_time = models.TimeField(null=True, blank=True)  # Time set by admin
     doctor_scheduled_date = models.DateField(null=True, blank=True)  # Date set by doctor
     doctor_scheduled_time = models.TimeField(null=True, blank=True)  # Time set by doctor
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Boolean filters compile to "NOT col" on SQLite, which cannot seek a
+        # composite index, so they are expressed as partial-index conditions.
+        indexes = [
+            # doctor_dashboard: all, pending and accepted lists in createdDate order
+            models.Index(fields=['doctor', '-createdDate'], name='appt_doctor_created_idx'),
+            models.Index(fields=['patient', '-createdDate'], name='appt_patient_created_idx'),
+            # admin_dashboard cancelled count: pending appointments by date
+            models.Index(fields=['appointmentDate'], name='appt_pending_date_idx', condition=models.Q(status=False)),
+            # admin_appointments keyset pagination
+            models.Index(fields=['-createdDate', '-id'], name='appt_created_id_idx'),
+            # hospital.rollups: rows changed since the watermark, then whole days of them
+            # across every doctor and status, which neither the unique (doctor, date,
+            # time) constraint nor the pending-only partial index can serve
+            models.Index(fields=['updated_at'], name='appt_updated_idx'),
+            models.Index(fields=['appointmentDate'], name='appt_date_idx'),
+        ]
+        constraints = [
+            # A doctor sees one patient per slot; also the per-doctor, per-day slot index
+            models.UniqueConstraint(fields=['doctor', 'appointmentDate', 'appointmentTime'],
+                                    name='appt_unique_doctor_slot'),
+        ]
+
+    @property
+    def patient_name(self):
+        return self.patient.get_name if self.patient else None
+    @property
+    def doctor_name(self):
+        return self.doctor.get_name if self.doctor else None
 
 
 
 class PatientDischargeDetails(models.Model):
-    patientId=models.PositiveIntegerField(null=True)
+    patient=models.ForeignKey('Patient', on_delete=models.SET_NULL, null=True, blank=True, related_name='discharges')
     patientName=models.CharField(max_length=40)
     assignedDoctorName=models.CharField(max_length=40)
     address = models.CharField(max_length=40)
@@ -91,6 +145,14 @@ class PatientDischargeDetails(models.Model):
     doctorFee=models.PositiveIntegerField(null=False)
     OtherCharge=models.PositiveIntegerField(null=False)
     total=models.PositiveIntegerField(null=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # hospital.rollups: rows changed since the watermark, then whole days of them
+            models.Index(fields=['updated_at'], name='discharge_updated_idx'),
+            models.Index(fields=['releaseDate'], name='discharge_release_idx'),
+        ]
 
 # Admin approval model
 class AdminApproval(models.Model):
@@ -99,6 +161,174 @@ class AdminApproval(models.Model):
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_admins')
     approved_date = models.DateTimeField(null=True, blank=True)
     created_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-id'], name='adminapproval_pending_idx', condition=models.Q(is_approved=False)),
+        ]
     
     def __str__(self):
-        return f"Admin Approval for {self.user.username}"
\ No newline at end of file
+        return f"Admin Approval for {self.user.username}"
+
+# Materialized dashboard counters, kept current by hospital.stats
+class DashboardCounter(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+# Staged profile picture uploads waiting for hospital.images to process them
+class ProfileImageJob(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATES = [(PENDING, 'Pending'), (PROCESSING, 'Processing'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, null=True, blank=True, related_name='image_jobs')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, null=True, blank=True, related_name='image_jobs')
+    staged_name = models.CharField(max_length=255)
+    original_name = models.CharField(max_length=255, blank=True)
+    state = models.CharField(max_length=20, choices=STATES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    claimed_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'id'], name='imagejob_queue_idx'),
+        ]
+
+    @property
+    def owner(self):
+        return self.doctor or self.patient
+
+    def __str__(self):
+        return f"Profile image job {self.id} ({self.state})"
+
+
+# CSV imports run by hospital.imports; rows_done is the resume checkpoint
+class ImportJob(models.Model):
+    PATIENTS = 'patients'
+    DOCTORS = 'doctors'
+    APPOINTMENTS = 'appointments'
+    KINDS = [(PATIENTS, 'Patients'), (DOCTORS, 'Doctors'), (APPOINTMENTS, 'Appointments')]
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATES = [(PENDING, 'Pending'), (PROCESSING, 'Processing'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    # Absolute path of the CSV: a staged upload or a file given to import_records
+    source = models.CharField(max_length=500)
+    original_name = models.CharField(max_length=255, blank=True)
+    state = models.CharField(max_length=20, choices=STATES, default=PENDING)
+    rows_done = models.PositiveIntegerField(default=0)  # Data rows committed or rejected so far
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    created_date = models.DateTimeField(auto_now_add=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'id'], name='importjob_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.id} of {self.kind} ({self.state})"
+
+
+# Daily reporting rollups, rebuilt a day at a time by hospital.rollups
+class DoctorDayRollup(models.Model):
+    # The appointment date, or the booking date while it is unscheduled
+    day = models.DateField()
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='day_rollups')
+    appointments = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    # Seconds from createdDate to accepted_date, summed over the accepted
+    # appointments that have an accepted_date (latency_samples of them)
+    acceptance_seconds = models.BigIntegerField(default=0)
+    latency_samples = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'doctor'], name='doctorday_unique_day_doctor'),
+        ]
+
+    def __str__(self):
+        return f"Doctor {self.doctor_id} on {self.day}: {self.appointments} appointments"
+
+
+class DischargeDayRollup(models.Model):
+    day = models.DateField()  # releaseDate
+    # The patient's assigned doctor, whose department the revenue is reported under
+    doctor = models.ForeignKey(Doctor, on_delete=models.SET_NULL, null=True, blank=True, related_name='discharge_rollups')
+    discharges = models.PositiveIntegerField(default=0)
+    days_spent = models.PositiveIntegerField(default=0)
+    room_charge = models.BigIntegerField(default=0)
+    medicine_cost = models.BigIntegerField(default=0)
+    doctor_fee = models.BigIntegerField(default=0)
+    other_charge = models.BigIntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'doctor'], name='dischargeday_unique_day_doctor'),
+        ]
+
+    def __str__(self):
+        return f"Discharges of doctor {self.doctor_id} on {self.day}: {self.revenue}"
+
+
+class RollupWatermark(models.Model):
+    """Rows updated up to this time are reflected in the rollups"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class RollupStaleDay(models.Model):
+    """
+    A day whose rollup lost a row the watermark cannot see: deleted, or moved
+    to another day. Written by hospital.signals, consumed by hospital.rollups.
+    """
+    name = models.CharField(max_length=50)
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'day'], name='rollupstale_unique_name_day'),
+        ]
+
+
+# Text of doctors, patients and appointments for hospital.search. The full-text
+# index over it (FTS5 on SQLite, GIN on PostgreSQL) is created by migration 0017;
+# on SQLite, triggers keep it in step with this table.
+class SearchEntry(models.Model):
+    DOCTOR = 'doctor'
+    PATIENT = 'patient'
+    APPOINTMENT = 'appointment'
+    KINDS = [(DOCTOR, 'Doctor'), (PATIENT, 'Patient'), (APPOINTMENT, 'Appointment')]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchentry_unique_kind_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
@@ -0,0 +1,129 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Return the key values stored in a cursor, or None if it is not valid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _typed_cursor(model, keys, values):
+    """
+    The cursor's values converted to their keys' field types, or None if any
+    does not fit: a tampered cursor then shows the first page, not an error.
+    """
+    if values is None:
+        return None
+    typed = []
+    for key, value in zip(keys, values):
+        # Keys are non-null ordering columns, and lists or objects are never keys
+        if value is None or isinstance(value, (bool, list, dict)):
+            return None
+        try:
+            typed.append(model._meta.get_field(key).to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            return None
+    return typed
+
+
+def _beyond(keys, values, lookup):
+    """Rows strictly past the cursor: lookup is 'lt' walking down, 'gt' walking up"""
+    condition = Q()
+    for index, key in enumerate(keys):
+        step = Q(**{f'{key}__{lookup}': values[index]})
+        for previous, value in zip(keys[:index], values[:index]):
+            step &= Q(**{previous: value})
+        condition |= step
+    return condition
+
+
+class KeysetPage:
+    """One page of rows plus the cursors for its neighbours"""
+
+    def __init__(self, items, keys, has_next, has_previous, params):
+        self.items = items
+        self.keys = keys
+        self.has_next = has_next and bool(items)
+        self.has_previous = has_previous and bool(items)
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cursor(self, obj):
+        return encode_cursor([getattr(obj, key) for key in self.keys])
+
+    def _query(self, **extra):
+        params = self.params.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        for name, value in extra.items():
+            params[name] = value
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        if self.has_next:
+            return self._query(after=self._cursor(self.items[-1]))
+        return None
+
+    @property
+    def previous_query(self):
+        if self.has_previous:
+            return self._query(before=self._cursor(self.items[0]))
+        return None
+
+    @property
+    def first_query(self):
+        return self._query()
+
+
+def paginate(request, queryset, keys, per_page=DEFAULT_PER_PAGE):
+    """
+    Keyset-paginate a queryset ordered descending on keys, e.g. ['createdDate', 'id'].
+
+    The cursor is taken from the 'after' or 'before' GET parameter, so each
+    page costs one query no matter how deep into the table it is.
+    """
+    try:
+        per_page = min(max(int(request.GET.get('per_page', per_page)), 1), MAX_PER_PAGE)
+    except ValueError:
+        pass
+
+    model = queryset.model
+    after = _typed_cursor(model, keys, decode_cursor(request.GET.get('after', ''), len(keys)))
+    before = _typed_cursor(model, keys, decode_cursor(request.GET.get('before', ''), len(keys)))
+
+    if before is not None:
+        rows = list(queryset.filter(_beyond(keys, before, 'gt')).order_by(*keys)[:per_page + 1])
+        has_previous = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        return KeysetPage(items, keys, True, has_previous, request.GET)
+
+    if after is not None:
+        queryset = queryset.filter(_beyond(keys, after, 'lt'))
+    rows = list(queryset.order_by(*[f'-{key}' for key in keys])[:per_page + 1])
+    return KeysetPage(rows[:per_page], keys, len(rows) > per_page, after is not None, request.GET)
@@ -0,0 +1,209 @@
+import time
+from dataclasses import dataclass, asdict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required as auth_login_required
+from django.contrib.auth.views import redirect_to_login
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.shortcuts import redirect
+
+ROLE_CACHE_PREFIX = 'hospital:roles:'
+ROLE_GENERATION_PREFIX = 'hospital:rolegen:'
+
+# Where the login view leaves the resolved roles for later requests
+SESSION_KEY = '_hospital_roles'
+
+
+@dataclass(frozen=True)
+class Roles:
+    """Everything the views need to know about who a user is"""
+    is_superuser: bool = False
+    is_group_admin: bool = False
+    is_approved_admin: bool = False
+    is_pending_admin: bool = False
+    is_doctor: bool = False
+    is_approved_doctor: bool = False
+    is_patient: bool = False
+    is_approved_patient: bool = False
+
+    @property
+    def is_admin(self):
+        return self.is_superuser or self.is_group_admin or self.is_approved_admin
+
+
+ANONYMOUS_ROLES = Roles()
+
+
+def _cache_key(user_id):
+    return f'{ROLE_CACHE_PREFIX}{user_id}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'HOSPITAL_ROLE_CACHE_TIMEOUT', 300)
+
+
+def resolve_roles(user_id):
+    """Work out every role of a user with a single query"""
+    from .models import AdminApproval
+
+    row = User.objects.filter(pk=user_id).annotate(
+        in_admin_group=Exists(
+            User.groups.through.objects.filter(user_id=OuterRef('pk'), group__name='Admin')
+        ),
+    ).values(
+        'is_superuser', 'in_admin_group',
+        'adminapproval__id', 'adminapproval__is_approved',
+        'doctor__id', 'doctor__is_approved',
+        'patient__id', 'patient__status',
+    ).first()
+    if row is None:
+        return ANONYMOUS_ROLES
+
+    has_approval = row['adminapproval__id'] is not None
+    return Roles(
+        is_superuser=row['is_superuser'],
+        is_group_admin=row['in_admin_group'],
+        is_approved_admin=has_approval and row['adminapproval__is_approved'],
+        is_pending_admin=has_approval and not row['adminapproval__is_approved'],
+        is_doctor=row['doctor__id'] is not None,
+        is_approved_doctor=bool(row['doctor__is_approved']),
+        # approve_patient marks a patient as approved through the status field
+        is_approved_patient=bool(row['patient__status']),
+        is_patient=row['patient__id'] is not None,
+    )
+
+
+def get_user_roles(user):
+    """Roles of a user, served from the cache when possible"""
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS_ROLES
+    key = _cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        return Roles(**cached)
+    roles = resolve_roles(user.pk)
+    cache.set(key, asdict(roles), _cache_timeout())
+    return roles
+
+
+def _generation_key(user_id):
+    return f'{ROLE_GENERATION_PREFIX}{user_id}'
+
+
+def _generation(user_id):
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Never reuse a small number after eviction: old sessions could still hold it
+        generation = time.time_ns()
+        cache.set(key, generation, None)
+    return generation
+
+
+def remember_roles(request, roles):
+    """Keep roles in the session until invalidate_roles() is called for the user"""
+    request._hospital_roles = roles
+    if hasattr(request, 'session') and request.user.is_authenticated:
+        request.session[SESSION_KEY] = {
+            'user': request.user.pk,
+            'generation': _generation(request.user.pk),
+            'roles': asdict(roles),
+        }
+
+
+def _session_roles(request):
+    stored = request.session.get(SESSION_KEY) if hasattr(request, 'session') else None
+    if not stored or stored.get('user') != request.user.pk:
+        return None
+    if stored.get('generation') != _generation(request.user.pk):
+        return None
+    return Roles(**stored['roles'])
+
+
+def get_roles(request):
+    """
+    Roles of the current user, resolved at most once per request. The session
+    copy written at login is used while the user's role generation is unchanged.
+    """
+    roles = getattr(request, '_hospital_roles', None)
+    if roles is None:
+        if not request.user.is_authenticated:
+            roles = ANONYMOUS_ROLES
+        else:
+            roles = _session_roles(request)
+            if roles is None:
+                roles = get_user_roles(request.user)
+                remember_roles(request, roles)
+        request._hospital_roles = roles
+    return roles
+
+
+def invalidate_roles(*user_ids):
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+    # Sessions holding the old roles see a new generation and look them up again
+    cache.delete_many([_generation_key(user_id) for user_id in user_ids])
+
+
+def dashboard_url_name(roles):
+    """Where a user with these roles lands after logging in"""
+    if roles.is_admin:
+        return 'admin-dashboard'
+    if roles.is_doctor:
+        return 'doctor-dashboard'
+    if roles.is_patient:
+        return 'patient-dashboard'
+    return 'home'
+
+
+async def aget_roles(request):
+    """get_roles() for async views; the session, user and roles load off the event loop"""
+    roles = getattr(request, '_hospital_roles', None)
+    if roles is None:
+        roles = await sync_to_async(get_roles)(request)
+    return roles
+
+
+def login_required(view_func):
+    """
+    Django's login_required, which cannot wrap async views before Django 5.0.
+    Async views get request.user and get_roles(request) already resolved.
+    """
+    if not iscoroutinefunction(view_func):
+        return auth_login_required(view_func)
+
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        await aget_roles(request)
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def _deny_admin(request):
+    messages.error(request, 'Access denied. Admin privileges required.')
+    return redirect('home')
+
+
+def admin_required(view_func):
+    """Redirect home unless the user is a superuser or an approved admin"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_view(request, *args, **kwargs):
+            if not (await aget_roles(request)).is_admin:
+                return _deny_admin(request)
+            return await view_func(request, *args, **kwargs)
+        return _async_view
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not get_roles(request).is_admin:
+            return _deny_admin(request)
+        return view_func(request, *args, **kwargs)
+    return _wrapped_view
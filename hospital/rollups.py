@@ -0,0 +1,213 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import (
+    Appointment, DischargeDayRollup, DoctorDayRollup, PatientDischargeDetails, RollupStaleDay, RollupWatermark,
+)
+
+APPOINTMENTS = 'appointments'
+DISCHARGES = 'discharges'
+
+# Rows saved this recently may belong to transactions that have not committed
+# yet, so a refresh only moves the watermark up to this long ago
+SETTLE = timedelta(seconds=30)
+
+# Days rebuilt per transaction
+DAYS_PER_BATCH = 31
+
+# An appointment counts on its date, or on its booking date while unscheduled
+APPOINTMENT_DAY = Coalesce('appointmentDate', 'createdDate')
+
+ACCEPTANCE_LATENCY = ExpressionWrapper(F('accepted_date') - Cast('createdDate', DateTimeField()),
+                                       output_field=DurationField())
+
+
+def _seconds(duration):
+    return int(duration.total_seconds()) if duration else 0
+
+
+def _rebuild_appointment_days(days):
+    # Both halves can use an index, which the coalesced day could not
+    rows = (
+        Appointment.objects
+        .filter(Q(appointmentDate__in=days) | Q(appointmentDate__isnull=True, createdDate__in=days),
+                doctor__isnull=False)
+        .annotate(day=APPOINTMENT_DAY)
+        .values('day', 'doctor_id')
+        .annotate(
+            appointments=Count('id'),
+            approved=Count('id', filter=Q(status=True)),
+            accepted=Count('id', filter=Q(is_accepted_by_doctor=True)),
+            latency=Sum(ACCEPTANCE_LATENCY, filter=Q(is_accepted_by_doctor=True, accepted_date__isnull=False)),
+            latency_samples=Count('id', filter=Q(is_accepted_by_doctor=True, accepted_date__isnull=False)),
+        )
+        .order_by()
+    )
+    DoctorDayRollup.objects.filter(day__in=days).delete()
+    DoctorDayRollup.objects.bulk_create([
+        DoctorDayRollup(day=row['day'], doctor_id=row['doctor_id'], appointments=row['appointments'],
+                        approved=row['approved'], accepted=row['accepted'],
+                        acceptance_seconds=_seconds(row['latency']), latency_samples=row['latency_samples'])
+        for row in rows
+    ])
+
+
+def _rebuild_discharge_days(days):
+    rows = (
+        PatientDischargeDetails.objects
+        .filter(releaseDate__in=days)
+        .values(day=F('releaseDate'), doctor_id=F('patient__assignedDoctor_id'))
+        .annotate(
+            discharges=Count('id'),
+            days_spent=Sum('daySpent'),
+            room_charge=Sum('roomCharge'),
+            medicine_cost=Sum('medicineCost'),
+            doctor_fee=Sum('doctorFee'),
+            other_charge=Sum('OtherCharge'),
+            revenue=Sum('total'),
+        )
+        .order_by()
+    )
+    DischargeDayRollup.objects.filter(day__in=days).delete()
+    DischargeDayRollup.objects.bulk_create([DischargeDayRollup(**row) for row in rows])
+
+
+# name -> (source model, its rollup day, rollup model, rebuild function)
+ROLLUPS = {
+    APPOINTMENTS: (Appointment, APPOINTMENT_DAY, DoctorDayRollup, _rebuild_appointment_days),
+    DISCHARGES: (PatientDischargeDetails, F('releaseDate'), DischargeDayRollup, _rebuild_discharge_days),
+}
+
+
+def _changed_days(model, day, since, until):
+    rows = model.objects.filter(updated_at__lte=until)
+    if since is not None:
+        rows = rows.filter(updated_at__gt=since)
+    return set(rows.annotate(rollup_day=day).order_by().values_list('rollup_day', flat=True).distinct())
+
+
+def refresh(name, rebuild=False):
+    """
+    Rebuild the days of one rollup that rows saved since its watermark, or
+    deleted or moved away since, fall on; returns how many days were rebuilt.
+    Without a watermark yet, or with rebuild, every day is rebuilt.
+    """
+    model, day, rollup_model, rebuild_days = ROLLUPS[name]
+    until = timezone.now() - SETTLE
+    watermark = RollupWatermark.objects.filter(name=name).values_list('value', flat=True).first()
+    since = None if rebuild else watermark
+    days = _changed_days(model, day, since, until)
+    days.update(RollupStaleDay.objects.filter(name=name).values_list('day', flat=True))
+    days.discard(None)
+
+    ordered = sorted(days)
+    with transaction.atomic():
+        if since is None:
+            # Also drops days that no longer have any rows
+            rollup_model.objects.all().delete()
+        for start in range(0, len(ordered), DAYS_PER_BATCH):
+            batch = ordered[start:start + DAYS_PER_BATCH]
+            with transaction.atomic():
+                # Cleared first, so a row deleted meanwhile marks its day again
+                RollupStaleDay.objects.filter(name=name, day__in=batch).delete()
+                rebuild_days(batch)
+        RollupWatermark.objects.update_or_create(name=name, defaults={'value': until})
+    return len(ordered)
+
+
+def freshness():
+    """When each rollup was last brought up to date"""
+    return dict(RollupWatermark.objects.values_list('name', 'value'))
+
+
+# Stale-day tracking, wired up in hospital.signals
+def _source_day(instance):
+    # Raw attributes, so deferred fields are never loaded just for this
+    if isinstance(instance, Appointment):
+        return instance.__dict__.get('appointmentDate') or instance.__dict__.get('createdDate')
+    return instance.__dict__.get('releaseDate')
+
+
+def _name(instance):
+    return APPOINTMENTS if isinstance(instance, Appointment) else DISCHARGES
+
+
+def _mark_stale(name, *days):
+    RollupStaleDay.objects.bulk_create([RollupStaleDay(name=name, day=day) for day in days if day is not None],
+                                       ignore_conflicts=True)
+
+
+def remember_day(instance):
+    instance._rollup_day = _source_day(instance)
+
+
+def row_saved(instance, created):
+    """A row that moved to another day leaves a count behind on its old one"""
+    previous = getattr(instance, '_rollup_day', None)
+    if not created and previous is not None and previous != _source_day(instance):
+        _mark_stale(_name(instance), previous)
+    remember_day(instance)
+
+
+def remember_doctor(patient):
+    patient._rollup_doctor = patient.__dict__.get('assignedDoctor_id')
+
+
+def patient_saved(patient, created):
+    """Discharge revenue follows the assigned doctor, so a reassignment moves the patient's past discharges"""
+    if not created and getattr(patient, '_rollup_doctor', None) != patient.assignedDoctor_id:
+        _mark_stale(DISCHARGES, *PatientDischargeDetails.objects.filter(patient=patient)
+                    .values_list('releaseDate', flat=True).distinct())
+    remember_doctor(patient)
+
+
+def row_deleted(instance):
+    _mark_stale(_name(instance), _source_day(instance))
+
+
+# Reports, read from the rollups only
+def _with_latency(rows):
+    for row in rows:
+        samples = row.pop('latency_samples')
+        seconds = row.pop('acceptance_seconds')
+        row['acceptance_hours'] = round(seconds / samples / 3600, 1) if samples else None
+    return rows
+
+
+def _workload():
+    return dict(appointments=Sum('appointments'), approved=Sum('approved'), accepted=Sum('accepted'),
+                acceptance_seconds=Sum('acceptance_seconds'), latency_samples=Sum('latency_samples'))
+
+
+def department_workload(date_from, date_to):
+    rows = (DoctorDayRollup.objects.filter(day__range=(date_from, date_to))
+            .values(department=F('doctor__department')).annotate(**_workload()).order_by('department'))
+    return _with_latency(list(rows))
+
+
+def doctor_workload(date_from, date_to, limit=20):
+    rows = (DoctorDayRollup.objects.filter(day__range=(date_from, date_to))
+            .values('doctor_id', 'doctor__user__first_name', 'doctor__user__last_name', 'doctor__department')
+            .annotate(**_workload()).order_by('-appointments', 'doctor_id')[:limit])
+    return _with_latency(list(rows))
+
+
+def daily_appointments(date_from, date_to):
+    rows = (DoctorDayRollup.objects.filter(day__range=(date_from, date_to))
+            .values('day').annotate(**_workload()).order_by('day'))
+    return _with_latency(list(rows))
+
+
+def department_revenue(date_from, date_to):
+    return list(
+        DischargeDayRollup.objects.filter(day__range=(date_from, date_to))
+        .values(department=F('doctor__department'))
+        .annotate(discharges=Sum('discharges'), days_spent=Sum('days_spent'), revenue=Sum('revenue'),
+                  room_charge=Sum('room_charge'), medicine_cost=Sum('medicine_cost'),
+                  doctor_fee=Sum('doctor_fee'), other_charge=Sum('other_charge'))
+        .order_by('-revenue')
+    )
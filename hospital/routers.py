@@ -0,0 +1,120 @@
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Cookie holding the time until which this browser reads from the primary
+PRIMARY_COOKIE = 'hospital_primary_until'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Apps whose rows change on nearly every login and must never be read stale
+PRIMARY_ONLY_APPS = {'sessions'}
+
+# Whether reads in the current request or task must see the primary
+_use_primary = ContextVar('hospital_use_primary', default=True)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes always go to the primary. Reads go to a random replica only when
+    ReplicaRoutingMiddleware has cleared the request for it and no transaction
+    is open on the primary; everything else (management commands, workers,
+    shells) keeps reading the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if (not replicas or _use_primary.get() or model._meta.app_label in PRIMARY_ONLY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from replication (or refresh_sqlite_replicas)
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests read from the replicas. Unsafe requests and views
+    wrapped in use_primary() read the primary, and so does the same browser
+    for HOSPITAL_READ_YOUR_WRITES_SECONDS afterwards, so a redirect after a
+    write never shows rows the replica has not caught up with yet.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            # Async views then run on the event loop without a thread hop for this middleware
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._route(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        token = self._route(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+        return self._pin(request, response)
+
+    def _route(self, request):
+        wrote = request.method not in SAFE_METHODS
+        request._hospital_wrote = wrote
+        return _use_primary.set(wrote or self._pinned(request))
+
+    def _pin(self, request, response):
+        if request._hospital_wrote:
+            window = settings.HOSPITAL_READ_YOUR_WRITES_SECONDS
+            response.set_cookie(PRIMARY_COOKIE, str(int(time.time() + window)), max_age=window,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def _pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PRIMARY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+def use_primary(view_func):
+    """Read from the primary in this view and open the read-your-writes window"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        request._hospital_wrote = True
+        token = _use_primary.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _use_primary.reset(token)
+    return _wrapped_view
@@ -0,0 +1,165 @@
+from datetime import date, datetime, timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Doctor, Appointment
+
+# How far ahead next_free_slots looks before giving up
+SEARCH_DAYS = 60
+
+
+class SlotUnavailable(Exception):
+    """The requested slot is outside the doctor's hours or already taken"""
+
+
+def _cache_key(doctor_id, day):
+    return f'hospital:slots:{doctor_id}:{day.isoformat()}'
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def slot_times(doctor):
+    """Start times of the doctor's slots in one working day"""
+    step = timedelta(minutes=max(doctor.slot_minutes, 1))
+    current = datetime.combine(date.min, doctor.work_start)
+    end = datetime.combine(date.min, doctor.work_end)
+    times = []
+    while current + step <= end:
+        times.append(current.time())
+        current += step
+    return times
+
+
+def _load_booked(doctor_ids, day, exclude=None):
+    """Booked start times per doctor for one day, from the unique (doctor, date, time) index"""
+    booked = {doctor_id: set() for doctor_id in doctor_ids}
+    rows = Appointment.objects.filter(doctor_id__in=doctor_ids, appointmentDate=day,
+                                      appointmentTime__isnull=False)
+    if exclude is not None:
+        rows = rows.exclude(pk=exclude)
+    rows = rows.values_list('doctor_id', 'appointmentTime')
+    for doctor_id, at in rows:
+        booked[doctor_id].add(at)
+    return {doctor_id: frozenset(times) for doctor_id, times in booked.items()}
+
+
+def booked_slots(doctor_ids, day):
+    """
+    Booked start times for several doctors on one day. Each (doctor, day) is
+    cached until an appointment on it changes, so repeated lookups skip the
+    database entirely and misses cost a single query.
+    """
+    keys = {doctor_id: _cache_key(doctor_id, day) for doctor_id in doctor_ids}
+    cached = cache.get_many(keys.values())
+    booked = {doctor_id: cached[key] for doctor_id, key in keys.items() if key in cached}
+    missing = [doctor_id for doctor_id in doctor_ids if doctor_id not in booked]
+    if missing:
+        loaded = _load_booked(missing, day)
+        cache.set_many({keys[doctor_id]: times for doctor_id, times in loaded.items()})
+        booked.update(loaded)
+    return booked
+
+
+def invalidate_day(doctor_id, day):
+    if doctor_id and day:
+        key = _cache_key(doctor_id, _as_date(day))
+        cache.delete(key)
+        # Again once committed, in case a reader cached the old rows meanwhile
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+def _now():
+    now = timezone.localtime()
+    return now.date(), now.time()
+
+
+def _on_grid(doctor, at):
+    return at in slot_times(doctor)
+
+
+def is_slot_free(doctor, day, at, booked=None):
+    """Whether the doctor can take a patient at this date and time"""
+    today, now = _now()
+    if day < today or (day == today and at <= now):
+        return False
+    if not _on_grid(doctor, at):
+        return False
+    if booked is None:
+        booked = booked_slots([doctor.id], day)[doctor.id]
+    return at not in booked
+
+
+def next_free_slots(doctor=None, department=None, count=5, start=None, days=SEARCH_DAYS):
+    """
+    The next count free (date, time, doctor) slots for one doctor, or for any
+    bookable doctor in a department, in chronological order.
+    """
+    if doctor is not None:
+        doctors = [doctor]
+    else:
+        doctors = list(Doctor.objects.filter(status=True, is_approved=True, department=department)
+                       .select_related('user'))
+    if not doctors:
+        return []
+
+    today, now = _now()
+    day = max(start or today, today)
+    grids = {d.id: slot_times(d) for d in doctors}
+    found = []
+    for _ in range(days):
+        booked = booked_slots(list(grids), day)
+        candidates = []
+        for d in doctors:
+            taken = booked[d.id]
+            for at in grids[d.id]:
+                if at in taken or (day == today and at <= now):
+                    continue
+                candidates.append((day, at, d))
+        candidates.sort(key=lambda slot: slot[1])
+        found.extend(candidates[:count - len(found)])
+        if len(found) >= count:
+            break
+        day += timedelta(days=1)
+    return found
+
+
+def reserve_slot(appointment, doctor, day, at, **fields):
+    """
+    Book appointment into the doctor's slot and save it, raising SlotUnavailable
+    if another booking got there first. Concurrent bookings for the same doctor
+    queue on the doctor row; the unique constraint is the final arbiter.
+    """
+    day = _as_date(day)
+    with transaction.atomic():
+        doctor = Doctor.objects.select_for_update(of=('self',)).select_related('user').get(pk=doctor.pk)
+        # Fresh from the database: the cache may be a moment behind another worker
+        taken = _load_booked([doctor.id], day, exclude=appointment.pk)[doctor.id]
+        if not is_slot_free(doctor, day, at, booked=taken):
+            raise SlotUnavailable(f'{doctor.get_name} is not available on {day} at {at:%H:%M}.')
+        appointment.doctor = doctor
+        appointment.appointmentDate = day
+        appointment.appointmentTime = at
+        for name, value in fields.items():
+            setattr(appointment, name, value)
+        try:
+            with transaction.atomic():
+                appointment.save()
+        except IntegrityError:
+            raise SlotUnavailable(f'{doctor.get_name} was just booked on {day} at {at:%H:%M}.')
+    return appointment
+
+
+# Cache maintenance, wired up in hospital.signals
+def remember_slot(instance):
+    instance._slot_state = (instance.__dict__.get('doctor_id'), instance.__dict__.get('appointmentDate'))
+
+
+def appointment_changed(instance):
+    previous = getattr(instance, '_slot_state', (None, None))
+    invalidate_day(*previous)
+    invalidate_day(instance.doctor_id, instance.appointmentDate)
+    remember_slot(instance)
@@ -0,0 +1,204 @@
+import functools
+import re
+import sqlite3
+from contextlib import closing
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Appointment, Doctor, Patient, SearchEntry
+
+DOCTOR = SearchEntry.DOCTOR
+PATIENT = SearchEntry.PATIENT
+APPOINTMENT = SearchEntry.APPOINTMENT
+
+FTS_TABLE = 'hospital_searchentry_fts'
+
+# Ranked rows handed to the admin and listing filters; a search broader than
+# this is narrowed by its best matches
+MAX_MATCHES = 1000
+
+# Entries written per upsert
+INDEX_BATCH_SIZE = 500
+
+WORD = re.compile(r'\w+')
+
+# A doctor or patient outranks the appointments that merely mention their name
+PROFILE_BOOST = "CASE WHEN entry.kind = 'appointment' THEN 1.0 ELSE 2.0 END"
+
+
+def _name(first, last):
+    return f'{first or ""} {last or ""}'.strip()
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def _doctor_documents(ids):
+    rows = Doctor.objects.filter(id__in=ids).values_list(
+        'id', 'user__first_name', 'user__last_name', 'user__username', 'department', 'mobile', 'address')
+    for pk, first, last, username, department, mobile, address in rows:
+        yield pk, f'Dr. {_name(first, last)}', _join(username, department, mobile, address)
+
+
+def _patient_documents(ids):
+    rows = Patient.objects.filter(id__in=ids).values_list(
+        'id', 'user__first_name', 'user__last_name', 'user__username', 'symptoms', 'mobile', 'address')
+    for pk, first, last, username, symptoms, mobile, address in rows:
+        yield pk, _name(first, last), _join(username, symptoms, mobile, address)
+
+
+def _appointment_documents(ids):
+    rows = Appointment.objects.filter(id__in=ids).values_list(
+        'id', 'patient__user__first_name', 'patient__user__last_name',
+        'doctor__user__first_name', 'doctor__user__last_name', 'description', 'appointmentDate')
+    for pk, patient_first, patient_last, doctor_first, doctor_last, description, day in rows:
+        patient, doctor = _name(patient_first, patient_last), _name(doctor_first, doctor_last)
+        title = _join(patient or 'Unknown patient', f'with Dr. {doctor}' if doctor else '', f'on {day}' if day else '')
+        yield pk, title[:200], _join(description, day)
+
+
+# kind -> (source model, documents for a list of ids)
+SOURCES = {
+    DOCTOR: (Doctor, _doctor_documents),
+    PATIENT: (Patient, _patient_documents),
+    APPOINTMENT: (Appointment, _appointment_documents),
+}
+
+
+# Index maintenance
+def index(kind, ids):
+    """(Re)write the entries of these rows; ids whose row is gone lose their entry"""
+    ids = list(ids)
+    _, documents = SOURCES[kind]
+    for start in range(0, len(ids), INDEX_BATCH_SIZE):
+        batch = ids[start:start + INDEX_BATCH_SIZE]
+        entries = [SearchEntry(kind=kind, object_id=pk, title=title, body=body)
+                   for pk, title, body in documents(batch)]
+        # One upsert per batch; on SQLite the triggers update the FTS5 rows too
+        SearchEntry.objects.bulk_create(entries, update_conflicts=True, unique_fields=['kind', 'object_id'],
+                                        update_fields=['title', 'body'])
+        missing = set(batch) - {entry.object_id for entry in entries}
+        if missing:
+            remove(kind, missing)
+
+
+def remove(kind, ids):
+    SearchEntry.objects.filter(kind=kind, object_id__in=list(ids)).delete()
+
+
+def rebuild():
+    """Index every doctor, patient and appointment; returns the number of entries"""
+    # One transaction, so searches keep their old results until the new ones are in
+    with transaction.atomic(using=router.db_for_write(SearchEntry)):
+        SearchEntry.objects.all().delete()
+        for kind, (model, _) in SOURCES.items():
+            index(kind, list(model.objects.order_by('id').values_list('id', flat=True)))
+    return SearchEntry.objects.count()
+
+
+# Queries
+@functools.cache
+def _sqlite_has_fts5():
+    # Asks the SQLite library itself, so no query runs on the request's connection;
+    # the migration only creates the FTS5 table where it is compiled in
+    with closing(sqlite3.connect(':memory:')) as probe:
+        return bool(probe.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+
+def _sqlite_ranked(select, terms, kind, limit):
+    # Every term must match, as a prefix so results follow each keystroke
+    match = ' '.join(f'"{term}"*' for term in terms)
+    kind_filter = 'AND entry.kind = %s' if kind else ''
+    # bm25 is negative, lower for better matches; title hits weigh ten times body hits
+    sql = (f'SELECT {select} FROM {FTS_TABLE} JOIN hospital_searchentry AS entry ON entry.id = {FTS_TABLE}.rowid '
+           f'WHERE {FTS_TABLE} MATCH %s {kind_filter} '
+           f'ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) * {PROFILE_BOOST}, entry.id DESC LIMIT %s')
+    return sql, [match, *([kind] if kind else []), limit]
+
+
+# Must stay the expression the migration's GIN index is built on
+POSTGRES_VECTOR = "(setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B'))"
+
+
+def _postgres_ranked(select, terms, kind, limit):
+    query = ' & '.join(f'{term}:*' for term in terms)
+    kind_filter = 'AND entry.kind = %s' if kind else ''
+    sql = (f"SELECT {select} FROM hospital_searchentry AS entry, to_tsquery('simple', %s) AS query "
+           f'WHERE {POSTGRES_VECTOR} @@ query {kind_filter} '
+           f'ORDER BY ts_rank({POSTGRES_VECTOR}, query) * {PROFILE_BOOST} DESC, entry.id DESC LIMIT %s')
+    return sql, [query, *([kind] if kind else []), limit]
+
+
+def _ranked(terms, kind, limit, select):
+    """(sql, params) of the best matches, or None where only the LIKE fallback works"""
+    vendor = connections[router.db_for_read(SearchEntry)].vendor
+    if vendor == 'postgresql':
+        return _postgres_ranked(select, terms, kind, limit)
+    if vendor == 'sqlite' and _sqlite_has_fts5():
+        return _sqlite_ranked(select, terms, kind, limit)
+    return None
+
+
+def _like(terms, kind):
+    # No full-text support: still one narrow table instead of several joined ones
+    entries = SearchEntry.objects.all()
+    if kind:
+        entries = entries.filter(kind=kind)
+    for term in terms:
+        entries = entries.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    return entries.order_by('-id')
+
+
+def _terms(query):
+    return WORD.findall(query.lower())[:8]
+
+
+def search(query, kind=None, limit=20):
+    """Best matches first, as (kind, id, title) tuples"""
+    terms = _terms(query)
+    if not terms:
+        return []
+    ranked = _ranked(terms, kind, limit, 'entry.kind, entry.object_id, entry.title')
+    if ranked is None:
+        return list(_like(terms, kind).values_list('kind', 'object_id', 'title')[:limit])
+    with connections[router.db_for_read(SearchEntry)].cursor() as cursor:
+        cursor.execute(*ranked)
+        return cursor.fetchall()
+
+
+def matching(kind, query, limit=MAX_MATCHES):
+    """
+    Lazy subquery of the ids of the best matching rows of one kind, for
+    queryset.filter(pk__in=...); nothing runs until the queryset does.
+    """
+    terms = _terms(query)
+    if not terms:
+        return SearchEntry.objects.none().values('object_id')
+    ranked = _ranked(terms, kind, limit, 'entry.id')
+    if ranked is None:
+        return _like(terms, kind).values('object_id')[:limit]
+    return SearchEntry.objects.filter(id__in=RawSQL(*ranked)).values('object_id')
+
+
+# Signal handlers, wired up in hospital.signals
+def remember_appointments(profile):
+    """Before a doctor or patient goes, note the appointments whose names will change"""
+    profile._search_appointments = list(profile.appointments.values_list('id', flat=True))
+
+
+def profile_deleted(profile):
+    remove(DOCTOR if isinstance(profile, Doctor) else PATIENT, [profile.pk])
+    index(APPOINTMENT, getattr(profile, '_search_appointments', []))
+
+
+def user_renamed(user):
+    """Names appear in the user's own entry and in those of their appointments"""
+    doctors = list(Doctor.objects.filter(user_id=user.pk).values_list('id', flat=True))
+    patients = list(Patient.objects.filter(user_id=user.pk).values_list('id', flat=True))
+    index(DOCTOR, doctors)
+    index(PATIENT, patients)
+    index(APPOINTMENT, Appointment.objects.filter(Q(doctor_id__in=doctors) | Q(patient_id__in=patients))
+          .values_list('id', flat=True))
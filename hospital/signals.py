@@ -0,0 +1,263 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db import connections
+from django.db.models.signals import post_init, post_migrate, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import api, choices, database, fragments, rollups, scheduling, search, stats
+from .models import Doctor, Patient, Appointment, AdminApproval, PatientDischargeDetails
+from .roles import invalidate_roles
+
+
+# Connection tuning
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    database.configure_sqlite(connection)
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    # Once per migrate run, after every app, so a rebuilt auth_user is covered
+    if sender.label == 'hospital':
+        database.ensure_user_name_indexes(connections[using])
+
+
+# Role cache invalidation
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_roles_changed(sender, instance, **kwargs):
+    invalidate_roles(instance.pk)
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+@receiver(post_save, sender=AdminApproval)
+@receiver(post_delete, sender=AdminApproval)
+def profile_roles_changed(sender, instance, **kwargs):
+    invalidate_roles(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            invalidate_roles(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear() does not tell us which users it removes
+        invalidate_roles(*instance.user_set.values_list('pk', flat=True))
+    elif pk_set:
+        invalidate_roles(*pk_set)
+
+
+# Dashboard counter snapshot
+@receiver(post_init, sender=Appointment)
+@receiver(post_init, sender=Doctor)
+@receiver(post_init, sender=AdminApproval)
+def remember_counted_state(sender, instance, **kwargs):
+    stats.remember_state(instance)
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        stats.appointment_saved(instance, created)
+
+
+@receiver(post_delete, sender=Appointment)
+def appointment_deleted(sender, instance, **kwargs):
+    stats.appointment_deleted(instance)
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        stats.doctor_saved(instance, created)
+
+
+@receiver(post_delete, sender=Doctor)
+def doctor_deleted(sender, instance, **kwargs):
+    stats.doctor_deleted(instance)
+
+
+@receiver(post_save, sender=Patient)
+def patient_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        stats.patient_saved(instance, created)
+
+
+@receiver(post_delete, sender=Patient)
+def patient_deleted(sender, instance, **kwargs):
+    stats.patient_deleted(instance)
+
+
+@receiver(post_save, sender=AdminApproval)
+def admin_approval_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        stats.admin_approval_saved(instance, created)
+
+
+@receiver(post_delete, sender=AdminApproval)
+def admin_approval_deleted(sender, instance, **kwargs):
+    stats.admin_approval_deleted(instance)
+
+
+# Booked-slot cache
+@receiver(post_init, sender=Appointment)
+def remember_booked_slot(sender, instance, **kwargs):
+    scheduling.remember_slot(instance)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def booked_slot_changed(sender, instance, **kwargs):
+    scheduling.appointment_changed(instance)
+
+
+# Dashboard fragment cache
+@receiver(post_init, sender=Appointment)
+def remember_fragment_owners(sender, instance, **kwargs):
+    fragments.remember_owners(instance)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def appointment_fragments_changed(sender, instance, **kwargs):
+    fragments.appointment_changed(instance)
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def doctor_fragments_changed(sender, instance, **kwargs):
+    fragments.doctor_changed(instance)
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def patient_fragments_changed(sender, instance, **kwargs):
+    fragments.patient_changed(instance)
+
+
+@receiver(post_save, sender=AdminApproval)
+@receiver(post_delete, sender=AdminApproval)
+def admin_approval_fragments_changed(sender, instance, **kwargs):
+    fragments.admin_approval_changed(instance)
+
+
+# Reporting rollups: days the watermark cannot see changing
+@receiver(post_init, sender=Appointment)
+@receiver(post_init, sender=PatientDischargeDetails)
+def remember_rollup_day(sender, instance, **kwargs):
+    rollups.remember_day(instance)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=PatientDischargeDetails)
+def rollup_row_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        rollups.row_saved(instance, created)
+
+
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=PatientDischargeDetails)
+def rollup_row_deleted(sender, instance, **kwargs):
+    rollups.row_deleted(instance)
+
+
+@receiver(post_init, sender=Patient)
+def remember_rollup_doctor(sender, instance, **kwargs):
+    rollups.remember_doctor(instance)
+
+
+@receiver(post_save, sender=Patient)
+def rollup_patient_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        rollups.patient_saved(instance, created)
+
+
+# API version stamps
+# Connected before the form-choice receivers, which re-remember the user's names
+@receiver(post_save, sender=User)
+def user_versions_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created and choices.user_renamed(instance):
+        api.touch_user_rows(instance.pk)
+
+
+@receiver(pre_delete, sender=Doctor)
+@receiver(pre_delete, sender=Patient)
+def profile_versions_deleted(sender, instance, **kwargs):
+    api.touch_profile_rows(instance)
+
+
+# Search index
+@receiver(post_save, sender=Doctor)
+def doctor_search_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(search.DOCTOR, [instance.pk])
+
+
+@receiver(post_save, sender=Patient)
+def patient_search_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(search.PATIENT, [instance.pk])
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_search_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(search.APPOINTMENT, [instance.pk])
+
+
+@receiver(post_delete, sender=Appointment)
+def appointment_search_deleted(sender, instance, **kwargs):
+    search.remove(search.APPOINTMENT, [instance.pk])
+
+
+@receiver(pre_delete, sender=Doctor)
+@receiver(pre_delete, sender=Patient)
+def remember_search_appointments(sender, instance, **kwargs):
+    search.remember_appointments(instance)
+
+
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=Patient)
+def profile_search_deleted(sender, instance, **kwargs):
+    search.profile_deleted(instance)
+
+
+# Also before the form-choice receivers
+@receiver(post_save, sender=User)
+def user_search_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created and choices.user_renamed(instance):
+        search.user_renamed(instance)
+
+
+# Cached form choices
+@receiver(post_init, sender=Doctor)
+def remember_choice_state(sender, instance, **kwargs):
+    choices.remember_choice_state(instance)
+
+
+@receiver(post_init, sender=User)
+def remember_user_names(sender, instance, **kwargs):
+    choices.remember_user_names(instance)
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_choices_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        choices.doctor_saved(instance, created)
+
+
+@receiver(post_save, sender=User)
+def user_choices_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        choices.user_saved(instance, created)
+
+
+@receiver(post_delete, sender=Doctor)
+def doctor_choices_deleted(sender, instance, **kwargs):
+    choices.invalidate_doctor_choices()
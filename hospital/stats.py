@@ -0,0 +1,189 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from . import asyncdb
+from .models import Doctor, Patient, Appointment, AdminApproval, DashboardCounter
+
+COUNTERS = (
+    'total_doctors',
+    'total_patients',
+    'total_appointments',
+    'pending_appointments',
+    'approved_appointments',
+    'pending_doctor_approvals',
+    'pending_admin_approvals',
+)
+
+
+def appointment_counts(today=None):
+    """All appointment counters from one conditional-aggregation query"""
+    today = today or date.today()
+    return Appointment.objects.aggregate(
+        total_appointments=Count('id'),
+        pending_appointments=Count('id', filter=Q(status=False)),
+        approved_appointments=Count('id', filter=Q(status=True)),
+        cancelled_appointments=Count('id', filter=Q(status=False, appointmentDate__lt=today)),
+    )
+
+
+def compute_counters():
+    """Count every snapshot counter straight from the tables"""
+    counters = appointment_counts()
+    del counters['cancelled_appointments']
+    counters.update(Doctor.objects.aggregate(
+        total_doctors=Count('id'),
+        pending_doctor_approvals=Count('id', filter=Q(is_approved=False)),
+    ))
+    counters['total_patients'] = Patient.objects.count()
+    counters['pending_admin_approvals'] = AdminApproval.objects.filter(is_approved=False).count()
+    return counters
+
+
+def rebuild_snapshot():
+    """Replace the counter snapshot with freshly computed values"""
+    with transaction.atomic():
+        counters = compute_counters()
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(
+            DashboardCounter(name=name, value=counters[name]) for name in COUNTERS
+        )
+    return counters
+
+
+_batch = threading.local()
+
+
+def adjust(**deltas):
+    """Apply signed deltas to the snapshot, e.g. adjust(pending_appointments=-1)"""
+    pending = getattr(_batch, 'deltas', None)
+    if pending is not None:
+        pending.update(deltas)
+        return
+    for name, delta in deltas.items():
+        if delta:
+            DashboardCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+@contextmanager
+def batched():
+    """Collect the adjust() calls made inside the block and apply them as one update per counter"""
+    if getattr(_batch, 'deltas', None) is not None:
+        yield
+        return
+    _batch.deltas = Counter()
+    try:
+        yield
+    finally:
+        deltas, _batch.deltas = _batch.deltas, None
+    adjust(**deltas)
+
+
+def counter_snapshot():
+    """The materialized counters, rebuilt first if any are missing"""
+    stats = dict(DashboardCounter.objects.values_list('name', 'value'))
+    if not all(name in stats for name in COUNTERS):
+        stats = rebuild_snapshot()
+    return stats
+
+
+def cancelled_appointments(today):
+    # Depends on the calendar rather than on writes, so it cannot be snapshotted
+    return Appointment.objects.filter(status=False, appointmentDate__lt=today).count()
+
+
+def dashboard_stats(today=None):
+    """Counters for admin_dashboard without scanning the tables"""
+    today = today or date.today()
+    stats = counter_snapshot()
+    stats['cancelled_appointments'] = cancelled_appointments(today)
+    return stats
+
+
+async def adashboard_stats(today=None):
+    """dashboard_stats() for async views, running its two queries side by side"""
+    today = today or date.today()
+    stats, cancelled = await asyncdb.gather(counter_snapshot, lambda: cancelled_appointments(today))
+    stats['cancelled_appointments'] = cancelled
+    return stats
+
+
+# Incremental maintenance, wired up in hospital.signals
+def _tracked(instance, field):
+    # Read the raw attribute so deferred fields are never loaded just for this
+    return instance.__dict__.get(field)
+
+
+def remember_state(instance):
+    instance._stats_state = {
+        'status': _tracked(instance, 'status'),
+        'is_approved': _tracked(instance, 'is_approved'),
+    }
+
+
+def _previous(instance, field):
+    return getattr(instance, '_stats_state', {}).get(field)
+
+
+def appointment_saved(instance, created):
+    if created:
+        adjust(
+            total_appointments=1,
+            pending_appointments=0 if instance.status else 1,
+            approved_appointments=1 if instance.status else 0,
+        )
+    else:
+        previous = _previous(instance, 'status')
+        if previous is not None and previous != instance.status:
+            step = 1 if instance.status else -1
+            adjust(approved_appointments=step, pending_appointments=-step)
+    remember_state(instance)
+
+
+def appointment_deleted(instance):
+    adjust(
+        total_appointments=-1,
+        pending_appointments=0 if instance.status else -1,
+        approved_appointments=-1 if instance.status else 0,
+    )
+
+
+def doctor_saved(instance, created):
+    if created:
+        adjust(total_doctors=1, pending_doctor_approvals=0 if instance.is_approved else 1)
+    else:
+        previous = _previous(instance, 'is_approved')
+        if previous is not None and previous != instance.is_approved:
+            adjust(pending_doctor_approvals=-1 if instance.is_approved else 1)
+    remember_state(instance)
+
+
+def doctor_deleted(instance):
+    adjust(total_doctors=-1, pending_doctor_approvals=0 if instance.is_approved else -1)
+
+
+def patient_saved(instance, created):
+    if created:
+        adjust(total_patients=1)
+
+
+def patient_deleted(instance):
+    adjust(total_patients=-1)
+
+
+def admin_approval_saved(instance, created):
+    if created:
+        adjust(pending_admin_approvals=0 if instance.is_approved else 1)
+    else:
+        previous = _previous(instance, 'is_approved')
+        if previous is not None and previous != instance.is_approved:
+            adjust(pending_admin_approvals=-1 if instance.is_approved else 1)
+    remember_state(instance)
+
+
+def admin_approval_deleted(instance):
+    adjust(pending_admin_approvals=0 if instance.is_approved else -1)
@@ -0,0 +1,22 @@
+from django import template
+
+from hospital.fragments import fragment_timeout, fragment_version
+
+register = template.Library()
+
+
+class _Fragment:
+    def __init__(self, version, timeout):
+        self.version = version
+        self.timeout = timeout
+
+
+@register.simple_tag
+def fragment(kind, *parts):
+    """
+    Version and timeout for a {% cache %} block, e.g.
+
+        {% fragment 'doctor' doctor.id as frag %}
+        {% cache frag.timeout doctor_appointments doctor.id frag.version %}
+    """
+    return _Fragment(fragment_version(kind, *parts), fragment_timeout())
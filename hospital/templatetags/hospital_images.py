@@ -0,0 +1,22 @@
+from django import template
+
+from hospital.derivatives import picture_sources
+
+register = template.Library()
+
+
+@register.inclusion_tag('hospital/profile_picture.html')
+def profile_picture(owner, size, css_class=''):
+    """
+    Responsive <picture> for a doctor's or patient's profile picture, e.g.
+
+        {% profile_picture doctor 40 "h-10 w-10 rounded-full" %}
+    """
+    sources = picture_sources(owner.profile_pic.name, int(size)) if owner.profile_pic else None
+    fallback = owner.profile_thumbnail or owner.profile_pic
+    return {
+        'sources': sources,
+        'fallback_url': fallback.url if fallback else '',
+        'size': size,
+        'css_class': css_class,
+    }
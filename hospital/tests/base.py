@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from datetime import date, time
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from hospital.models import AdminApproval, Appointment, Doctor, Patient, PatientDischargeDetails
+
+# Hashing is not what these tests are about; the fast hasher keeps logins cheap
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+PASSWORD = 'Testing-password-1'
+
+
+def make_user(username, first_name=None, last_name='Tester', **extra):
+    return User.objects.create_user(username, password=PASSWORD, first_name=first_name or username.title(),
+                                    last_name=last_name, **extra)
+
+
+def make_admin(username='admin', **extra):
+    user = make_user(username, **extra)
+    AdminApproval.objects.create(user=user, is_approved=True)
+    return user
+
+
+def _profile_user(username, extra):
+    """The user behind a profile; first_name and last_name may come with the profile fields"""
+    return make_user(username, first_name=extra.pop('first_name', None), last_name=extra.pop('last_name', 'Tester'))
+
+
+def make_doctor(username='doctor', approved=True, department='Cardiologist', **extra):
+    extra.setdefault('address', 'Ward 1')
+    extra.setdefault('mobile', '9000000000')
+    return Doctor.objects.create(user=_profile_user(username, extra), department=department, status=approved,
+                                 is_approved=approved, **extra)
+
+
+def make_patient(username='patient', doctor=None, approved=True, **extra):
+    extra.setdefault('address', 'Street 1')
+    extra.setdefault('mobile', '9000000001')
+    extra.setdefault('symptoms', 'Fever')
+    return Patient.objects.create(user=_profile_user(username, extra), assignedDoctor=doctor, status=approved,
+                                  **extra)
+
+
+def make_appointment(patient, doctor, day=None, at=None, **extra):
+    extra.setdefault('description', 'Checkup')
+    return Appointment.objects.create(patient=patient, doctor=doctor, appointmentDate=day, appointmentTime=at,
+                                      **extra)
+
+
+def make_discharge(patient, admitted, released, medicine=100, other=50, **stored):
+    values = {'daySpent': 0, 'roomCharge': 0, 'doctorFee': 0, 'total': 0, **stored}
+    return PatientDischargeDetails.objects.create(
+        patient=patient, patientName='Someone', assignedDoctorName='Doctor', address='Street 1',
+        admitDate=admitted, releaseDate=released, medicineCost=medicine, OtherCharge=other, **values)
+
+
+def image_bytes(size=(60, 40), color='red', format='JPEG', exif=None):
+    """An encoded test picture; exif is a dict of EXIF tag -> value"""
+    from PIL import Image
+
+    image = Image.new('RGB', size, color)
+    buffer = BytesIO()
+    options = {}
+    if exif:
+        encoded = Image.Exif()
+        encoded.update(exif)
+        options['exif'] = encoded
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def use_temp_media(test):
+    """Point media, upload staging and derivatives at a temporary directory for one test"""
+    root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    media = os.path.join(root, 'media')
+    override = test.settings(MEDIA_ROOT=media, HOSPITAL_UPLOAD_STAGING_ROOT=os.path.join(root, 'staging'),
+                             HOSPITAL_DERIVATIVE_ROOT=os.path.join(media, 'derivatives'))
+    override.enable()
+    test.addCleanup(override.disable)
+    return root
+
+
+def slot(year=2030, month=1, day=7, hour=10, minute=0):
+    """A (date, time) inside the default consulting hours"""
+    return date(year, month, day), time(hour, minute)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class HospitalTestCase(TestCase):
+    """Test case with an empty cache, so role, fragment and choice entries never leak between tests"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def login(self, user):
+        self.client.force_login(user)
+        return self.client
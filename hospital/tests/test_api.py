@@ -0,0 +1,129 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from hospital.models import Doctor
+from hospital.pagination import encode_cursor
+
+from .base import HospitalTestCase, make_admin, make_appointment, make_doctor, make_patient, make_user
+
+
+class ApiListTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_doctor()
+        self.patient = make_patient(doctor=self.doctor)
+        self.appointments = [make_appointment(self.patient, self.doctor) for _ in range(3)]
+        self.client = self.login(make_admin())
+        self.url = reverse('api-list', args=['appointments'])
+
+    def etag(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertFresh(self, etag, **params):
+        self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def assertStale(self, etag, **params):
+        self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_page_newest_first_with_next_link(self):
+        data = self.client.get(self.url, {'limit': 2}).json()
+        ids = [appointment.id for appointment in reversed(self.appointments)]
+        self.assertEqual([row['id'] for row in data['results']], ids[:2])
+        rest = self.client.get(data['next']).json()
+        self.assertEqual([row['id'] for row in rest['results']], ids[2:])
+        self.assertIsNone(rest['next'])
+
+    def test_unchanged_page_is_not_modified(self):
+        self.assertFresh(self.etag(limit=2), limit=2)
+
+    def test_lists_send_no_last_modified(self):
+        self.assertNotIn('Last-Modified', self.client.get(self.url))
+
+    def test_update_on_page_changes_etag(self):
+        etag = self.etag()
+        self.appointments[0].description = 'Moved'
+        self.appointments[0].save()
+        self.assertStale(etag)
+
+    def test_insert_and_delete_change_etag(self):
+        etag = self.etag()
+        make_appointment(self.patient, self.doctor)
+        self.assertStale(etag)
+        etag = self.etag()
+        self.appointments[1].delete()
+        self.assertStale(etag)
+
+    def test_rows_off_the_page_leave_etag_alone(self):
+        # A one-row page reads the newest two rows; the oldest is past both
+        etag = self.etag(limit=1)
+        self.appointments[0].save()
+        self.assertFresh(etag, limit=1)
+
+    def test_validator_reads_only_the_page(self):
+        etag = self.etag(limit=2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFresh(etag, limit=2)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('MAX(', sql)
+        self.assertIn('LIMIT 3', sql)
+
+    def test_sparse_fields(self):
+        data = self.client.get(self.url, {'fields': 'description'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'description'})
+        self.assertEqual(self.client.get(self.url, {'fields': 'nope'}).status_code, 400)
+
+    def test_invalid_cursors(self):
+        for cursor in ('garbage', encode_cursor(['1']), encode_cursor([True])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(self.url, {'after': cursor}).status_code, 400)
+
+
+class ApiScopeTests(HospitalTestCase):
+    def test_anonymous_gets_401(self):
+        self.assertEqual(self.client.get(reverse('api-list', args=['doctors'])).status_code, 401)
+
+    def test_unapproved_user_gets_403(self):
+        self.login(make_user('visitor'))
+        self.assertEqual(self.client.get(reverse('api-list', args=['doctors'])).status_code, 403)
+
+    def test_patient_sees_only_own_appointments(self):
+        doctor = make_doctor()
+        patient, other = make_patient(doctor=doctor), make_patient('other', doctor=doctor)
+        own = make_appointment(patient, doctor)
+        make_appointment(other, doctor)
+        self.login(patient.user)
+        data = self.client.get(reverse('api-list', args=['appointments'])).json()
+        self.assertEqual([row['id'] for row in data['results']], [own.id])
+
+    def test_contact_details_are_for_admins(self):
+        self.login(make_patient().user)
+        make_doctor()
+        response = self.client.get(reverse('api-list', args=['doctors']), {'fields': 'mobile'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiDetailTests(HospitalTestCase):
+    def test_detail_and_not_modified(self):
+        doctor = make_doctor()
+        self.login(make_admin())
+        url = reverse('api-detail', args=['doctors', doctor.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['id'], doctor.pk)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(reverse('api-detail', args=['doctors', doctor.pk + 1])).status_code, 404)
+
+    def test_last_modified_waits_for_the_second_to_pass(self):
+        doctor = make_doctor()
+        self.login(make_admin())
+        # Written just now, so another write could still land in the same second
+        url = reverse('api-detail', args=['doctors', doctor.pk])
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        Doctor.objects.filter(pk=doctor.pk).update(updated_at=timezone.now() - timedelta(minutes=1))
+        self.assertIn('Last-Modified', self.client.get(url))
@@ -0,0 +1,111 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from hospital import approvals, stats
+from hospital.models import AdminApproval, Doctor
+from hospital.roles import get_user_roles
+
+from .base import HospitalTestCase, make_admin, make_doctor, make_user
+
+
+def pending_doctors(count, start=0):
+    return [make_doctor(f'doctor{number}', approved=False) for number in range(start, start + count)]
+
+
+def pending_admins(count, start=0):
+    return [AdminApproval.objects.create(user=make_user(f'admin{number}'), is_approved=False)
+            for number in range(start, start + count)]
+
+
+class BulkApprovalTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.approver = make_admin('approver', is_superuser=True)
+        stats.rebuild_snapshot()
+
+    def test_approving_doctors_stamps_every_row(self):
+        doctors = pending_doctors(3)
+        self.assertEqual(approvals.approve_doctors([doctor.pk for doctor in doctors], self.approver), 3)
+        for doctor in Doctor.objects.filter(pk__in=[doctor.pk for doctor in doctors]):
+            self.assertTrue(doctor.is_approved)
+            self.assertEqual(doctor.approved_by, self.approver)
+            self.assertIsNotNone(doctor.approved_date)
+        self.assertEqual(stats.counter_snapshot(), stats.compute_counters())
+
+    def test_approving_admins_adds_them_to_the_admin_group(self):
+        pending = pending_admins(3)
+        self.assertEqual(approvals.approve_admins([approval.pk for approval in pending], self.approver), 3)
+        self.assertEqual(User.objects.filter(groups__name='Admin').count(), 3)
+        self.assertFalse(AdminApproval.objects.filter(is_approved=False).exists())
+        self.assertEqual(stats.counter_snapshot(), stats.compute_counters())
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def queries(approve, rows):
+            with CaptureQueriesContext(connection) as captured:
+                approve([row.pk for row in rows], self.approver)
+            return len(captured)
+
+        self.assertEqual(queries(approvals.approve_doctors, pending_doctors(2)),
+                         queries(approvals.approve_doctors, pending_doctors(20, start=2)))
+        # Only the first batch would create the Admin group
+        Group.objects.create(name='Admin')
+        self.assertEqual(queries(approvals.approve_admins, pending_admins(2)),
+                         queries(approvals.approve_admins, pending_admins(20, start=2)))
+
+    def test_approved_rows_are_not_approved_again(self):
+        doctor = make_doctor('approved')
+        self.assertEqual(approvals.approve_doctors([doctor.pk], self.approver), 0)
+        doctor.refresh_from_db()
+        self.assertIsNone(doctor.approved_by)
+
+    def test_approval_reaches_the_role_cache(self):
+        doctor = pending_doctors(1)[0]
+        self.assertFalse(get_user_roles(doctor.user).is_approved_doctor)
+        approvals.approve_doctors([doctor.pk], self.approver)
+        self.assertTrue(get_user_roles(doctor.user).is_approved_doctor)
+
+    def test_rejecting_removes_only_pending_accounts(self):
+        pending = pending_doctors(2)
+        approved = make_doctor('approved')
+        count = approvals.reject_doctors([doctor.pk for doctor in pending] + [approved.pk])
+        self.assertEqual(count, 2)
+        self.assertEqual(list(User.objects.filter(doctor__isnull=False)), [approved.user])
+        self.assertEqual(stats.counter_snapshot(), stats.compute_counters())
+
+    def test_rejecting_admins_spares_superusers_and_the_acting_user(self):
+        pending = pending_admins(1)
+        superuser = AdminApproval.objects.create(user=make_user('root', is_superuser=True), is_approved=False)
+        own = AdminApproval.objects.create(user=make_user('self'), is_approved=False)
+        count = approvals.reject_admins([pending[0].pk, superuser.pk, own.pk], keep_user=own.user)
+        self.assertEqual(count, 1)
+        self.assertFalse(User.objects.filter(pk=pending[0].user_id).exists())
+        self.assertEqual(AdminApproval.objects.filter(is_approved=False).count(), 2)
+
+
+class BulkApprovalViewTests(HospitalTestCase):
+    url = reverse('bulk-pending-approvals')
+
+    def test_approves_the_ticked_doctors(self):
+        doctors = pending_doctors(3)
+        self.login(make_admin())
+        response = self.client.post(self.url, {'kind': 'doctor', 'action': 'approve',
+                                               'ids': [doctors[0].pk, doctors[1].pk]})
+        self.assertRedirects(response, reverse('admin-pending-approvals'), fetch_redirect_response=False)
+        self.assertEqual(Doctor.objects.filter(is_approved=False).get(), doctors[2])
+
+    def test_admin_approvals_need_a_superuser(self):
+        pending = pending_admins(1)
+        self.login(make_admin())
+        self.client.post(self.url, {'kind': 'admin', 'action': 'approve', 'ids': [pending[0].pk]})
+        self.assertFalse(AdminApproval.objects.get(pk=pending[0].pk).is_approved)
+
+    def test_rejects_bad_input(self):
+        doctor = pending_doctors(1)[0]
+        self.login(make_admin())
+        for data in ({'kind': 'doctor', 'action': 'delete', 'ids': [doctor.pk]},
+                     {'kind': 'doctor', 'action': 'approve', 'ids': ['x']}):
+            with self.subTest(data=data):
+                self.client.post(self.url, data)
+                self.assertTrue(Doctor.objects.filter(pk=doctor.pk, is_approved=False).exists())
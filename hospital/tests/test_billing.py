@@ -0,0 +1,97 @@
+import importlib.util
+import io
+from datetime import date
+from unittest import mock
+
+from django.core.management import call_command
+
+from hospital import billing
+from hospital.models import PatientDischargeDetails
+
+from .base import HospitalTestCase, make_discharge, make_doctor, make_patient
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+TARIFFS = {'Cardiologist': {'room': 3000, 'doctor_fee': 1500}}
+DEFAULT_TARIFF = {'room': 1500, 'doctor_fee': 800}
+
+
+class BillingTestCase(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        tariffs = self.settings(HOSPITAL_BILLING_TARIFFS=TARIFFS, HOSPITAL_BILLING_DEFAULT_TARIFF=DEFAULT_TARIFF)
+        tariffs.enable()
+        self.addCleanup(tariffs.disable)
+        self.cardiology = make_patient(doctor=make_doctor())
+        self.unassigned = make_patient('walkin')
+
+    def engines(self):
+        """Each test runs on both engines; numpy only where the optional extra is installed"""
+        for engine in (['numpy'] if HAS_NUMPY else []) + ['python']:
+            numpy = engine == 'numpy'
+            with self.subTest(engine=engine), mock.patch.object(billing, 'has_numpy', return_value=numpy):
+                yield engine
+
+
+class BillTests(BillingTestCase):
+    def test_charges_follow_days_and_tariff(self):
+        for _ in self.engines():
+            PatientDischargeDetails.objects.all().delete()
+            four_days = make_discharge(self.cardiology, date(2030, 1, 1), date(2030, 1, 5))
+            same_day = make_discharge(self.unassigned, date(2030, 1, 1), date(2030, 1, 1))
+            run = billing.bill(batch_size=1)
+            self.assertEqual((run.checked, run.updated, run.invalid), (2, 2, []))
+            four_days.refresh_from_db()
+            same_day.refresh_from_db()
+            self.assertEqual((four_days.daySpent, four_days.roomCharge, four_days.doctorFee, four_days.total),
+                             (4, 12000, 6000, 18150))
+            # A same-day discharge is one day at the default rates
+            self.assertEqual((same_day.daySpent, same_day.roomCharge, same_day.doctorFee, same_day.total),
+                             (1, 1500, 800, 2450))
+
+    def test_only_changed_bills_are_written(self):
+        for _ in self.engines():
+            PatientDischargeDetails.objects.all().delete()
+            make_discharge(self.cardiology, date(2030, 1, 1), date(2030, 1, 3))
+            make_discharge(self.cardiology, date(2030, 1, 1), date(2030, 1, 2),
+                           daySpent=1, roomCharge=3000, doctorFee=1500, total=4650)
+            self.assertEqual(billing.bill().updated, 1)
+            self.assertEqual(billing.bill().updated, 0)
+
+    def test_release_before_admission_is_skipped(self):
+        for _ in self.engines():
+            PatientDischargeDetails.objects.all().delete()
+            backwards = make_discharge(self.cardiology, date(2030, 1, 5), date(2030, 1, 1))
+            run = billing.bill()
+            self.assertEqual((run.updated, run.invalid), (0, [backwards.id]))
+            backwards.refresh_from_db()
+            self.assertEqual(backwards.total, 0)
+
+    def test_dry_run_writes_nothing(self):
+        for _ in self.engines():
+            PatientDischargeDetails.objects.all().delete()
+            discharge = make_discharge(self.cardiology, date(2030, 1, 1), date(2030, 1, 3))
+            self.assertEqual(billing.bill(dry_run=True).updated, 1)
+            discharge.refresh_from_db()
+            self.assertEqual(discharge.total, 0)
+
+
+class ReconcileTests(BillingTestCase):
+    def test_finds_and_fixes_totals_that_do_not_add_up(self):
+        for _ in self.engines():
+            PatientDischargeDetails.objects.all().delete()
+            make_discharge(self.cardiology, date(2030, 1, 1), date(2030, 1, 2),
+                           daySpent=1, roomCharge=3000, doctorFee=1500, total=4650)
+            wrong = make_discharge(self.cardiology, date(2030, 1, 1), date(2030, 1, 2),
+                                   daySpent=1, roomCharge=3000, doctorFee=1500, total=9)
+            result = billing.reconcile(chunk_size=1)
+            self.assertEqual((result.checked, result.mismatches), (2, [(wrong.id, 9, 4650)]))
+            self.assertEqual(billing.fix_totals(result.mismatches), 1)
+            self.assertEqual(billing.reconcile().mismatches, [])
+
+    def test_command_reports_the_engine(self):
+        make_discharge(self.cardiology, date(2030, 1, 1), date(2030, 1, 2), total=1)
+        for engine in self.engines():
+            out = io.StringIO()
+            call_command('bill_discharges', '--reconcile', '--fix', stdout=out)
+            self.assertIn(f'({engine})', out.getvalue())
@@ -0,0 +1,59 @@
+from django.urls import reverse
+
+from hospital import choices
+
+from .base import HospitalTestCase, make_admin, make_doctor, make_patient
+
+
+class PatientSearchTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.anna = make_patient('anna', first_name='Anna', last_name='Berg')
+        self.andrew = make_patient('drew', first_name='Andrew', last_name='Anders')
+        self.bob = make_patient('bob', first_name='Bob', last_name='Annett')
+
+    def ids(self, query, **kwargs):
+        return [result['id'] for result in choices.search_patients(query, **kwargs)]
+
+    def test_prefix_of_any_name_case_insensitive(self):
+        self.assertEqual(self.ids('AN'), [self.andrew.pk, self.anna.pk, self.bob.pk])
+        self.assertEqual(self.ids('dre'), [self.andrew.pk])
+        self.assertEqual(self.ids('nna'), [])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.ids('an be'), [self.anna.pk])
+
+    def test_wildcards_are_literal(self):
+        self.assertEqual(self.ids('%'), [])
+        self.assertEqual(self.ids('_nna'), [])
+
+    def test_inactive_patients_are_left_out(self):
+        make_patient('annie', first_name='Annie', approved=False)
+        self.assertNotIn('Annie', [result['text'] for result in choices.search_patients('ann')])
+
+    def test_limit_and_empty_query(self):
+        self.assertEqual(len(self.ids('', limit=2)), 2)
+
+    def test_renames_show_at_once(self):
+        self.bob.user.first_name = 'Zed'
+        self.bob.user.save()
+        self.assertEqual(self.ids('zed'), [self.bob.pk])
+
+    def test_one_query_per_search(self):
+        with self.assertNumQueries(1):
+            choices.search_patients('an be')
+
+    def test_labels_for_selected_ids(self):
+        self.assertEqual(choices.patient_labels([str(self.anna.pk), '', 'junk']), [(self.anna.pk, str(self.anna))])
+
+
+class AutocompleteViewTests(HospitalTestCase):
+    def test_staff_only(self):
+        patient = make_patient(first_name='Anna')
+        url = reverse('autocomplete-patients')
+        self.login(patient.user)
+        self.assertEqual(self.client.get(url, {'q': 'an'}).status_code, 403)
+        self.login(make_admin())
+        self.assertEqual(self.client.get(url, {'q': 'an'}).json()['results'], [{'id': patient.pk, 'text': str(patient)}])
+        self.login(make_doctor().user)
+        self.assertEqual(self.client.get(url, {'q': 'zz'}).json()['results'], [])
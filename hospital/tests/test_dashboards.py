@@ -0,0 +1,117 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from hospital import fragments, views
+
+from .base import HospitalTestCase, make_admin, make_appointment, make_doctor, make_patient
+
+
+def expire_after_lookup():
+    """Patch the view's fragment lookup so every fragment expires right after it was read"""
+    lookup = fragments.acached_fragments
+
+    async def lookup_then_expire(*wanted):
+        found = await lookup(*wanted)
+        await cache.aclear()
+        return found
+    return mock.patch.object(views, 'acached_fragments', lookup_then_expire)
+
+
+class DashboardFragmentTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_doctor()
+        self.patient = make_patient(doctor=self.doctor)
+        self.appointment = make_appointment(self.patient, self.doctor, description='Knee pain')
+
+    def test_doctor_dashboard_serves_its_cached_block(self):
+        self.login(self.doctor.user)
+        url = reverse('doctor-dashboard')
+        self.assertContains(self.client.get(url), 'Knee pain')
+        with expire_after_lookup():
+            # The view found the block, so it renders that copy without the rows
+            self.assertContains(self.client.get(url), 'Knee pain')
+        # Expired: the rows are fetched and the block is rendered again
+        self.assertContains(self.client.get(url), 'Knee pain')
+
+    def test_patient_dashboard_serves_its_cached_blocks(self):
+        self.login(self.patient.user)
+        url = reverse('patient-dashboard')
+        self.assertContains(self.client.get(url), 'Knee pain')
+        with expire_after_lookup():
+            self.assertContains(self.client.get(url), 'Knee pain')
+
+    def test_admin_dashboard_serves_its_cached_stats(self):
+        self.login(make_admin())
+        url = reverse('admin-dashboard')
+        first = self.client.get(url)
+        self.assertEqual(first.context['stats']['total_doctors'], 1)
+        with expire_after_lookup():
+            second = self.client.get(url)
+        # Served from the copy the view found, so the stats were never computed
+        self.assertIsNone(second.context['stats'])
+        self.assertContains(second, 'Total Doctors')
+
+    def test_cached_block_skips_the_appointment_query(self):
+        self.login(self.doctor.user)
+        url = reverse('doctor-dashboard')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries.captured_queries if 'hospital_appointment' in query['sql']])
+
+    def test_changes_show_at_once(self):
+        self.login(self.doctor.user)
+        url = reverse('doctor-dashboard')
+        self.client.get(url)
+        self.appointment.description = 'Back pain'
+        self.appointment.save()
+        self.assertContains(self.client.get(url), 'Back pain')
+
+
+class FragmentHelperTests(HospitalTestCase):
+    def test_async_version_matches_sync_and_follows_bumps(self):
+        version = async_to_sync(fragments.afragment_version)('doctor', 1)
+        self.assertEqual(version, fragments.fragment_version('doctor', 1))
+        fragments.bump('doctor', 1)
+        self.assertNotEqual(async_to_sync(fragments.afragment_version)('doctor', 1), version)
+
+    def test_cached_fragments_in_order(self):
+        cache.set(make_template_fragment_key('second', ['v']), '<p>two</p>')
+        found = async_to_sync(fragments.acached_fragments)(('first', 'v'), ('second', 'v'))
+        self.assertEqual(found, [None, '<p>two</p>'])
+
+
+class AsyncRenderingTests(HospitalTestCase):
+    def test_async_views_render_off_the_event_loop(self):
+        """Templates hash pictures and read the cache synchronously, which must not stall the loop"""
+        doctor = make_doctor()
+        patient = make_patient(doctor=doctor)
+        on_loop = []
+        render = views.render
+
+        def recording_render(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(args[1])
+            except RuntimeError:
+                pass
+            return render(*args, **kwargs)
+
+        admin = make_admin()
+        pages = [(admin, name) for name in ('admin-dashboard', 'admin-doctors', 'admin-patients',
+                                                   'admin-appointments', 'admin-reports')]
+        pages += [(doctor.user, 'doctor-dashboard'), (patient.user, 'patient-dashboard')]
+        with mock.patch.object(views, 'render', recording_render):
+            for user, name in pages:
+                with self.subTest(name):
+                    self.login(user)
+                    self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+        self.assertEqual(on_loop, [])
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase
+
+from hospital.backends.sqlite3.base import DatabaseWrapper
+from hospital.database import describe
+
+
+def scratch_connection(test):
+    """A connection through the hospital backend to a new database file, closed after the test"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    path = os.path.join(directory.name, 'scratch.sqlite3')
+    scratch = DatabaseWrapper({**connection.settings_dict, 'NAME': path}, alias='scratch')
+    test.addCleanup(scratch.close)
+    # Registered so transaction.atomic(using='scratch') finds it
+    connections['scratch'] = scratch
+    test.addCleanup(connections.__delitem__, 'scratch')
+    return scratch, path
+
+
+def pragma(db, name):
+    with db.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection tuning')
+class SqliteProfileTests(SimpleTestCase):
+    def test_new_connections_get_the_pragmas(self):
+        scratch, _ = scratch_connection(self)
+        with self.settings(HOSPITAL_SQLITE_PRAGMAS={'journal_mode': 'wal', 'synchronous': 'normal',
+                                                    'busy_timeout': 1234, 'temp_store': 'memory'}):
+            scratch.ensure_connection()
+        self.assertEqual(pragma(scratch, 'journal_mode'), 'wal')
+        self.assertEqual(pragma(scratch, 'synchronous'), 1)
+        self.assertEqual(pragma(scratch, 'busy_timeout'), 1234)
+        self.assertEqual(pragma(scratch, 'temp_store'), 2)
+        self.assertEqual(describe(scratch), 'sqlite (wal journal)')
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        scratch, path = scratch_connection(self)
+        with scratch.cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (value integer)')
+        other = sqlite3.connect(path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using='scratch'):
+            # Nothing written yet, but another writer is already shut out
+            with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+                other.execute('INSERT INTO counter VALUES (1)')
+        other.execute('INSERT INTO counter VALUES (1)')
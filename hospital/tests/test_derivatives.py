@@ -0,0 +1,93 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.template import Context, Template
+from django.urls import reverse
+from PIL import Image
+
+from hospital import derivatives
+
+from .base import HospitalTestCase, image_bytes, make_doctor, use_temp_media
+
+
+class DerivativeTestCase(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        use_temp_media(self)
+        self.doctor = make_doctor()
+        self.set_picture('blue')
+
+    def set_picture(self, color):
+        self.doctor.profile_pic.save('face.jpg', ContentFile(image_bytes((100, 50), color)))
+
+    def overwrite_picture(self, color):
+        """Replace the stored file in place, as a restore or a manual edit would"""
+        os.remove(self.doctor.profile_pic.path)
+        with open(self.doctor.profile_pic.path, 'wb') as handle:
+            handle.write(image_bytes((100, 50), color, format='PNG'))
+
+
+class SourceHashTests(DerivativeTestCase):
+    def test_follows_the_content(self):
+        digest = derivatives.source_hash(self.doctor.profile_pic.name)
+        self.assertEqual(derivatives.source_hash(self.doctor.profile_pic.name), digest)
+        self.overwrite_picture('green')
+        self.assertNotEqual(derivatives.source_hash(self.doctor.profile_pic.name), digest)
+
+    def test_missing_source(self):
+        self.assertIsNone(derivatives.source_hash('profile_pic/gone.jpg'))
+        self.assertIsNone(derivatives.picture_sources('profile_pic/gone.jpg', 40))
+
+    def test_sources_offer_1x_and_2x(self):
+        digest = derivatives.source_hash(self.doctor.profile_pic.name)
+        sources = derivatives.picture_sources(self.doctor.profile_pic.name, 40)
+        first = reverse('profile-derivative', args=[digest, 40, 'jpg'])
+        second = reverse('profile-derivative', args=[digest, 80, 'jpg'])
+        self.assertEqual(sources['jpg'], {'src': first, 'srcset': f'{first} 1x, {second} 2x'})
+
+
+class DerivativeViewTests(DerivativeTestCase):
+    def fetch(self, size=80, ext='jpg', digest=None):
+        digest = digest or derivatives.source_hash(self.doctor.profile_pic.name)
+        return self.client.get(reverse('profile-derivative', args=[digest, size, ext]))
+
+    def test_renders_on_first_request_and_is_immutable(self):
+        self.login(self.doctor.user)
+        response = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        picture = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(picture.size, (80, 80))
+
+    def test_old_hash_stops_resolving_once_the_file_changes(self):
+        self.login(self.doctor.user)
+        old = derivatives.source_hash(self.doctor.profile_pic.name)
+        self.overwrite_picture('red')
+        self.assertEqual(self.fetch(size=160, digest=old).status_code, 404)
+        self.assertEqual(self.fetch(size=160).status_code, 200)
+
+    def test_unknown_sizes_and_hashes(self):
+        self.login(self.doctor.user)
+        self.assertEqual(self.fetch(size=81).status_code, 404)
+        self.assertEqual(self.fetch(digest='0' * 20).status_code, 404)
+
+    def test_needs_a_login(self):
+        self.assertEqual(self.fetch().status_code, 302)
+
+
+class ProfilePictureTagTests(DerivativeTestCase):
+    template = Template('{% load hospital_images %}{% profile_picture owner 40 "avatar" %}')
+
+    def test_renders_a_picture_element(self):
+        html = self.template.render(Context({'owner': self.doctor}))
+        self.assertIn('<picture>', html)
+        self.assertIn('width="40"', html)
+        self.assertIn('class="avatar"', html)
+
+    def test_falls_back_to_the_stored_file(self):
+        os.remove(self.doctor.profile_pic.path)
+        html = self.template.render(Context({'owner': self.doctor}))
+        self.assertNotIn('<picture>', html)
+        self.assertIn(f'src="{self.doctor.profile_pic.url}"', html)
@@ -0,0 +1,96 @@
+import csv
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from hospital import exports
+
+from .base import HospitalTestCase, make_admin, make_appointment, make_doctor, make_patient, slot
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+class ExportTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_doctor()
+        self.other = make_doctor('other')
+        self.patient = make_patient(doctor=self.doctor, first_name='Anna', last_name='Berg')
+        self.first = make_appointment(self.patient, self.doctor, *slot(day=7))
+        self.second = make_appointment(self.patient, self.other, *slot(day=8))
+        self.orphan = make_appointment(None, None, *slot(day=9))
+
+    def csv_ids(self, **filters):
+        data = b''.join(exports.export('appointments', 'csv', **filters)).decode()
+        return [int(row['id']) for row in csv.DictReader(io.StringIO(data))]
+
+    def test_csv_in_chunks(self):
+        chunks = list(exports.export('appointments', 'csv', chunk_size=1))
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode())))
+        self.assertEqual([int(row['id']) for row in rows], [self.first.id, self.second.id, self.orphan.id])
+        self.assertEqual(rows[0]['patient_name'], 'Anna Berg')
+        self.assertEqual(rows[0]['appointment_date'], '2030-01-07')
+        # No lone space for a missing doctor or patient
+        self.assertEqual((rows[2]['patient_name'], rows[2]['doctor_name']), ('', ''))
+
+    def test_empty_export_still_has_a_header(self):
+        rows = b''.join(exports.export('discharges', 'csv')).decode().splitlines()
+        self.assertEqual(rows, [','.join(exports.DATASETS['discharges'].names)])
+
+    def test_filters(self):
+        self.assertEqual(self.csv_ids(date_from=date(2030, 1, 8)), [self.second.id, self.orphan.id])
+        self.assertEqual(self.csv_ids(date_to=date(2030, 1, 7)), [self.first.id])
+        self.assertEqual(self.csv_ids(doctor=self.other.id), [self.second.id])
+
+    def test_ndjson(self):
+        lines = b''.join(exports.export('appointments', 'ndjson', chunk_size=2)).decode().splitlines()
+        first = json.loads(lines[0])
+        self.assertEqual(len(lines), 3)
+        self.assertEqual((first['id'], first['appointment_time'], first['approved']), (self.first.id, '10:00:00', False))
+
+    @unittest.skipIf(HAS_PYARROW, 'pyarrow is installed')
+    def test_parquet_needs_pyarrow(self):
+        self.assertNotIn('parquet', exports.available_formats())
+        with self.assertRaisesMessage(exports.ExportUnavailable, 'requirements-optional.txt'):
+            exports.export('appointments', 'parquet')
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'appointments', format='parquet', output='unused.parquet')
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is an optional extra')
+    def test_parquet_round_trip(self):
+        import pyarrow.parquet as pq
+
+        data = b''.join(exports.export('appointments', 'parquet', chunk_size=2))
+        table = pq.read_table(io.BytesIO(data))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.num_row_groups, 2)
+        self.assertEqual(table.column('id').to_pylist(), [self.first.id, self.second.id, self.orphan.id])
+
+    def test_command_writes_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out.ndjson')
+            call_command('export_data', 'appointments', format='ndjson', doctor=self.doctor.id, output=path,
+                         stderr=io.StringIO())
+            with open(path) as handle:
+                self.assertEqual([json.loads(line)['id'] for line in handle], [self.first.id])
+
+    def test_admin_download(self):
+        url = reverse('export-data', args=['appointments'])
+        self.login(self.patient.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.login(make_admin())
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename="appointments-'))
+        self.assertEqual(len(list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))), 4)
+        self.assertEqual(self.client.get(url, {'date_from': '2030-02-01', 'date_to': '2030-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export-data', args=['nothing'])).status_code, 404)
+        if not HAS_PYARROW:
+            self.assertEqual(self.client.get(url, {'format': 'parquet'}).status_code, 400)
@@ -0,0 +1,91 @@
+from django.template import Context, Template
+from django.urls import reverse
+
+from hospital import fragments
+
+from .base import HospitalTestCase, make_admin, make_appointment, make_doctor, make_patient
+
+
+class FragmentInvalidationTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_doctor()
+        self.patient = make_patient(doctor=self.doctor)
+        self.bystander = make_doctor('bystander')
+
+    def versions(self):
+        return {
+            'dashboard': fragments.fragment_version('dashboard'),
+            'doctor': fragments.fragment_version('doctor', self.doctor.pk),
+            'patient': fragments.fragment_version('patient', self.patient.pk),
+            'bystander': fragments.fragment_version('doctor', self.bystander.pk),
+        }
+
+    def assertBumped(self, before, *scopes):
+        after = self.versions()
+        self.assertEqual({scope for scope in after if after[scope] != before[scope]}, set(scopes))
+
+    def test_appointment_changes_bump_its_owners_only(self):
+        before = self.versions()
+        appointment = make_appointment(self.patient, self.doctor)
+        self.assertBumped(before, 'dashboard', 'doctor', 'patient')
+        before = self.versions()
+        appointment.delete()
+        self.assertBumped(before, 'dashboard', 'doctor', 'patient')
+
+    def test_reassigning_an_appointment_bumps_both_doctors(self):
+        appointment = make_appointment(self.patient, self.doctor)
+        before = self.versions()
+        appointment.doctor = self.bystander
+        appointment.save()
+        self.assertBumped(before, 'dashboard', 'doctor', 'patient', 'bystander')
+
+    def test_profile_and_approval_changes(self):
+        before = self.versions()
+        self.doctor.mobile = '9111111111'
+        self.doctor.save()
+        self.assertBumped(before, 'dashboard', 'doctor')
+        before = self.versions()
+        self.patient.delete()
+        self.assertBumped(before, 'dashboard', 'patient')
+        before = self.versions()
+        make_admin()
+        self.assertBumped(before, 'dashboard')
+
+    def test_bump_all_reaches_every_scope(self):
+        before = self.versions()
+        fragments.bump_all()
+        self.assertBumped(before, *before)
+
+    def test_bumped_again_on_commit(self):
+        before = fragments.fragment_version('doctor', self.doctor.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            fragments.bump('doctor', self.doctor.pk)
+        during = fragments.fragment_version('doctor', self.doctor.pk)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len({before, during, fragments.fragment_version('doctor', self.doctor.pk)}), 3)
+
+
+class FragmentTagTests(HospitalTestCase):
+    template = Template(
+        "{% load cache hospital_cache %}{% fragment 'doctor' 1 as frag %}"
+        "{% cache frag.timeout block frag.version %}{{ value }}{% endcache %}"
+    )
+
+    def render(self, value):
+        return self.template.render(Context({'value': value}))
+
+    def test_block_is_cached_until_its_scope_is_bumped(self):
+        self.assertEqual(self.render('first'), 'first')
+        self.assertEqual(self.render('second'), 'first')
+        fragments.bump('doctor', 1)
+        self.assertEqual(self.render('third'), 'third')
+
+    def test_role_cards_are_cached_per_role(self):
+        self.login(make_patient().user)
+        self.assertContains(self.client.get(reverse('home')), 'PATIENT DASHBOARD')
+        self.login(make_doctor().user)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'DOCTOR DASHBOARD')
+        self.assertNotContains(response, 'PATIENT DASHBOARD')
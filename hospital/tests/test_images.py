@@ -0,0 +1,149 @@
+import os
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from hospital import images
+from hospital.forms import PatientForm
+from hospital.models import Patient, ProfileImageJob
+
+from .base import HospitalTestCase, PASSWORD, image_bytes, make_patient, use_temp_media
+
+ORIENTATION = 0x0112
+ROTATED_90 = 6
+
+
+def upload(content=None, name='face.jpg'):
+    return SimpleUploadedFile(name, image_bytes() if content is None else content, content_type='image/jpeg')
+
+
+class ImagePipelineTestCase(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = use_temp_media(self)
+
+    def stage(self, owner, content=None):
+        return images.stage_upload(owner, upload(content))
+
+
+class StagingTests(ImagePipelineTestCase):
+    def test_signup_stages_the_picture_without_decoding_it(self):
+        data = {'first_name': 'Pat', 'last_name': 'Ient', 'username': 'pat', 'password': PASSWORD,
+                'confirm_password': PASSWORD, 'address': 'Street 1', 'mobile': '9000000001', 'symptoms': 'Fever',
+                'profile_pic': upload(b'not decoded in the request')}
+        response = self.client.post(reverse('patientsignup'), data)
+        self.assertRedirects(response, reverse('patient-dashboard'), fetch_redirect_response=False)
+        patient = Patient.objects.get(user__username='pat')
+        self.assertFalse(patient.profile_pic)
+        job = patient.image_jobs.get()
+        self.assertEqual((job.state, job.original_name), (ProfileImageJob.PENDING, 'face.jpg'))
+        self.assertTrue(os.path.exists(images.staged_path(job)))
+
+    def test_form_checks_extension_and_size(self):
+        form_data = {'address': 'Street 1', 'mobile': '9000000001', 'symptoms': 'Fever'}
+        form = PatientForm(form_data, {'profile_pic': upload(name='face.exe')})
+        self.assertIn('profile_pic', form.errors)
+        with self.settings(HOSPITAL_MAX_UPLOAD_BYTES=10):
+            form = PatientForm(form_data, {'profile_pic': upload()})
+            self.assertIn('profile_pic', form.errors)
+
+
+class RenderTests(ImagePipelineTestCase):
+    def render(self, content, max_size=32, thumbnail_size=16):
+        path = os.path.join(self.root, 'source')
+        with open(path, 'wb') as handle:
+            handle.write(content)
+        picture, thumbnail = images.render_profile_image(path, max_size, thumbnail_size, 80)
+        return Image.open(BytesIO(picture)), Image.open(BytesIO(thumbnail))
+
+    def test_resizes_and_thumbnails(self):
+        picture, thumbnail = self.render(image_bytes((120, 60), format='PNG'))
+        self.assertEqual((picture.format, picture.size), ('JPEG', (32, 16)))
+        self.assertEqual(thumbnail.size, (16, 16))
+
+    def test_applies_and_strips_the_exif_orientation(self):
+        picture, _ = self.render(image_bytes((60, 30), exif={ORIENTATION: ROTATED_90}), max_size=100)
+        self.assertEqual(picture.size, (30, 60))
+        self.assertNotIn(ORIENTATION, picture.getexif())
+
+    def test_flattens_transparency_onto_white(self):
+        transparent = BytesIO()
+        Image.new('RGBA', (10, 10), (0, 0, 0, 0)).save(transparent, 'PNG')
+        picture, _ = self.render(transparent.getvalue())
+        self.assertGreater(min(picture.convert('L').getdata()), 240)
+
+    def test_rejects_anything_that_is_not_an_image(self):
+        with self.assertRaises(images.InvalidImage):
+            self.render(b'GIF89a but not really')
+
+
+class JobTests(ImagePipelineTestCase):
+    def test_jobs_are_claimed_once(self):
+        patient = make_patient()
+        job = self.stage(patient)
+        self.assertEqual(images.claim_jobs(10), [job])
+        self.assertEqual(images.claim_jobs(10), [])
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), (ProfileImageJob.PROCESSING, 1))
+
+    def test_jobs_of_a_dead_worker_are_reclaimed(self):
+        job = self.stage(make_patient())
+        images.claim_jobs(10)
+        ProfileImageJob.objects.filter(pk=job.pk).update(claimed_date=timezone.now() - timedelta(hours=1))
+        self.assertEqual([claimed.attempts for claimed in images.claim_jobs(10)], [2])
+
+    def test_finishing_stores_the_picture_and_clears_staging(self):
+        patient = make_patient()
+        job = self.stage(patient)
+        staged = images.staged_path(job)
+        images.finish_job(images.claim_jobs(1)[0], image_bytes(), image_bytes((8, 8)))
+        patient.refresh_from_db()
+        self.assertTrue(patient.profile_pic.name.endswith('.jpg'))
+        self.assertTrue(os.path.exists(patient.profile_thumbnail.path))
+        self.assertFalse(os.path.exists(staged))
+        self.assertEqual(ProfileImageJob.objects.get(pk=job.pk).state, ProfileImageJob.DONE)
+
+    def test_finishing_moves_the_owners_version(self):
+        patient = make_patient()
+        stamped = timezone.now() - timedelta(days=1)
+        Patient.objects.filter(pk=patient.pk).update(updated_at=stamped)
+        self.stage(patient)
+        images.finish_job(images.claim_jobs(1)[0], image_bytes(), image_bytes((8, 8)))
+        # updated_at feeds the API's ETag and Last-Modified
+        self.assertGreater(Patient.objects.get(pk=patient.pk).updated_at, stamped)
+
+    def test_failures_retry_until_the_limit(self):
+        job = self.stage(make_patient())
+        for attempt in range(1, images.MAX_ATTEMPTS + 1):
+            claimed = images.claim_jobs(1)[0]
+            images.fail_job(claimed, RuntimeError('boom'), retry=True)
+            claimed.refresh_from_db()
+            expected = ProfileImageJob.FAILED if attempt == images.MAX_ATTEMPTS else ProfileImageJob.PENDING
+            self.assertEqual(claimed.state, expected)
+        self.assertFalse(os.path.exists(images.staged_path(job)))
+
+
+class ProcessCommandTests(ImagePipelineTestCase):
+    def test_processes_the_queue(self):
+        good, bad = make_patient('good'), make_patient('bad')
+        self.stage(good)
+        self.stage(bad, b'not an image')
+        out, err = StringIO(), StringIO()
+        call_command('process_profile_images', workers=1, stdout=out, stderr=err)
+        self.assertIn('Processed 1 pictures, 1 failed.', out.getvalue())
+        self.assertIn('not a usable image', err.getvalue())
+        good.refresh_from_db()
+        self.assertTrue(good.profile_thumbnail)
+        self.assertEqual(bad.image_jobs.get().state, ProfileImageJob.FAILED)
+
+    def test_backfill_queues_pictures_without_thumbnails(self):
+        patient = make_patient()
+        patient.profile_pic.save('old.jpg', SimpleUploadedFile('old.jpg', image_bytes()))
+        call_command('process_profile_images', workers=1, backfill=True, stdout=StringIO())
+        patient.refresh_from_db()
+        self.assertTrue(patient.profile_thumbnail)
@@ -0,0 +1,167 @@
+import csv
+import os
+import tempfile
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from hospital import imports, stats
+from hospital.models import Appointment, Doctor, ImportJob, Patient, SearchEntry
+
+from .base import HospitalTestCase, make_admin, make_doctor, make_patient
+
+
+class ImportTestCase(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        staging = self.settings(HOSPITAL_UPLOAD_STAGING_ROOT=os.path.join(self.directory, 'staging'))
+        staging.enable()
+        self.addCleanup(staging.disable)
+
+    def write_csv(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerows(rows)
+        return path
+
+    def run_import(self, kind, path, batch_size=100):
+        return imports.run(imports.job_for_file(kind, path), batch_size=batch_size)
+
+    def error_rows(self, job):
+        with open(imports.error_report_path(job), newline='') as handle:
+            return list(csv.DictReader(handle))
+
+
+class PatientImportTests(ImportTestCase):
+    header = ['username', 'first_name', 'last_name', 'password', 'address', 'mobile', 'symptoms', 'status',
+              'assigned_doctor', 'admit_date']
+
+    def test_valid_rows_are_imported_and_bad_ones_reported(self):
+        doctor = make_doctor('house')
+        path = self.write_csv('patients.csv', [
+            self.header,
+            ['ann', 'Ann', 'Lee', 'Secret-pass-123', '1 Road', '9876543210', 'Cough', 'yes', 'house', '2024-02-01'],
+            ['bob', 'Bob', 'Ray', '', '2 Road', '9876543211', 'Rash', 'no', '', ''],
+            ['ann', 'Ann', 'Again', '', '3 Road', '9876543212', 'Cough', '', '', ''],
+            ['cat', 'Cat', 'Kim', '', '4 Road', '9876543213', '', 'maybe', 'nobody', 'not a date'],
+        ])
+        job = self.run_import(ImportJob.PATIENTS, path)
+
+        self.assertEqual((job.state, job.imported, job.rejected), (ImportJob.DONE, 2, 2))
+        ann = Patient.objects.select_related('user').get(user__username='ann')
+        self.assertEqual((ann.assignedDoctor, ann.status, ann.admitDate), (doctor, True, date(2024, 2, 1)))
+        self.assertTrue(ann.user.check_password('Secret-pass-123'))
+        self.assertFalse(User.objects.get(username='bob').has_usable_password())
+
+        errors = {row['row']: row['errors'] for row in self.error_rows(job)}
+        self.assertEqual(set(errors), {'3', '4'})
+        self.assertIn('username', errors['3'])
+        self.assertIn('symptoms', errors['4'])
+        self.assertIn('status', errors['4'])
+
+    def test_imports_keep_counters_and_search_in_step(self):
+        path = self.write_csv('patients.csv', [
+            self.header,
+            ['zed', 'Zedekiah', 'Moss', '', '1 Road', '9876543210', 'Wheezing', '', '', ''],
+        ])
+        self.run_import(ImportJob.PATIENTS, path)
+        self.assertEqual(stats.counter_snapshot(), stats.compute_counters())
+        patient = Patient.objects.get(user__username='zed')
+        self.assertTrue(SearchEntry.objects.filter(kind='patient', object_id=patient.id).exists())
+
+    def test_wrong_columns_fail_the_whole_file(self):
+        path = self.write_csv('patients.csv', [['username', 'shoe_size'], ['ann', '9']])
+        with self.assertRaises(imports.ImportFailed):
+            self.run_import(ImportJob.PATIENTS, path)
+        self.assertEqual(ImportJob.objects.get().state, ImportJob.FAILED)
+
+    def test_a_failed_run_resumes_after_its_last_committed_batch(self):
+        rows = [[f'user{number}', 'Name', 'Last', '', 'Road', '9876543210', 'Cough', '', '', '']
+                for number in range(5)]
+        path = self.write_csv('patients.csv', [self.header, *rows])
+        original = imports.PatientImporter.create
+        calls = []
+
+        def fail_on_second_batch(importer, batch):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return original(importer, batch)
+
+        with mock.patch.object(imports.PatientImporter, 'create', fail_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.run_import(ImportJob.PATIENTS, path, batch_size=2)
+        job = ImportJob.objects.get()
+        self.assertEqual((job.state, job.rows_done, job.imported), (ImportJob.FAILED, 2, 2))
+
+        resumed = self.run_import(ImportJob.PATIENTS, path, batch_size=2)
+        self.assertEqual(resumed.id, job.id)
+        self.assertEqual((resumed.state, resumed.imported, resumed.rejected), (ImportJob.DONE, 5, 0))
+        self.assertEqual(Patient.objects.count(), 5)
+
+
+class DoctorImportTests(ImportTestCase):
+    def test_mobile_numbers_are_validated(self):
+        path = self.write_csv('doctors.csv', [
+            ['username', 'first_name', 'last_name', 'address', 'mobile', 'department', 'is_approved'],
+            ['drgood', 'Good', 'Doc', 'Clinic', '9876543210', 'Cardiologist', 'true'],
+            ['drbad', 'Bad', 'Doc', 'Clinic', '12', 'Cardiologist', 'true'],
+        ])
+        job = self.run_import(ImportJob.DOCTORS, path)
+        self.assertEqual((job.imported, job.rejected), (1, 1))
+        self.assertTrue(Doctor.objects.get(user__username='drgood').is_approved)
+
+
+class AppointmentImportTests(ImportTestCase):
+    header = ['patient', 'doctor', 'description', 'appointment_date', 'appointment_time', 'created_date', 'status']
+
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_doctor('house')
+        self.patient = make_patient('ann', doctor=self.doctor)
+
+    def test_slot_clashes_are_rejected(self):
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, appointmentDate=date(2030, 1, 7),
+                                   appointmentTime='10:00')
+        path = self.write_csv('appointments.csv', [
+            self.header,
+            ['ann', 'house', 'Taken in the database', '2030-01-07', '10:00', '', 'true'],
+            ['ann', 'house', 'First in the file', '2030-01-07', '11:00', '2029-12-01', 'true'],
+            ['ann', 'house', 'Taken earlier in the file', '2030-01-07', '11:00', '', 'true'],
+        ])
+        job = self.run_import(ImportJob.APPOINTMENTS, path)
+        self.assertEqual((job.imported, job.rejected), (1, 2))
+        imported = Appointment.objects.get(description='First in the file')
+        self.assertEqual(imported.createdDate, date(2029, 12, 1))
+
+    def test_a_rejected_row_does_not_take_its_slot(self):
+        path = self.write_csv('appointments.csv', [
+            self.header,
+            ['nobody', 'house', 'Unknown patient', '2030-01-07', '10:00', '', 'true'],
+            ['ann', 'house', 'Valid booking', '2030-01-07', '10:00', '', 'true'],
+        ])
+        job = self.run_import(ImportJob.APPOINTMENTS, path)
+        self.assertEqual((job.imported, job.rejected), (1, 1))
+        self.assertTrue(Appointment.objects.filter(description='Valid booking').exists())
+        self.assertEqual([row['row'] for row in self.error_rows(job)], ['1'])
+
+
+class AdminImportViewTests(ImportTestCase):
+    def test_upload_is_staged_and_processed_by_the_queue(self):
+        client = self.login(make_admin())
+        upload = SimpleUploadedFile('doctors.csv', b'username,address,mobile\ndrq,Clinic,9876543210\n',
+                                    content_type='text/csv')
+        response = client.post('/admin-import/', {'kind': ImportJob.DOCTORS, 'file': upload})
+        self.assertEqual(response.status_code, 302)
+        job = imports.claim_pending()
+        self.assertEqual((job.kind, job.original_name), (ImportJob.DOCTORS, 'doctors.csv'))
+        self.assertIsNone(imports.claim_pending())
+        imports.run(job)
+        self.assertTrue(Doctor.objects.filter(user__username='drq').exists())
+        self.assertFalse(os.path.exists(job.source))
@@ -0,0 +1,82 @@
+from datetime import date
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TransactionTestCase
+
+from hospital.management.commands.benchmark_indexes import hot_queries
+
+from .base import HospitalTestCase, make_appointment, make_doctor, make_patient
+
+# The index each dashboard query shape should be served from
+EXPECTED_INDEXES = {
+    'doctor_dashboard pending': 'appt_doctor_created_idx',
+    'doctor_dashboard accepted': 'appt_doctor_created_idx',
+    'patient_dashboard': 'appt_patient_created_idx',
+    'admin_dashboard cancelled': 'appt_pending_date_idx',
+    'admin_appointments page': 'appt_created_id_idx',
+    'pending doctor approvals': 'doctor_pending_idx',
+    'pending admin approvals': 'adminapproval_pending_idx',
+    'pending patients': 'patient_pending_idx',
+    'approved doctor choices': 'doctor_bookable_idx',
+    'rollup day rebuild': 'appt_date_idx',
+}
+
+
+def index_names():
+    with connection.cursor() as cursor:
+        return {
+            name for table in ('hospital_appointment', 'hospital_doctor', 'hospital_patient', 'hospital_adminapproval')
+            for name in connection.introspection.get_constraints(cursor, table)
+        }
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The expected plans are SQLite plans')
+class QueryPlanTests(HospitalTestCase):
+    def test_dashboard_queries_use_their_indexes(self):
+        doctor = make_doctor()
+        patient = make_patient(doctor=doctor)
+        make_appointment(patient, doctor)
+        for label, queryset, _ in hot_queries(doctor, patient, date(2030, 1, 1)):
+            with self.subTest(label):
+                self.assertIn(EXPECTED_INDEXES[label], queryset.explain())
+
+    def test_dashboard_lists_need_no_sort(self):
+        doctor = make_doctor()
+        patient = make_patient(doctor=doctor)
+        for label, queryset, _ in hot_queries(doctor, patient, date(2030, 1, 1)):
+            if label.startswith(('doctor_dashboard', 'patient_dashboard', 'admin_appointments')):
+                with self.subTest(label):
+                    self.assertNotIn('TEMP B-TREE', queryset.explain())
+
+
+# The command changes the schema, which SQLite only allows outside a transaction
+class BenchmarkIndexesCommandTests(TransactionTestCase):
+    def test_compares_and_keeps_the_indexes(self):
+        doctor = make_doctor()
+        make_appointment(make_patient(doctor=doctor), doctor)
+        before = index_names()
+        self.assertTrue(set(EXPECTED_INDEXES.values()) <= before)
+        out = StringIO()
+        call_command('benchmark_indexes', repeat=2, no_plans=True, stdout=out)
+        output = out.getvalue()
+        self.assertIn('without indexes', output)
+        for label in EXPECTED_INDEXES:
+            self.assertIn(label, output)
+        # The indexes were only dropped for the baseline
+        self.assertEqual(index_names(), before)
+
+    def test_rollup_days_have_no_other_index(self):
+        doctor = make_doctor()
+        make_appointment(make_patient(doctor=doctor), doctor)
+        out = StringIO()
+        call_command('benchmark_indexes', repeat=1, stdout=out)
+        without = out.getvalue().split('== without indexes ==')[1]
+        plan = without.split('rollup day rebuild')[1].split('\n')[1]
+        self.assertIn('SCAN hospital_appointment', plan)
+
+    def test_needs_seeded_data(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_indexes', stdout=StringIO())
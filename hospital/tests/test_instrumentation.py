@@ -0,0 +1,120 @@
+import threading
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.template import loader
+from django.template.backends.django import Template as BackendTemplate
+from django.test import AsyncClient, RequestFactory, TransactionTestCase, override_settings
+
+from django.urls import reverse
+
+from hospital import asyncdb, instrumentation
+from hospital.models import Doctor, Patient
+
+from .base import HospitalTestCase, make_admin
+
+
+def query_counts():
+    """Queries and duplicates recorded per view, from the Prometheus output"""
+    counts = {}
+    for line in instrumentation.registry.prometheus().splitlines():
+        for name in ('hospital_db_queries_total', 'hospital_db_duplicate_queries_total'):
+            if line.startswith(name + '{'):
+                view = line[line.index('"') + 1:line.rindex('"')]
+                counts.setdefault(view, {})[name] = int(line.rsplit(' ', 1)[1])
+    return counts
+
+
+class InstrumentationTestCase:
+    def setUp(self):
+        super().setUp()
+        enabled = self.settings(HOSPITAL_INSTRUMENTATION=True)
+        enabled.enable()
+        self.addCleanup(enabled.disable)
+        instrumentation.registry.reset()
+        self.addCleanup(instrumentation.registry.reset)
+
+    def assertRecorded(self, queries, duplicates):
+        self.assertEqual(query_counts()['<unresolved>'], {
+            'hospital_db_queries_total': queries,
+            'hospital_db_duplicate_queries_total': duplicates,
+        })
+
+
+class SyncInstrumentationTests(InstrumentationTestCase, HospitalTestCase):
+    def test_counts_the_queries_of_a_request(self):
+        def view(request):
+            Doctor.objects.count()
+            Doctor.objects.count()
+            Patient.objects.count()
+            return HttpResponse()
+
+        middleware = instrumentation.InstrumentationMiddleware(view)
+        self.assertFalse(iscoroutinefunction(middleware))
+        middleware(RequestFactory().get('/'))
+        self.assertRecorded(queries=3, duplicates=1)
+
+    def test_queries_outside_a_request_are_not_counted(self):
+        instrumentation.InstrumentationMiddleware(lambda request: HttpResponse())
+        Doctor.objects.count()
+        self.assertEqual(query_counts(), {})
+
+    def test_times_template_rendering(self):
+        def view(request):
+            return HttpResponse(loader.get_template('hospital/aboutus.html').render({}, request))
+
+        instrumentation.InstrumentationMiddleware(view)(RequestFactory().get('/'))
+        self.assertRegex(instrumentation.registry.prometheus(),
+                         r'hospital_template_seconds_total\{view="<unresolved>"\} 0\.\d*[1-9]')
+
+    @override_settings(HOSPITAL_SLOW_REQUEST_MS=0)
+    def test_slow_log_leaves_out_the_query_string(self):
+        middleware = instrumentation.InstrumentationMiddleware(lambda request: HttpResponse())
+        with self.assertLogs('hospital.instrumentation', 'WARNING') as logs:
+            middleware(RequestFactory().get('/search/', {'q': 'Rebecca Adler'}))
+        self.assertEqual(instrumentation.registry.slow_log()[0]['path'], '/search/')
+        self.assertNotIn('Rebecca', logs.output[0])
+
+    def test_leaves_django_templates_unpatched(self):
+        render = BackendTemplate.render
+        instrumentation.InstrumentationMiddleware(lambda request: HttpResponse())
+        self.assertIs(BackendTemplate.render, render)
+
+    @override_settings(HOSPITAL_INSTRUMENTATION=False)
+    def test_off_unless_enabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            instrumentation.InstrumentationMiddleware(lambda request: HttpResponse())
+
+
+# No transaction around these tests, so asyncdb.gather really runs its calls on executor threads
+class AsyncInstrumentationTests(InstrumentationTestCase, TransactionTestCase):
+    def test_counts_queries_on_gather_threads(self):
+        threads = set()
+
+        def count(model):
+            def call():
+                threads.add(threading.get_ident())
+                return model.objects.count()
+            return call
+
+        async def view(request):
+            await asyncdb.gather(count(Doctor), count(Patient))
+            return HttpResponse()
+
+        middleware = instrumentation.InstrumentationMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertRecorded(queries=2, duplicates=0)
+
+    def test_async_dashboard_through_the_asgi_handler(self):
+        client = AsyncClient()
+        client.force_login(make_admin())
+
+        async def fetch():
+            return await client.get(reverse('admin-dashboard'))
+
+        response = async_to_sync(fetch)()
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(query_counts()['admin-dashboard']['hospital_db_queries_total'], 0)
@@ -0,0 +1,94 @@
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from hospital import hashers
+from hospital.roles import SESSION_KEY
+
+from .base import PASSWORD, HospitalTestCase, make_admin, make_doctor, make_patient
+
+
+class LoginTests(HospitalTestCase):
+    def post(self, url_name, username, password=PASSWORD, **extra):
+        return self.client.post(reverse(url_name), {'username': username, 'password': password, **extra})
+
+    def test_each_role_lands_on_its_dashboard(self):
+        make_admin()
+        make_doctor()
+        make_patient()
+        for username, dashboard in (('admin', 'admin-dashboard'), ('doctor', 'doctor-dashboard'),
+                                    ('patient', 'patient-dashboard')):
+            with self.subTest(username=username):
+                self.client.logout()
+                self.assertRedirects(self.post('login', username), reverse(dashboard), fetch_redirect_response=False)
+                self.assertIn(SESSION_KEY, self.client.session)
+
+    def test_wrong_password(self):
+        make_patient()
+        response = self.post('login', 'patient', password='wrong')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_role_pages_refuse_other_roles(self):
+        make_doctor()
+        self.assertEqual(self.post('patientlogin', 'doctor').status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertRedirects(self.post('doctorlogin', 'doctor'), reverse('doctor-dashboard'),
+                             fetch_redirect_response=False)
+
+    def test_safe_next_only(self):
+        make_patient()
+        self.assertRedirects(self.post('login', 'patient', next='/aboutus'), '/aboutus', fetch_redirect_response=False)
+        self.client.logout()
+        self.assertRedirects(self.post('login', 'patient', next='https://evil.example/'),
+                             reverse('patient-dashboard'), fetch_redirect_response=False)
+
+    def test_logged_in_users_skip_the_page(self):
+        self.login(make_doctor().user)
+        self.assertRedirects(self.client.get(reverse('login')), reverse('doctor-dashboard'),
+                             fetch_redirect_response=False)
+
+    def test_pages_render(self):
+        for name in ('login', 'patientlogin', 'doctorlogin', 'adminlogin'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+    def test_busy_pool_answers_503(self):
+        make_patient()
+        with mock.patch.object(hashers, '_reserve', side_effect=hashers.LoginBusy):
+            response = self.post('login', 'patient')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+
+class BoundedAuthenticateTests(SimpleTestCase):
+    def authenticate(self, in_transaction):
+        def check(request, **credentials):
+            return threading.current_thread().name, credentials
+        with mock.patch.object(hashers, 'authenticate', side_effect=check), \
+                mock.patch.object(hashers.asyncdb, 'in_transaction', return_value=in_transaction):
+            return async_to_sync(hashers.aauthenticate_bounded)(None, username='someone', password='secret')
+
+    def test_hashes_on_the_pool(self):
+        thread, credentials = self.authenticate(in_transaction=False)
+        self.assertTrue(thread.startswith('password-hash'))
+        self.assertEqual(credentials, {'username': 'someone', 'password': 'secret'})
+
+    def test_hashes_on_the_request_thread_inside_a_transaction(self):
+        thread, _ = self.authenticate(in_transaction=True)
+        self.assertFalse(thread.startswith('password-hash'))
+
+    def test_full_queue_is_refused(self):
+        _, slots = hashers._executor()
+        taken = 0
+        while slots.acquire(blocking=False):
+            taken += 1
+        try:
+            with self.assertRaises(hashers.LoginBusy):
+                self.authenticate(in_transaction=False)
+        finally:
+            for _ in range(taken):
+                slots.release()
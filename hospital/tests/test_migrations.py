@@ -0,0 +1,119 @@
+from datetime import date
+from unittest import skipUnless
+
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from hospital import search
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrates the test database back to migrate_from, then forward to migrate_to"""
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes())
+        self.apps = self.migrate([('hospital', self.migrate_from)])
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return MigrationExecutor(connection).loader.project_state(targets).apps
+
+    def forward(self):
+        self.apps = self.migrate([('hospital', self.migrate_to)])
+
+
+class BackfillForeignKeysTests(MigrationTestCase):
+    migrate_from = '0008_appointment_patient_doctor_fk'
+    migrate_to = '0009_backfill_appointment_fks'
+
+    def test_legacy_user_ids_become_foreign_keys(self):
+        User = self.apps.get_model('auth', 'User')
+        Doctor = self.apps.get_model('hospital', 'Doctor')
+        Patient = self.apps.get_model('hospital', 'Patient')
+        Appointment = self.apps.get_model('hospital', 'Appointment')
+        Discharge = self.apps.get_model('hospital', 'PatientDischargeDetails')
+
+        doctor_user = User.objects.create(username='doctor')
+        patient_user = User.objects.create(username='patient')
+        doctor = Doctor.objects.create(user=doctor_user, mobile='1', address='Ward')
+        patient = Patient.objects.create(user=patient_user, mobile='2', address='Street', symptoms='Fever')
+        # The legacy columns hold user ids, which differ from the profile ids
+        User.objects.create(username='spacer')
+        linked = Appointment.objects.create(patientId=patient_user.id, doctorId=doctor_user.id,
+                                            patientName='Old name', doctorName='Old name', description='Linked')
+        orphan = Appointment.objects.create(patientId=999, doctorId=None, description='Orphan')
+        discharge = Discharge.objects.create(
+            patientId=patient_user.id, patientName='P', assignedDoctorName='D', address='A', admitDate=date(2030, 1, 1),
+            releaseDate=date(2030, 1, 2), daySpent=1, roomCharge=1, medicineCost=1, doctorFee=1, OtherCharge=1, total=4)
+
+        self.forward()
+        Appointment = self.apps.get_model('hospital', 'Appointment')
+        Discharge = self.apps.get_model('hospital', 'PatientDischargeDetails')
+        linked = Appointment.objects.get(pk=linked.pk)
+        self.assertEqual((linked.patient_id, linked.doctor_id), (patient.pk, doctor.pk))
+        orphan = Appointment.objects.get(pk=orphan.pk)
+        self.assertEqual((orphan.patient_id, orphan.doctor_id), (None, None))
+        self.assertEqual(Discharge.objects.get(pk=discharge.pk).patient_id, patient.pk)
+
+
+def user_indexes():
+    with connection.cursor() as cursor:
+        return {name for name in connection.introspection.get_constraints(cursor, 'auth_user')
+                if name.startswith('hospital_')}
+
+
+NAME_INDEXES = {'hospital_user_first_name_ci', 'hospital_user_last_name_ci', 'hospital_user_username_ci'}
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'The name indexes exist on SQLite and PostgreSQL')
+class UserNameIndexesTests(MigrationTestCase):
+    migrate_from = '0017_search_entries'
+    migrate_to = '0018_user_name_indexes'
+
+    def test_reversible_on_the_auth_table(self):
+        self.assertEqual(user_indexes(), set())
+        self.forward()
+        self.assertEqual(user_indexes(), NAME_INDEXES)
+
+    def test_put_back_after_a_migrate_that_lost_them(self):
+        self.forward()
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX hospital_user_username_ci')
+        emit_post_migrate_signal(0, False, connection.alias)
+        self.assertEqual(user_indexes(), NAME_INDEXES)
+
+    def test_not_created_while_the_migration_is_unapplied(self):
+        emit_post_migrate_signal(0, False, connection.alias)
+        self.assertEqual(user_indexes(), set())
+
+
+class BackfillSearchEntriesTests(MigrationTestCase):
+    migrate_from = '0018_user_name_indexes'
+    migrate_to = '0019_backfill_search_entries'
+
+    def test_existing_rows_are_indexed(self):
+        User = self.apps.get_model('auth', 'User')
+        Doctor = self.apps.get_model('hospital', 'Doctor')
+        Patient = self.apps.get_model('hospital', 'Patient')
+        Appointment = self.apps.get_model('hospital', 'Appointment')
+        doctor = Doctor.objects.create(user=User.objects.create(username='house', first_name='Gregory'),
+                                       mobile='1', address='Ward', department='Neurologist')
+        patient = Patient.objects.create(user=User.objects.create(username='rebecca', first_name='Rebecca'),
+                                         mobile='2', address='Street', symptoms='Fever')
+        appointment = Appointment.objects.create(patient=patient, doctor=doctor, description='Biopsy')
+        # Rows written before the index existed have no entries yet
+        self.apps.get_model('hospital', 'SearchEntry').objects.all().delete()
+
+        self.forward()
+        self.assertEqual([(kind, pk) for kind, pk, _ in search.search('neuro')], [(search.DOCTOR, doctor.pk)])
+        self.assertEqual([(kind, pk) for kind, pk, _ in search.search('biop')],
+                         [(search.APPOINTMENT, appointment.pk)])
+        entries = self.apps.get_model('hospital', 'SearchEntry').objects
+        self.assertEqual(entries.get(kind=search.PATIENT).title, 'Rebecca')
+        self.assertEqual(entries.get(kind=search.APPOINTMENT).title, 'Rebecca with Dr. Gregory')
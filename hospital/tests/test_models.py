@@ -0,0 +1,23 @@
+from hospital.models import Appointment
+
+from .base import HospitalTestCase, make_appointment, make_doctor, make_patient
+
+
+class AppointmentForeignKeyTests(HospitalTestCase):
+    def test_names_come_from_the_linked_profiles(self):
+        appointment = make_appointment(make_patient(first_name='Anna'), make_doctor(first_name='Bert'))
+        self.assertEqual((appointment.patient_name, appointment.doctor_name), ('Anna Tester', 'Bert Tester'))
+        appointment.patient.user.first_name = 'Anne'
+        appointment.patient.user.save()
+        with self.assertNumQueries(1):
+            fresh = Appointment.objects.select_related('patient__user', 'doctor__user').get(pk=appointment.pk)
+            self.assertEqual(fresh.patient_name, 'Anne Tester')
+
+    def test_deleting_a_profile_keeps_its_appointments(self):
+        doctor = make_doctor()
+        appointment = make_appointment(make_patient(), doctor)
+        doctor.delete()
+        appointment.refresh_from_db()
+        self.assertIsNone(appointment.doctor_id)
+        self.assertIsNone(appointment.doctor_name)
+        self.assertIsNotNone(appointment.patient_name)
@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from urllib.parse import parse_qs
+
+from django.test import RequestFactory
+
+from hospital.models import Appointment, Doctor
+from hospital.pagination import encode_cursor, paginate
+
+from .base import HospitalTestCase, make_admin, make_doctor, make_patient
+
+
+def cursor_of(query, name):
+    return parse_qs(query)[name][0]
+
+
+class KeysetPaginationTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.doctors = [make_doctor(f'doctor{number}') for number in range(5)]
+        self.factory = RequestFactory()
+
+    def page(self, queryset=None, keys=('id',), **params):
+        queryset = Doctor.objects.all() if queryset is None else queryset
+        return paginate(self.factory.get('/', {'per_page': 2, **params}), queryset, list(keys))
+
+    def ids(self, page):
+        return [doctor.id for doctor in page]
+
+    def test_walks_forward_and_back_newest_first(self):
+        newest_first = sorted((doctor.id for doctor in self.doctors), reverse=True)
+        first = self.page()
+        self.assertEqual(self.ids(first), newest_first[:2])
+        self.assertIsNone(first.previous_query)
+
+        second = self.page(after=cursor_of(first.next_query, 'after'))
+        self.assertEqual(self.ids(second), newest_first[2:4])
+        third = self.page(after=cursor_of(second.next_query, 'after'))
+        self.assertEqual(self.ids(third), newest_first[4:])
+        self.assertIsNone(third.next_query)
+
+        back = self.page(before=cursor_of(third.previous_query, 'before'))
+        self.assertEqual(self.ids(back), newest_first[2:4])
+
+    def test_compound_keys_break_ties_on_id(self):
+        patient = make_patient(doctor=self.doctors[0])
+        for _ in range(3):
+            Appointment.objects.create(patient=patient, doctor=self.doctors[0], description='Same day')
+        Appointment.objects.update(createdDate=date(2030, 1, 1))
+        queryset = Appointment.objects.all()
+        first = self.page(queryset, ('createdDate', 'id'))
+        second = self.page(queryset, ('createdDate', 'id'), after=cursor_of(first.next_query, 'after'))
+        seen = [appointment.id for appointment in [*first, *second]]
+        self.assertEqual(seen, sorted(Appointment.objects.values_list('id', flat=True), reverse=True))
+
+    def test_tampered_cursors_show_the_first_page(self):
+        first = self.ids(self.page())
+        for values in (['abc'], [{'a': 1}], [None], [True], [[1]], [1, 2], 'not a list'):
+            with self.subTest(values=values):
+                self.assertEqual(self.ids(self.page(after=encode_cursor(values))), first)
+                self.assertEqual(self.ids(self.page(before=encode_cursor(values))), first)
+        self.assertEqual(self.ids(self.page(after='%%%not-base64')), first)
+
+    def test_tampered_date_cursors_show_the_first_page(self):
+        patient = make_patient(doctor=self.doctors[0])
+        Appointment.objects.create(patient=patient, doctor=self.doctors[0], description='One')
+        queryset = Appointment.objects.all()
+        first = [appointment.id for appointment in self.page(queryset, ('createdDate', 'id'))]
+        for values in (['notadate', 5], [None, None], [20300101, 5], ['2030-01-01', 'x']):
+            with self.subTest(values=values):
+                page = self.page(queryset, ('createdDate', 'id'), before=encode_cursor(values))
+                self.assertEqual([appointment.id for appointment in page], first)
+
+    def test_per_page_is_clamped(self):
+        self.assertEqual(len(self.page(per_page=0)), 1)
+        # Not a number: the default page size, which fits all five
+        self.assertEqual(len(self.page(per_page='many')), 5)
+
+
+class ListingCursorTests(HospitalTestCase):
+    def test_listings_answer_bad_cursors_with_the_first_page(self):
+        doctor = make_doctor()
+        Appointment.objects.create(patient=make_patient(doctor=doctor), doctor=doctor, description='Visit',
+                                   appointmentDate=date.today() - timedelta(days=1))
+        client = self.login(make_admin())
+        cases = [
+            ('/admin-doctors/', 'after', ['abc']),
+            ('/admin-doctors/', 'after', [{'a': 1}]),
+            ('/admin-patients/', 'before', ['x']),
+            ('/admin-appointments/', 'after', ['notadate', 5]),
+            ('/admin-appointments/', 'before', [None, None]),
+        ]
+        for url, name, values in cases:
+            with self.subTest(url=url, values=values):
+                response = client.get(url, {name: encode_cursor(values)})
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,132 @@
+from django.contrib.auth.models import Group
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from hospital.models import AdminApproval
+from hospital.roles import ANONYMOUS_ROLES, _cache_key, get_roles, get_user_roles, resolve_roles
+
+from .base import PASSWORD, HospitalTestCase, make_admin, make_doctor, make_patient, make_user
+
+
+class ResolveRolesTests(HospitalTestCase):
+    def test_every_role_in_one_query(self):
+        doctor = make_doctor(approved=False)
+        with self.assertNumQueries(1):
+            roles = resolve_roles(doctor.user_id)
+        self.assertTrue(roles.is_doctor)
+        self.assertFalse(roles.is_approved_doctor)
+        self.assertFalse(roles.is_admin)
+
+    def test_admin_kinds(self):
+        superuser = make_user('root', is_superuser=True)
+        grouped = make_user('grouped')
+        grouped.groups.add(Group.objects.create(name='Admin'))
+        pending = make_user('pending')
+        AdminApproval.objects.create(user=pending, is_approved=False)
+        self.assertTrue(resolve_roles(superuser.pk).is_superuser)
+        self.assertTrue(resolve_roles(grouped.pk).is_group_admin)
+        self.assertTrue(resolve_roles(make_admin().pk).is_approved_admin)
+        roles = resolve_roles(pending.pk)
+        self.assertTrue(roles.is_pending_admin)
+        self.assertFalse(roles.is_admin)
+
+    def test_patients_and_unknown_users(self):
+        roles = resolve_roles(make_patient().user_id)
+        self.assertTrue(roles.is_patient and roles.is_approved_patient)
+        self.assertEqual(resolve_roles(999999), ANONYMOUS_ROLES)
+
+
+class RoleCacheTests(HospitalTestCase):
+    def test_cached_until_a_profile_changes(self):
+        doctor = make_doctor(approved=False)
+        self.assertFalse(get_user_roles(doctor.user).is_approved_doctor)
+        with self.assertNumQueries(0):
+            get_user_roles(doctor.user)
+        doctor.is_approved = True
+        doctor.save()
+        self.assertTrue(get_user_roles(doctor.user).is_approved_doctor)
+
+    def test_group_membership_clears_the_cache(self):
+        user = make_user('someone')
+        group = Group.objects.create(name='Admin')
+        self.assertFalse(get_user_roles(user).is_admin)
+        user.groups.add(group)
+        self.assertTrue(get_user_roles(user).is_admin)
+        group.user_set.clear()
+        self.assertFalse(get_user_roles(user).is_admin)
+
+    def test_resolved_once_per_request(self):
+        request = RequestFactory().get('/')
+        request.user = make_admin()
+        self.assertTrue(get_roles(request).is_admin)
+        with self.assertNumQueries(0):
+            get_roles(request)
+
+
+class AdminAccessTests(HospitalTestCase):
+    def test_admin_views_turn_away_other_roles(self):
+        url = reverse('admin-doctors')
+        self.login(make_doctor().user)
+        self.assertRedirects(self.client.get(url), reverse('home'), fetch_redirect_response=False)
+        self.login(make_admin())
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_approval_takes_effect_in_a_live_session(self):
+        user = make_user('newadmin')
+        approval = AdminApproval.objects.create(user=user, is_approved=False)
+        self.login(user)
+        url = reverse('admin-doctors')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        approval.is_approved = True
+        approval.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SessionRolesTests(HospitalTestCase):
+    def request_for(self, user, session=None):
+        request = RequestFactory().get('/')
+        request.user = user
+        request.session = session if session is not None else SessionStore()
+        return request
+
+    def test_login_resolves_roles_in_one_query(self):
+        make_doctor()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('login'), {'username': 'doctor', 'password': PASSWORD})
+        role_queries = [query for query in queries.captured_queries if 'hospital_doctor' in query['sql']]
+        self.assertEqual(len(role_queries), 1)
+
+    def test_later_requests_read_the_session_copy(self):
+        doctor = make_doctor()
+        session = SessionStore()
+        get_roles(self.request_for(doctor.user, session))
+        cache.delete(_cache_key(doctor.user_id))
+        with self.assertNumQueries(0):
+            self.assertTrue(get_roles(self.request_for(doctor.user, session)).is_approved_doctor)
+
+    def test_invalidation_reaches_the_session_copy(self):
+        doctor = make_doctor(approved=False)
+        session = SessionStore()
+        self.assertFalse(get_roles(self.request_for(doctor.user, session)).is_approved_doctor)
+        doctor.is_approved = True
+        doctor.save()
+        self.assertTrue(get_roles(self.request_for(doctor.user, session)).is_approved_doctor)
+
+    def test_session_copy_belongs_to_one_user(self):
+        session = SessionStore()
+        get_roles(self.request_for(make_doctor().user, session))
+        self.assertTrue(get_roles(self.request_for(make_patient().user, session)).is_patient)
+
+    def test_role_links_lead_to_the_users_own_dashboard(self):
+        self.login(make_patient().user)
+        for name in ('admin-click', 'doctor-click', 'patient-click'):
+            with self.subTest(name=name):
+                self.assertRedirects(self.client.get(reverse(name)), reverse('patient-dashboard'),
+                                     fetch_redirect_response=False)
+        self.client.logout()
+        self.assertRedirects(self.client.get(reverse('doctor-click')), reverse('doctorlogin'),
+                             fetch_redirect_response=False)
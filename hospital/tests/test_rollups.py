@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from hospital import rollups
+from hospital.models import Appointment, DischargeDayRollup, DoctorDayRollup
+
+from .base import HospitalTestCase, make_admin, make_appointment, make_discharge, make_doctor, make_patient
+
+DAY = date(2030, 1, 7)
+NEXT_DAY = date(2030, 1, 8)
+
+
+def rollup_rows():
+    return (
+        sorted(DoctorDayRollup.objects.values_list('day', 'doctor_id', 'appointments', 'approved', 'accepted',
+                                                   'acceptance_seconds', 'latency_samples')),
+        sorted(DischargeDayRollup.objects.values_list('day', 'doctor_id', 'discharges', 'revenue')),
+    )
+
+
+class RollupTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        # Count rows saved a moment ago too; there are no uncommitted writers here
+        patcher = mock.patch.object(rollups, 'SETTLE', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.doctor = make_doctor()
+        self.other = make_doctor('other', department='Dermatologists')
+        self.patient = make_patient(doctor=self.doctor)
+
+    def refresh(self):
+        for name in rollups.ROLLUPS:
+            rollups.refresh(name)
+
+    def assertMatchesRebuild(self):
+        incremental = rollup_rows()
+        for name in rollups.ROLLUPS:
+            rollups.refresh(name, rebuild=True)
+        self.assertEqual(incremental, rollup_rows())
+
+    def test_counts_a_day(self):
+        accepted = make_appointment(self.patient, self.doctor, DAY, status=True, is_accepted_by_doctor=True)
+        Appointment.objects.filter(pk=accepted.pk).update(
+            accepted_date=timezone.make_aware(datetime.combine(accepted.createdDate, datetime.min.time()))
+            + timedelta(hours=2))
+        make_appointment(self.patient, self.doctor, DAY)
+        make_discharge(self.patient, DAY, NEXT_DAY, total=500)
+        self.refresh()
+        row = DoctorDayRollup.objects.get(day=DAY, doctor=self.doctor)
+        self.assertEqual((row.appointments, row.approved, row.accepted, row.latency_samples), (2, 1, 1, 1))
+        self.assertEqual(row.acceptance_seconds, 7200)
+        revenue = DischargeDayRollup.objects.get(day=NEXT_DAY)
+        self.assertEqual((revenue.doctor_id, revenue.discharges, revenue.revenue), (self.doctor.pk, 1, 500))
+
+    def test_incremental_refresh_follows_changes(self):
+        moved = make_appointment(self.patient, self.doctor, DAY)
+        deleted = make_appointment(self.patient, self.doctor, DAY)
+        make_discharge(self.patient, DAY, DAY, total=100)
+        self.refresh()
+
+        moved.appointmentDate = NEXT_DAY
+        moved.doctor = self.other
+        moved.save()
+        deleted.delete()
+        make_appointment(self.patient, self.other, DAY)
+        # Revenue follows the assigned doctor, so this moves the past discharge too
+        self.patient.assignedDoctor = self.other
+        self.patient.save()
+        self.refresh()
+        self.assertEqual(DischargeDayRollup.objects.get(day=DAY).doctor_id, self.other.pk)
+        self.assertFalse(DoctorDayRollup.objects.filter(doctor=self.doctor).exists())
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_days_last_row_clears_it(self):
+        appointment = make_appointment(self.patient, self.doctor, DAY)
+        self.refresh()
+        appointment.delete()
+        self.refresh()
+        self.assertFalse(DoctorDayRollup.objects.exists())
+
+    def test_unchanged_days_are_not_recounted(self):
+        make_appointment(self.patient, self.doctor, DAY)
+        self.refresh()
+        self.assertEqual(rollups.refresh(rollups.APPOINTMENTS), 0)
+        make_appointment(self.patient, self.doctor, NEXT_DAY)
+        self.assertEqual(rollups.refresh(rollups.APPOINTMENTS), 1)
+
+    def test_reports_read_the_rollups(self):
+        make_appointment(self.patient, self.doctor, DAY)
+        make_appointment(self.patient, self.other, DAY)
+        make_discharge(self.patient, DAY, DAY, total=300)
+        self.refresh()
+        departments = rollups.department_workload(DAY, NEXT_DAY)
+        self.assertEqual([(row['department'], row['appointments']) for row in departments],
+                         [('Cardiologist', 1), ('Dermatologists', 1)])
+        self.assertEqual([(row['day'], row['appointments']) for row in rollups.daily_appointments(DAY, NEXT_DAY)],
+                         [(DAY, 2)])
+        self.assertEqual(rollups.department_revenue(DAY, DAY)[0]['revenue'], 300)
+
+    def test_report_page_and_command(self):
+        make_appointment(self.patient, self.doctor, DAY)
+        out = StringIO()
+        call_command('refresh_rollups', stdout=out)
+        self.assertIn('Rollups refreshed.', out.getvalue())
+        self.assertIn(rollups.APPOINTMENTS, rollups.freshness())
+        self.login(make_admin())
+        response = self.client.get(reverse('admin-reports'), {'date_from': DAY, 'date_to': DAY})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['busiest_day'], 1)
@@ -0,0 +1,101 @@
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from hospital import routers
+from hospital.models import Doctor
+
+router = routers.PrimaryReplicaRouter()
+
+
+def with_replicas(*aliases):
+    return mock.patch.object(routers, 'replica_aliases', return_value=list(aliases))
+
+
+def reading_view(request):
+    """Answers with the alias the router picked for a read"""
+    return HttpResponse(router.db_for_read(Doctor))
+
+
+# SimpleTestCase: a TestCase transaction would keep every read on the primary
+class RouterTests(SimpleTestCase):
+    def test_reads_stay_on_the_primary_outside_requests(self):
+        with with_replicas('replica1'):
+            self.assertEqual(router.db_for_read(Doctor), 'default')
+
+    def test_writes_and_migrations_use_the_primary(self):
+        self.assertEqual(router.db_for_write(Doctor), 'default')
+        self.assertTrue(router.allow_migrate('default', 'hospital'))
+        self.assertFalse(router.allow_migrate('replica1', 'hospital'))
+
+    def test_sessions_are_read_from_the_primary(self):
+        token = routers._use_primary.set(False)
+        self.addCleanup(routers._use_primary.reset, token)
+        with with_replicas('replica1'):
+            self.assertEqual(router.db_for_read(Doctor), 'replica1')
+            self.assertEqual(router.db_for_read(Session), 'default')
+
+
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = with_replicas('replica1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = routers.ReplicaRoutingMiddleware(reading_view)
+
+    def test_removed_without_replicas(self):
+        with with_replicas():
+            with self.assertRaises(MiddlewareNotUsed):
+                routers.ReplicaRoutingMiddleware(reading_view)
+
+    def test_safe_requests_read_replicas(self):
+        response = self.middleware(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'replica1')
+        self.assertNotIn(routers.PRIMARY_COOKIE, response.cookies)
+
+    def test_writes_pin_the_browser_to_the_primary(self):
+        response = self.middleware(RequestFactory().post('/'))
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[routers.PRIMARY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.HOSPITAL_READ_YOUR_WRITES_SECONDS)
+        self.assertTrue(cookie['httponly'])
+
+        pinned = RequestFactory().get('/')
+        pinned.COOKIES[routers.PRIMARY_COOKIE] = cookie.value
+        self.assertEqual(self.middleware(pinned).content, b'default')
+        expired = RequestFactory().get('/')
+        expired.COOKIES[routers.PRIMARY_COOKIE] = str(time.time() - 1)
+        self.assertEqual(self.middleware(expired).content, b'replica1')
+
+    def test_use_primary_views(self):
+        middleware = routers.ReplicaRoutingMiddleware(routers.use_primary(reading_view))
+        response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'default')
+        self.assertIn(routers.PRIMARY_COOKIE, response.cookies)
+
+    def test_async_views(self):
+        async def view(request):
+            return reading_view(request)
+
+        middleware = routers.ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(async_to_sync(middleware)(RequestFactory().get('/')).content, b'replica1')
+        self.assertEqual(async_to_sync(middleware)(RequestFactory().post('/')).content, b'default')
+
+    def test_routing_ends_with_the_request(self):
+        self.middleware(RequestFactory().get('/'))
+        self.assertEqual(router.db_for_read(Doctor), 'default')
+
+
+class RefreshSqliteReplicasTests(SimpleTestCase):
+    def test_needs_replicas(self):
+        with self.assertRaisesMessage(CommandError, 'HOSPITAL_DB_REPLICAS'):
+            call_command('refresh_sqlite_replicas')
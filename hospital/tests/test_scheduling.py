@@ -0,0 +1,92 @@
+from datetime import date, time, timedelta
+
+from hospital.models import Appointment
+from hospital.scheduling import (
+    SlotUnavailable, booked_slots, is_slot_free, next_free_slots, reserve_slot, slot_times,
+)
+
+from .base import HospitalTestCase, make_doctor, make_patient
+
+FUTURE = date.today() + timedelta(days=30)
+
+
+class SlotEngineTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_doctor(work_start=time(9), work_end=time(11), slot_minutes=30)
+        self.patient = make_patient(doctor=self.doctor)
+
+    def book(self, day, at):
+        return reserve_slot(Appointment(patient=self.patient, description='Visit'), self.doctor, day, at)
+
+    def test_slot_grid_follows_the_working_hours(self):
+        self.assertEqual(slot_times(self.doctor), [time(9), time(9, 30), time(10), time(10, 30)])
+
+    def test_next_free_slots_skip_booked_ones(self):
+        self.book(FUTURE, time(9))
+        slots = next_free_slots(doctor=self.doctor, count=3, start=FUTURE)
+        self.assertEqual([(day, at) for day, at, _ in slots],
+                         [(FUTURE, time(9, 30)), (FUTURE, time(10)), (FUTURE, time(10, 30))])
+
+    def test_a_full_day_rolls_over_to_the_next(self):
+        for at in slot_times(self.doctor):
+            self.book(FUTURE, at)
+        day, at, _ = next_free_slots(doctor=self.doctor, count=1, start=FUTURE)[0]
+        self.assertEqual((day, at), (FUTURE + timedelta(days=1), time(9)))
+
+    def test_department_search_merges_doctors_by_time(self):
+        other = make_doctor('other', work_start=time(8), work_end=time(9), slot_minutes=60)
+        slots = next_free_slots(department='Cardiologist', count=2, start=FUTURE)
+        self.assertEqual([(at, doctor.id) for _, at, doctor in slots], [(time(8), other.id), (time(9), self.doctor.id)])
+
+    def test_double_booking_is_refused(self):
+        self.book(FUTURE, time(10))
+        with self.assertRaises(SlotUnavailable):
+            self.book(FUTURE, time(10))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_off_grid_and_past_slots_are_refused(self):
+        with self.assertRaises(SlotUnavailable):
+            self.book(FUTURE, time(9, 15))
+        with self.assertRaises(SlotUnavailable):
+            self.book(date.today() - timedelta(days=1), time(9))
+
+    def test_rebooking_the_same_appointment_keeps_its_own_slot(self):
+        appointment = self.book(FUTURE, time(9))
+        reserve_slot(appointment, self.doctor, FUTURE, time(9), status=True)
+        appointment.refresh_from_db()
+        self.assertTrue(appointment.status)
+
+    def test_booked_cache_follows_saves_and_deletes(self):
+        self.assertEqual(booked_slots([self.doctor.id], FUTURE)[self.doctor.id], frozenset())
+        appointment = self.book(FUTURE, time(9))
+        self.assertFalse(is_slot_free(self.doctor, FUTURE, time(9)))
+        appointment.appointmentTime = time(10)
+        appointment.save()
+        self.assertTrue(is_slot_free(self.doctor, FUTURE, time(9)))
+        self.assertFalse(is_slot_free(self.doctor, FUTURE, time(10)))
+        appointment.delete()
+        self.assertTrue(is_slot_free(self.doctor, FUTURE, time(10)))
+
+
+class FreeSlotsViewTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_doctor()
+        self.client = self.login(make_patient(doctor=self.doctor).user)
+
+    def test_lists_slots_for_a_doctor(self):
+        response = self.client.get('/free-slots/', {'doctor': self.doctor.id, 'count': 2})
+        self.assertEqual(response.status_code, 200)
+        slots = response.json()['slots']
+        self.assertEqual(len(slots), 2)
+        self.assertEqual({slot['doctor_id'] for slot in slots}, {self.doctor.id})
+
+    def test_bad_doctor_ids_are_client_errors(self):
+        self.assertEqual(self.client.get('/free-slots/', {'doctor': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/free-slots/', {'doctor': '1.5'}).status_code, 400)
+        self.assertEqual(self.client.get('/free-slots/', {'doctor': self.doctor.id + 100}).status_code, 404)
+
+    def test_unapproved_doctors_are_not_offered(self):
+        pending = make_doctor('pending', approved=False)
+        self.assertEqual(self.client.get('/free-slots/', {'doctor': pending.id}).status_code, 404)
@@ -0,0 +1,93 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from hospital import search
+from hospital.models import Doctor, Patient, SearchEntry
+
+from .base import HospitalTestCase, make_admin, make_appointment, make_doctor, make_patient
+
+
+class SearchTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_doctor('house', first_name='Gregory', last_name='House', department='Neurologist')
+        self.patient = make_patient('rebecca', first_name='Rebecca', last_name='Adler', doctor=self.doctor,
+                                    symptoms='Throat swelling')
+        self.appointment = make_appointment(self.patient, self.doctor, description='Follow-up on the biopsy')
+
+    def kinds(self, query, **options):
+        return [(kind, pk) for kind, pk, _ in search.search(query, **options)]
+
+    def test_finds_every_kind_by_prefix(self):
+        self.assertEqual(self.kinds('neuro'), [(search.DOCTOR, self.doctor.pk)])
+        self.assertEqual(self.kinds('swell'), [(search.PATIENT, self.patient.pk)])
+        self.assertEqual(self.kinds('biop'), [(search.APPOINTMENT, self.appointment.pk)])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.kinds('gregory neuro'), [(search.DOCTOR, self.doctor.pk)])
+        self.assertEqual(self.kinds('gregory swelling'), [])
+        self.assertEqual(search.search('  ?! '), [])
+
+    def test_profiles_outrank_their_appointments(self):
+        self.assertEqual(self.kinds('adler'), [(search.PATIENT, self.patient.pk),
+                                               (search.APPOINTMENT, self.appointment.pk)])
+        self.assertEqual(self.kinds('adler', kind=search.APPOINTMENT), [(search.APPOINTMENT, self.appointment.pk)])
+
+    def test_renaming_reaches_the_appointment_titles(self):
+        self.doctor.user.last_name = 'Wilson'
+        self.doctor.user.save()
+        self.assertEqual(self.kinds('house'), [(search.DOCTOR, self.doctor.pk)])  # still the username
+        self.assertEqual(set(self.kinds('wilson')), {(search.DOCTOR, self.doctor.pk),
+                                                     (search.APPOINTMENT, self.appointment.pk)})
+
+    def test_deletions_leave_the_index(self):
+        self.appointment.delete()
+        self.assertEqual(self.kinds('biop'), [])
+        appointment = make_appointment(self.patient, self.doctor, description='Scan')
+        self.doctor.delete()
+        self.assertFalse(SearchEntry.objects.filter(kind=search.DOCTOR).exists())
+        self.assertNotIn('Gregory', SearchEntry.objects.get(kind=search.APPOINTMENT, object_id=appointment.pk).title)
+
+    def test_like_fallback_finds_the_same_rows(self):
+        ranked = set(self.kinds('adler'))
+        with mock.patch.object(search, '_ranked', return_value=None):
+            self.assertEqual(set(self.kinds('adler')), ranked)
+            self.assertEqual(list(Patient.objects.filter(pk__in=search.matching(search.PATIENT, 'swell'))),
+                             [self.patient])
+
+    def test_matching_filters_querysets(self):
+        make_doctor('other', first_name='James')
+        self.assertEqual(list(Doctor.objects.filter(pk__in=search.matching(search.DOCTOR, 'greg'))), [self.doctor])
+        self.assertFalse(Doctor.objects.filter(pk__in=search.matching(search.DOCTOR, '')).exists())
+
+    def test_rebuild_restores_a_lost_index(self):
+        SearchEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertEqual(SearchEntry.objects.count(), 3)
+        self.assertEqual(self.kinds('neuro'), [(search.DOCTOR, self.doctor.pk)])
+
+
+class SearchViewTests(HospitalTestCase):
+    def test_admin_search_endpoint(self):
+        doctor = make_doctor('house', first_name='Gregory')
+        self.login(make_admin())
+        response = self.client.get(reverse('search'), {'q': 'greg'})
+        self.assertEqual(response.json()['results'], [{
+            'kind': search.DOCTOR, 'id': doctor.pk, 'title': 'Dr. Gregory Tester',
+            'url': reverse('admin:hospital_doctor_change', args=[doctor.pk]),
+        }])
+
+    def test_admin_changelist_uses_the_index(self):
+        make_doctor('house', first_name='Gregory')
+        make_doctor('other', first_name='James')
+        self.login(make_admin('root', is_superuser=True, is_staff=True))
+        response = self.client.get(reverse('admin:hospital_doctor_changelist'), {'q': 'greg'})
+        self.assertEqual([doctor.user.username for doctor in response.context['cl'].result_list], ['house'])
+
+    def test_search_needs_an_admin(self):
+        self.login(make_patient().user)
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'x'}).status_code, 302)
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count
+
+from hospital import stats
+from hospital.models import Appointment, Doctor, Patient, PatientDischargeDetails, SearchEntry
+
+from .base import HospitalTestCase
+
+
+class SeedHospitalTests(HospitalTestCase):
+    def seed(self, **options):
+        options = {'doctors': 5, 'patients': 40, 'appointments': 120, 'random_seed': 7, **options}
+        call_command('seed_hospital', stdout=StringIO(), **options)
+
+    def test_creates_the_requested_rows(self):
+        self.seed(discharges=10)
+        self.assertEqual(Doctor.objects.count(), 5)
+        self.assertEqual(Patient.objects.count(), 40)
+        self.assertEqual(Appointment.objects.count(), 120)
+        self.assertEqual(PatientDischargeDetails.objects.count(), 10)
+
+    def test_never_double_books_a_slot(self):
+        self.seed()
+        clashes = (Appointment.objects.filter(appointmentDate__isnull=False, appointmentTime__isnull=False)
+                   .values('doctor_id', 'appointmentDate', 'appointmentTime')
+                   .annotate(bookings=Count('id')).filter(bookings__gt=1))
+        self.assertFalse(clashes.exists())
+
+    def test_bulk_inserts_leave_derived_state_consistent(self):
+        self.seed()
+        self.assertEqual(stats.counter_snapshot(), stats.compute_counters())
+        self.assertEqual(SearchEntry.objects.count(),
+                         Doctor.objects.count() + Patient.objects.count() + Appointment.objects.count())
+
+    def test_seeding_twice_adds_new_users(self):
+        self.seed(appointments=0)
+        self.seed(appointments=0)
+        self.assertEqual(Doctor.objects.count(), 10)
+        self.assertEqual(Patient.objects.count(), 80)
+
+
+class BenchmarkViewsTests(HospitalTestCase):
+    def test_every_url_answers_for_every_role_and_nothing_is_kept(self):
+        self.assertEqual(Doctor.objects.count(), 0)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+            call_command('benchmark_views', iterations=1, output=output, stdout=StringIO())
+            with open(output) as handle:
+                results = json.load(handle)
+            # A run compared with itself has nothing to report
+            call_command('benchmark_views', iterations=1, baseline=output, tolerance=100, stdout=StringIO())
+
+        self.assertIn('admin-dashboard [admin]', results)
+        self.assertIn('api-detail [doctor]', results)
+        errors = {key: row['status'] for key, row in results.items() if row['status'] >= 500}
+        self.assertEqual(errors, {})
+        self.assertEqual(Doctor.objects.count(), 0)
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .base import HospitalTestCase, make_doctor, make_patient
+
+
+def session_queries(queries):
+    return [query for query in queries.captured_queries if 'django_session' in query['sql']]
+
+
+class AlertMessageTests(HospitalTestCase):
+    def test_alerts_travel_in_a_cookie(self):
+        self.login(make_doctor().user)
+        # The first role check stores the resolved roles in the session
+        self.client.get(reverse('doctor-dashboard'))
+        session_key = self.client.session.session_key
+        modified = Session.objects.get(session_key=session_key).session_data
+        response = self.client.get(reverse('admin-doctors'))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertIn('messages', response.cookies)
+        self.assertEqual(Session.objects.get(session_key=session_key).session_data, modified)
+
+        home = self.client.get(reverse('home'))
+        self.assertContains(home, 'alert("Access denied. Admin privileges required.")')
+        # Shown once: the cookie is cleared with the page that displayed it
+        self.assertEqual(home.cookies['messages'].value, '')
+        self.assertNotContains(self.client.get(reverse('home')), 'Access denied')
+
+    def test_pages_without_the_popup_leave_messages_pending(self):
+        self.login(make_doctor().user)
+        self.client.get(reverse('admin-doctors'))
+        self.client.get(reverse('aboutus'))
+        self.assertContains(self.client.get(reverse('home')), 'Access denied')
+
+
+class CachedSessionTests(HospitalTestCase):
+    def test_repeat_requests_do_not_query_the_session_table(self):
+        self.login(make_patient().user)
+        url = reverse('patient-dashboard')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(session_queries(queries), [])
+
+
+class ClearExpiredSessionsTests(HospitalTestCase):
+    def make_sessions(self, count, expire_date):
+        keys = []
+        for _ in range(count):
+            session = SessionStore()
+            session.create()
+            keys.append(session.session_key)
+        Session.objects.filter(session_key__in=keys).update(expire_date=expire_date)
+        return keys
+
+    def test_deletes_only_expired_sessions_in_batches(self):
+        self.make_sessions(5, timezone.now() - timedelta(days=1))
+        live = self.make_sessions(2, timezone.now() + timedelta(days=1))
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('clear_expired_sessions', batch_size=2, pause=0, stdout=out)
+        self.assertIn('Deleted 5 expired sessions.', out.getvalue())
+        self.assertEqual(sorted(Session.objects.values_list('session_key', flat=True)), sorted(live))
+        deletes = [query for query in session_queries(queries) if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+
+    def test_nothing_to_do_without_database_sessions(self):
+        self.make_sessions(1, timezone.now() - timedelta(days=1))
+        out = StringIO()
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'):
+            call_command('clear_expired_sessions', stdout=out)
+        self.assertIn('nothing to clear', out.getvalue())
+        self.assertEqual(Session.objects.count(), 1)
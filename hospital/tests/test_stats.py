@@ -0,0 +1,66 @@
+from datetime import date
+
+from asgiref.sync import async_to_sync
+
+from hospital import stats
+from hospital.models import AdminApproval, DashboardCounter
+
+from .base import HospitalTestCase, make_appointment, make_doctor, make_patient, make_user, slot
+
+
+class CounterSnapshotTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        stats.rebuild_snapshot()
+
+    def assertSnapshotMatches(self):
+        self.assertEqual(stats.counter_snapshot(), stats.compute_counters())
+
+    def test_follows_creates_updates_and_deletes(self):
+        doctor = make_doctor(approved=False)
+        patient = make_patient(doctor=doctor)
+        appointment = make_appointment(patient, doctor)
+        AdminApproval.objects.create(user=make_user('waiting'), is_approved=False)
+        self.assertSnapshotMatches()
+        self.assertEqual(stats.counter_snapshot()['pending_doctor_approvals'], 1)
+
+        doctor.is_approved = True
+        doctor.save()
+        appointment.status = True
+        appointment.save()
+        self.assertSnapshotMatches()
+        self.assertEqual(stats.counter_snapshot()['approved_appointments'], 1)
+
+        appointment.delete()
+        patient.delete()
+        doctor.delete()
+        self.assertSnapshotMatches()
+
+    def test_unchanged_saves_leave_counters_alone(self):
+        appointment = make_appointment(make_patient(), make_doctor())
+        before = stats.counter_snapshot()
+        appointment.description = 'Changed'
+        appointment.save()
+        self.assertEqual(stats.counter_snapshot(), before)
+
+    def test_batched_adjustments_are_one_update_per_counter(self):
+        with self.assertNumQueries(2):
+            with stats.batched():
+                stats.adjust(total_patients=1, total_doctors=1)
+                stats.adjust(total_patients=2)
+        snapshot = stats.counter_snapshot()
+        self.assertEqual((snapshot['total_patients'], snapshot['total_doctors']), (3, 1))
+
+    def test_missing_counters_are_rebuilt(self):
+        make_doctor()
+        DashboardCounter.objects.filter(name='total_doctors').delete()
+        self.assertEqual(stats.counter_snapshot()['total_doctors'], 1)
+
+    def test_dashboard_stats_read_the_snapshot(self):
+        doctor, patient = make_doctor(), make_patient()
+        make_appointment(patient, doctor, day=date(2020, 1, 1))
+        make_appointment(patient, doctor, *slot())
+        with self.assertNumQueries(2):
+            result = stats.dashboard_stats(today=date(2025, 1, 1))
+        self.assertEqual((result['total_appointments'], result['cancelled_appointments']), (2, 1))
+        self.assertEqual(async_to_sync(stats.adashboard_stats)(date(2025, 1, 1)), result)
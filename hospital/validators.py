@@ -0,0 +1,14 @@
+from django.core.exceptions import ValidationError
+
+# Rules shared by the signup forms and the CSV importer (hospital.imports)
+PASSWORD_MIN_LENGTH = 8
+
+
+def validate_mobile(value):
+    if len(str(value)) != 10:
+        raise ValidationError("Mobile number must be 10 digits")
+
+
+def validate_password(value):
+    if len(value) < PASSWORD_MIN_LENGTH:
+        raise ValidationError(f"Password must be at least {PASSWORD_MIN_LENGTH} characters")
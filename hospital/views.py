@@ -1,22 +1,35 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, logout, authenticate
-from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import User, Group
+from django.contrib.auth import login, logout
+from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, HttpResponse, JsonResponse, Http404, FileResponse
 from django.urls import reverse
-from datetime import datetime, date
+from datetime import date
 from .forms import (
     BaseUserForm, PatientForm, DoctorUserForm, DoctorForm, 
     AdminSigupForm, AppointmentForm, PatientAppointmentForm, 
-    DoctorScheduleForm, ContactusForm, AdminApprovalForm
+    DoctorScheduleForm, ContactusForm, AdminApprovalForm,
+    DoctorFilterForm, PatientFilterForm, AppointmentFilterForm, ExportForm, ImportForm, ReportForm
 )
-from .models import Doctor, Patient, Appointment, PatientDischargeDetails, AdminApproval
+from .models import Doctor, Patient, Appointment, PatientDischargeDetails, AdminApproval, ImportJob, departments
+from . import api, approvals, asyncdb, choices, derivatives, exports, images, imports, instrumentation, rollups, search
+from .hashers import LoginBusy, aauthenticate_bounded
+from .pagination import paginate
+from .fragments import acached_fragments, afragment_version, fragment_timeout
+from .roles import admin_required, aget_roles, dashboard_url_name, get_roles, login_required, remember_roles, resolve_roles
+from .routers import use_primary
+from .scheduling import SlotUnavailable, next_free_slots, reserve_slot
+from .stats import adashboard_stats, cancelled_appointments, counter_snapshot
 from django.utils import timezone
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_date, parse_time
+from django.utils.http import url_has_allowed_host_and_scheme
 
 # Create your views here.
 def home(request):
-    return render(request, 'hospital/index.html')
+    return render(request, 'hospital/index.html', {'roles': get_roles(request)})
 
 def aboutus(request):
     return render(request, 'hospital/aboutus.html')
@@ -33,22 +46,67 @@ def contactus(request):
     return render(request, 'hospital/contactus.html', {'form': form})
 
 # Authentication Views
-def patientlogin(request):
-    if request.method == 'POST':
-        username = request.POST.get('username')
-        password = request.POST.get('password')
-        user = authenticate(request, username=username, password=password)
-        if user is not None:
-            try:
-                patient = Patient.objects.get(user=user)
-                login(request, user)
-                request.session['alert_message'] = 'Login successful!'
-                return redirect('patient-dashboard')
-            except Patient.DoesNotExist:
-                request.session['alert_message'] = 'You are not registered as a patient.'
-        else:
-            request.session['alert_message'] = 'Invalid username or password.'
-    return render(request, 'hospital/patientlogin.html')
+def login_busy(request, template):
+    messages.error(request, 'Too many people are signing in right now. Please try again in a moment.')
+    response = render(request, template, status=503)
+    response['Retry-After'] = '5'
+    return response
+
+def _finish_login(request, template, user, role, refusal, destination):
+    """Everything after the password check, which reads roles and writes the session"""
+    if user is None:
+        messages.error(request, 'Invalid username or password.')
+        return render(request, template)
+    roles = resolve_roles(user.pk)
+    if role and not getattr(roles, role):
+        messages.error(request, refusal)
+        return render(request, template)
+    login(request, user)
+    remember_roles(request, roles)
+    next_url = request.POST.get('next') or request.GET.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+        return redirect(next_url)
+    if destination is None and roles.is_pending_admin and not roles.is_admin:
+        messages.success(request, 'Login successful! Your admin account is waiting for approval.')
+        return redirect('home')
+    messages.success(request, 'Login successful!')
+    return redirect(destination or dashboard_url_name(roles))
+
+async def _login(request, template, role=None, refusal=None, destination=None):
+    """
+    Shared login flow: one bounded password check, then one joined query for
+    every role of the user, which is kept in the session for later requests.
+    The check is awaited, so the worker serves other requests while it hashes.
+    role restricts the page to users with that Roles flag.
+    """
+    # Templates read the session and user, which must not load on the event loop
+    await aget_roles(request)
+    if request.method != 'POST':
+        return render(request, template, {'next': request.GET.get('next', '')})
+    try:
+        user = await aauthenticate_bounded(request, username=request.POST.get('username'),
+                                           password=request.POST.get('password'))
+    except LoginBusy:
+        return login_busy(request, template)
+    return await sync_to_async(_finish_login)(request, template, user, role, refusal, destination)
+
+async def login_view(request):
+    """One login page for every role; users land on their own dashboard"""
+    roles = await aget_roles(request)
+    if request.method == 'GET' and request.user.is_authenticated:
+        return redirect(dashboard_url_name(roles))
+    return await _login(request, 'hospital/universal_login.html')
+
+async def patientlogin(request):
+    return await _login(request, 'hospital/patientlogin.html', role='is_patient',
+                        refusal='You are not registered as a patient.', destination='patient-dashboard')
+
+async def doctorlogin(request):
+    return await _login(request, 'hospital/doctorlogin.html', role='is_doctor',
+                        refusal='You are not registered as a doctor.', destination='doctor-dashboard')
+
+async def adminlogin(request):
+    return await _login(request, 'hospital/adminlogin.html', destination='admin-dashboard')
 
 def patientsignup(request):
     if request.method == 'POST':
@@ -58,12 +116,15 @@ def patientsignup(request):
             user = user_form.save()
             patient = patient_form.save(commit=False)
             patient.user = user
+            # The picture is processed in the background by process_profile_images
+            upload = images.detach_upload(patient_form)
             patient.save()
+            images.stage_upload(patient, upload)
             login(request, user)
-            request.session['alert_message'] = 'Signup successful!'
+            messages.success(request, 'Signup successful!')
             return redirect('patient-dashboard')
         else:
-            request.session['alert_message'] = 'Please correct the errors below.'
+            messages.error(request, 'Please correct the errors below.')
     else:
         user_form = BaseUserForm()
         patient_form = PatientForm()
@@ -72,19 +133,6 @@ def patientsignup(request):
         'patientForm': patient_form
     })
 
-def adminlogin(request):
-    if request.method == 'POST':
-        username = request.POST.get('username')
-        password = request.POST.get('password')
-        user = authenticate(request, username=username, password=password)
-        if user is not None:
-            login(request, user)
-            request.session['alert_message'] = 'Login successful!'
-            return redirect('admin-dashboard')
-        else:
-            request.session['alert_message'] = 'Invalid username or password.'
-    return render(request, 'hospital/adminlogin.html')
-
 def adminsignup(request):
     if request.method == 'POST':
         form = AdminSigupForm(request.POST)
@@ -93,31 +141,14 @@ def adminsignup(request):
             # Create admin approval entry
             AdminApproval.objects.create(user=user, is_approved=False)
             login(request, user)
-            request.session['alert_message'] = 'Signup successful!'
+            messages.success(request, 'Signup successful!')
             return redirect('admin-dashboard')
         else:
-            request.session['alert_message'] = 'Please correct the errors below.'
+            messages.error(request, 'Please correct the errors below.')
     else:
         form = AdminSigupForm()
     return render(request, 'hospital/adminsignup.html', {'form': form})
 
-def doctorlogin(request):
-    if request.method == 'POST':
-        username = request.POST.get('username')
-        password = request.POST.get('password')
-        user = authenticate(request, username=username, password=password)
-        if user is not None:
-            try:
-                doctor = Doctor.objects.get(user=user)
-                login(request, user)
-                request.session['alert_message'] = 'Login successful!'
-                return redirect('doctor-dashboard')
-            except Doctor.DoesNotExist:
-                request.session['alert_message'] = 'You are not registered as a doctor.'
-        else:
-            request.session['alert_message'] = 'Invalid username or password.'
-    return render(request, 'hospital/doctorlogin.html')
-
 def doctorsignup(request):
     if request.method == 'POST':
         user_form = DoctorUserForm(request.POST)
@@ -126,12 +157,14 @@ def doctorsignup(request):
             user = user_form.save()
             doctor = doctor_form.save(commit=False)
             doctor.user = user
+            upload = images.detach_upload(doctor_form)
             doctor.save()
+            images.stage_upload(doctor, upload)
             login(request, user)
-            request.session['alert_message'] = 'Signup successful!'
+            messages.success(request, 'Signup successful!')
             return redirect('doctor-dashboard')
         else:
-            request.session['alert_message'] = 'Please correct the errors below.'
+            messages.error(request, 'Please correct the errors below.')
     else:
         user_form = DoctorUserForm()
         doctor_form = DoctorForm()
@@ -140,27 +173,46 @@ def doctorsignup(request):
         'doctorForm': doctor_form
     })
 
+# Dashboards
+def _fragment(version):
+    return {'version': version, 'timeout': fragment_timeout()}
+
+async def _arender(request, template, context):
+    """
+    render() for async views. Templates talk to the cache and to file storage
+    synchronously ({% cache %} blocks, {% profile_picture %} hashing the
+    picture), so the rendering runs off the event loop. Dashboards pass the
+    cached blocks they already looked up in context['cached']; each block
+    shows that copy when found, and otherwise renders from the rows the view
+    fetched and stores itself.
+    """
+    return await sync_to_async(render)(request, template, context)
+
 # Patient Views
 @login_required
-def patient_dashboard(request):
-    try:
-        patient = Patient.objects.get(user=request.user)
-        appointments = Appointment.objects.filter(patientId=patient.user.id).order_by('-createdDate')
-        
-        context = {
-            'patient': patient,
-            'appointments': appointments,
-        }
-        context['alert_message'] = request.session.pop('alert_message', None)
-        return render(request, 'hospital/patient_dashboard.html', context)
-    except Patient.DoesNotExist:
-        request.session['alert_message'] = 'Patient profile not found. Please contact support.'
-        return redirect('patientlogin')
-    except Exception as e:
-        # Fallback for any database field issues
-        request.session['alert_message'] = f'Error loading dashboard: {str(e)}'
+async def patient_dashboard(request):
+    patient = await Patient.objects.select_related('user').filter(user_id=request.user.pk).afirst()
+    if patient is None:
+        messages.error(request, 'Patient profile not found. Please contact support.')
         return redirect('patientlogin')
 
+    # Templates cannot query from async views, so fetch up front what the cached blocks lack
+    version = await afragment_version('patient', patient.id)
+    status, listing = await acached_fragments(('patient_status', patient.id, version),
+                                              ('patient_appointments', patient.id, version))
+    appointments = []
+    if status is None or listing is None:
+        appointments = [appointment async for appointment in
+                        patient.appointments.select_related('doctor__user').order_by('-createdDate')]
+
+    context = {
+        'patient': patient,
+        'appointments': appointments,
+        'frag': _fragment(version),
+        'cached': {'patient_status': status, 'patient_appointments': listing},
+    }
+    return await _arender(request, 'hospital/patient_dashboard.html', context)
+
 @login_required
 def book_appointment(request):
     try:
@@ -171,10 +223,7 @@ def book_appointment(request):
             
             if form.is_valid():
                 appointment = form.save(commit=False)
-                appointment.patientId = patient.user.id
-                appointment.patientName = patient.get_name
-                appointment.doctorId = form.cleaned_data['doctorId'].user.id
-                appointment.doctorName = form.cleaned_data['doctorId'].get_name
+                appointment.patient = patient
                 appointment.save()
                 
                 messages.success(request, 'Appointment booked successfully! Waiting for doctor approval.')
@@ -189,145 +238,200 @@ def book_appointment(request):
 
 # Admin Views
 @login_required
-def admin_dashboard(request):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or \
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    total_doctors = Doctor.objects.count()
-    total_patients = Patient.objects.count()
-    total_appointments = Appointment.objects.count()
-    pending_appointments = Appointment.objects.filter(status=False).count()
-    approved_appointments = Appointment.objects.filter(status=True).count()
-    # If you have a cancelled field, use it; otherwise, set to 0
-    cancelled_appointments = Appointment.objects.filter(status=False, appointmentDate__lt=date.today()).count()  # Example logic
-    pending_doctor_approvals = Doctor.objects.filter(is_approved=False).count()
-    pending_admin_approvals = AdminApproval.objects.filter(is_approved=False).count()
-    context = {
-        'total_doctors': total_doctors,
-        'total_patients': total_patients,
-        'total_appointments': total_appointments,
-        'pending_appointments': pending_appointments,
-        'approved_appointments': approved_appointments,
-        'cancelled_appointments': cancelled_appointments,
-        'pending_doctor_approvals': pending_doctor_approvals,
-        'pending_admin_approvals': pending_admin_approvals,
-    }
-    context['alert_message'] = request.session.pop('alert_message', None)
-    return render(request, 'hospital/admin_dashboard.html', context)
+@admin_required
+async def admin_dashboard(request):
+    today = date.today()
+    version = await afragment_version('dashboard')
+    cached, = await acached_fragments(('admin_dashboard_stats', version, today))
+    stats = None
+    # Only computed when the cached stats fragment has expired
+    if cached is None:
+        stats = await adashboard_stats(today)
+    return await _arender(request, 'hospital/admin_dashboard.html', {
+        'stats': stats, 'today': today, 'frag': _fragment(version), 'cached': {'admin_dashboard_stats': cached},
+    })
 
 @login_required
-def admin_doctors(request):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or 
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    
-    doctors = Doctor.objects.all().order_by('-id')
-    return render(request, 'hospital/admin_doctors.html', {'doctors': doctors})
+@admin_required
+async def admin_doctors(request):
+    filter_form = DoctorFilterForm(request.GET)
+    doctors = filter_form.filter_queryset(Doctor.objects.select_related('user'))
+    context, page = await asyncdb.gather(counter_snapshot, lambda: paginate(request, doctors, ['id']))
+    context.update({
+        'doctors': page,
+        'filter_form': filter_form,
+        'total_departments': len(departments),
+    })
+    return await _arender(request, 'hospital/admin_doctors.html', context)
 
 @login_required
-def admin_patients(request):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or 
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    
-    patients = Patient.objects.all().order_by('-id')
-    return render(request, 'hospital/admin_patients.html', {'patients': patients})
+@admin_required
+async def admin_patients(request):
+    filter_form = PatientFilterForm(request.GET)
+    patients = filter_form.filter_queryset(
+        Patient.objects.select_related('user', 'assignedDoctor__user')
+    )
+    context, page = await asyncdb.gather(counter_snapshot, lambda: paginate(request, patients, ['id']))
+    context.update({
+        'patients': page,
+        'filter_form': filter_form,
+    })
+    return await _arender(request, 'hospital/admin_patients.html', context)
 
 @login_required
-def admin_appointments(request):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or 
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    
-    appointments = Appointment.objects.all().order_by('-createdDate')
-    return render(request, 'hospital/admin_appointments.html', {'appointments': appointments})
+@admin_required
+async def admin_appointments(request):
+    filter_form = AppointmentFilterForm(request.GET)
+    appointments = filter_form.filter_queryset(
+        Appointment.objects.select_related('patient__user', 'doctor__user')
+    )
+    today = date.today()
+    context, cancelled, page = await asyncdb.gather(
+        counter_snapshot,
+        lambda: cancelled_appointments(today),
+        lambda: paginate(request, appointments, ['createdDate', 'id']),
+    )
+    context.update({
+        'cancelled_appointments': cancelled,
+        'appointments': page,
+        'filter_form': filter_form,
+        'export_formats': exports.available_formats(),
+    })
+    return await _arender(request, 'hospital/admin_appointments.html', context)
+
+@login_required
+@admin_required
+async def admin_reports(request):
+    """Workload and revenue from the daily rollups; never scans the appointment or discharge tables"""
+    form = ReportForm(request.GET)
+    date_from, date_to = form.date_range()
+    departments, doctors, daily, revenue, freshness = await asyncdb.gather(
+        lambda: rollups.department_workload(date_from, date_to),
+        lambda: rollups.doctor_workload(date_from, date_to),
+        lambda: rollups.daily_appointments(date_from, date_to),
+        lambda: rollups.department_revenue(date_from, date_to),
+        rollups.freshness,
+    )
+    return await _arender(request, 'hospital/admin_reports.html', {
+        'filter_form': form,
+        'date_from': date_from,
+        'date_to': date_to,
+        'departments': departments,
+        'doctors': doctors,
+        'daily': daily,
+        'busiest_day': max((row['appointments'] for row in daily), default=0),
+        'revenue': revenue,
+        'freshness': freshness,
+    })
 
+@use_primary
 @login_required
+@admin_required
 def admin_pending_approvals(request):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or 
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    
-    pending_doctors = Doctor.objects.filter(is_approved=False)
-    pending_admins = AdminApproval.objects.filter(is_approved=False)
+    pending_doctors = Doctor.objects.filter(is_approved=False).select_related('user').order_by('-id')
+    pending_admins = AdminApproval.objects.filter(is_approved=False).select_related('user').order_by('-id')
     
     context = {
         'pending_doctors': pending_doctors,
         'pending_admins': pending_admins,
     }
-    context['alert_message'] = request.session.pop('alert_message', None)
     return render(request, 'hospital/admin_pending_approvals.html', context)
 
+@use_primary
+@login_required
+@admin_required
+def bulk_pending_approvals(request):
+    """Approve or reject every doctor or admin ticked on the pending-approvals page"""
+    if request.method != 'POST':
+        return redirect('admin-pending-approvals')
+    kind = request.POST.get('kind')
+    action = request.POST.get('action')
+    ids = [int(value) for value in request.POST.getlist('ids') if value.isdigit()]
+    if kind not in ('doctor', 'admin') or action not in ('approve', 'reject') or not ids:
+        messages.error(request, 'Select at least one registration to approve or reject.')
+        return redirect('admin-pending-approvals')
+    if kind == 'admin' and not request.user.is_superuser:
+        messages.error(request, 'Access denied. Super admin privileges required.')
+        return redirect('admin-pending-approvals')
+
+    if kind == 'doctor':
+        if action == 'approve':
+            count = approvals.approve_doctors(ids, request.user)
+        else:
+            count = approvals.reject_doctors(ids)
+    else:
+        if action == 'approve':
+            count = approvals.approve_admins(ids, request.user)
+        else:
+            count = approvals.reject_admins(ids, keep_user=request.user)
+    verb = 'approved' if action == 'approve' else 'rejected and removed'
+    messages.success(request, f'{count} {kind}(s) {verb}.')
+    return redirect('admin-pending-approvals')
+
+def _requested_slot(request):
+    """Date and time posted by the approve forms, or None for anything unparseable"""
+    try:
+        appointment_date = parse_date(request.POST.get('appointment_date', ''))
+        appointment_time = parse_time(request.POST.get('appointment_time', ''))
+    except ValueError:
+        return None, None
+    return appointment_date, appointment_time
+
 # Admin Action Views
+@use_primary
 @login_required
+@admin_required
 def approve_appointment(request, appointment_id):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or \
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    appointment = get_object_or_404(
+        Appointment.objects.select_related('patient__user', 'doctor__user'), id=appointment_id
+    )
+    context = {
+        'appointment': appointment,
+        'today_date': date.today().isoformat(),
+    }
     if request.method == 'POST':
-        appointment_date = request.POST.get('appointment_date')
-        appointment_time = request.POST.get('appointment_time')
+        appointment_date, appointment_time = _requested_slot(request)
         if not appointment_date or not appointment_time:
-            request.session['alert_message'] = 'Appointment date and time are required.'
-            return render(request, 'hospital/approve_appointment.html', {
-                'appointment': appointment,
-                'today_date': date.today().isoformat()
-            })
-        appointment.appointmentDate = appointment_date
-        appointment.appointmentTime = appointment_time
-        appointment.status = True
-        appointment.save()
-        request.session['alert_message'] = f'Appointment for {appointment.patientName} approved and scheduled for {appointment_date} at {appointment_time}.'
-        return redirect('admin-appointments')
-    return render(request, 'hospital/approve_appointment.html', {
-        'appointment': appointment,
-        'today_date': date.today().isoformat()
-    })
+            context['error'] = 'Appointment date and time are required.'
+        elif appointment.doctor is None:
+            context['error'] = 'Assign a doctor to this appointment before scheduling it.'
+        else:
+            try:
+                reserve_slot(appointment, appointment.doctor, appointment_date, appointment_time, status=True)
+            except SlotUnavailable as e:
+                context['error'] = str(e)
+            else:
+                messages.success(request, f'Appointment for {appointment.patient_name} approved and scheduled for {appointment_date} at {appointment_time:%H:%M}.')
+                return redirect('admin-appointments')
+    if appointment.doctor is not None:
+        context['free_slots'] = next_free_slots(doctor=appointment.doctor)
+    return render(request, 'hospital/approve_appointment.html', context)
 
+@use_primary
 @login_required
+@admin_required
 def delete_appointment(request, appointment_id):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or 
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    
-    appointment = get_object_or_404(Appointment, id=appointment_id)
-    patient_name = appointment.patientName
+    appointment = get_object_or_404(Appointment.objects.select_related('patient__user'), id=appointment_id)
+    patient_name = appointment.patient_name
     appointment.delete()
     
     messages.success(request, f'Appointment for {patient_name} deleted successfully.')
     return redirect('admin-appointments')
 
+@use_primary
 @login_required
+@admin_required
 def approve_doctor(request, doctor_id):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or 
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    
-    doctor = get_object_or_404(Doctor, id=doctor_id)
-    doctor.is_approved = True
-    doctor.approved_by = request.user
-    doctor.approved_date = datetime.now()
-    doctor.save()
+    doctor = get_object_or_404(Doctor.objects.select_related('user'), id=doctor_id)
+    approvals.approve_doctors([doctor.id], request.user)
     
     messages.success(request, f'Doctor {doctor.get_name} approved successfully.')
     return redirect('admin-pending-approvals')
 
+@use_primary
 @login_required
+@admin_required
 def reject_doctor(request, doctor_id):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or 
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin privileges required.'
-        return redirect('home')
-    
     doctor = get_object_or_404(Doctor, id=doctor_id)
     doctor_name = doctor.get_name
     doctor.user.delete()  # This will cascade delete the doctor record
@@ -335,29 +439,25 @@ def reject_doctor(request, doctor_id):
     messages.success(request, f'Doctor {doctor_name} rejected and removed successfully.')
     return redirect('admin-pending-approvals')
 
+@use_primary
 @login_required
 def approve_admin(request, admin_id):
     if not request.user.is_superuser:
-        request.session['alert_message'] = 'Access denied. Super admin privileges required.'
+        messages.error(request, 'Access denied. Super admin privileges required.')
         return redirect('home')
     
-    admin_approval = get_object_or_404(AdminApproval, id=admin_id)
-    admin_approval.is_approved = True
-    admin_approval.approved_by = request.user
-    admin_approval.approved_date = datetime.now()
-    admin_approval.save()
-    
-    # Add user to Admin group
-    admin_group, created = Group.objects.get_or_create(name='Admin')
-    admin_approval.user.groups.add(admin_group)
+    admin_approval = get_object_or_404(AdminApproval.objects.select_related('user'), id=admin_id)
+    # Also adds the user to the Admin group
+    approvals.approve_admins([admin_approval.id], request.user)
     
     messages.success(request, f'Admin {admin_approval.user.get_full_name()} approved successfully.')
     return redirect('admin-pending-approvals')
 
+@use_primary
 @login_required
 def reject_admin(request, admin_id):
     if not request.user.is_superuser:
-        request.session['alert_message'] = 'Access denied. Super admin privileges required.'
+        messages.error(request, 'Access denied. Super admin privileges required.')
         return redirect('home')
     
     admin_approval = get_object_or_404(AdminApproval, id=admin_id)
@@ -367,134 +467,259 @@ def reject_admin(request, admin_id):
     messages.success(request, f'Admin {admin_name} rejected and removed successfully.')
     return redirect('admin-pending-approvals')
 
+@use_primary
 @login_required
 def approve_patient(request, patient_id):
-    if not (request.user.is_superuser or request.user.groups.filter(name='Admin').exists() or \
-            AdminApproval.objects.filter(user=request.user, is_approved=True).exists() or \
-            Doctor.objects.filter(user=request.user, is_approved=True).exists()):
-        request.session['alert_message'] = 'Access denied. Admin or Doctor privileges required.'
+    roles = get_roles(request)
+    if not (roles.is_admin or roles.is_approved_doctor):
+        messages.error(request, 'Access denied. Admin or Doctor privileges required.')
         return redirect('home')
     
-    patient = get_object_or_404(Patient, id=patient_id)
+    patient = get_object_or_404(Patient.objects.select_related('user', 'assignedDoctor__user'), id=patient_id)
     
     # Check if patient is already approved (using existing status field)
     if patient.status:
-        request.session['alert_message'] = f'Patient {patient.get_name} is already approved.'
+        messages.info(request, f'Patient {patient.get_name} is already approved.')
         return redirect('admin-dashboard')
     
+    # Doctors book into their own calendar, admins into the patient's assigned doctor's
+    doctor = getattr(request.user, 'doctor', None) or patient.assignedDoctor
+    context = {
+        'patient': patient,
+        'today_date': date.today().isoformat(),
+    }
     if request.method == 'POST':
-        appointment_date = request.POST.get('appointment_date')
-        appointment_time = request.POST.get('appointment_time')
+        appointment_date, appointment_time = _requested_slot(request)
         
         if not appointment_date or not appointment_time:
-            request.session['alert_message'] = 'Appointment date and time are required.'
-            return render(request, 'hospital/approve_patient.html', {
-                'patient': patient,
-                'today_date': date.today().isoformat()
-            })
-        
-        try:
-            # Set patient as approved using existing status field
-            patient.status = True
-            patient.save()
-            
-            # Create appointment
-            appointment = Appointment.objects.create(
-                patientId=patient.user.id,
-                doctorId=request.user.id if hasattr(request.user, 'doctor') else None,
-                patientName=patient.get_name,
-                doctorName=request.user.get_full_name(),
-                appointmentDate=appointment_date,
-                appointmentTime=appointment_time,
-                status=True
-            )
-            print(f"DEBUG: Created appointment for patient {patient.get_name()} on {appointment_date} at {appointment_time}")
-            if not appointment:
-                request.session['alert_message'] = 'Error: Appointment was not created.'
-                return render(request, 'hospital/approve_patient.html', {
-                    'patient': patient,
-                    'today_date': date.today().isoformat()
-                })
-            request.session['alert_message'] = f'Patient {patient.get_name} approved and appointment scheduled for {appointment_date} at {appointment_time}.'
-            return redirect('admin-dashboard')
-            
-        except Exception as e:
-            request.session['alert_message'] = f'Error approving patient: {str(e)}'
-            return render(request, 'hospital/approve_patient.html', {
-                'patient': patient,
-                'today_date': date.today().isoformat()
-            })
+            context['error'] = 'Appointment date and time are required.'
+        else:
+            try:
+                with transaction.atomic():
+                    # Set patient as approved using existing status field
+                    patient.status = True
+                    patient.save()
+                    
+                    appointment = Appointment(patient=patient, status=True)
+                    if doctor is not None:
+                        reserve_slot(appointment, doctor, appointment_date, appointment_time)
+                    else:
+                        appointment.appointmentDate = appointment_date
+                        appointment.appointmentTime = appointment_time
+                        appointment.save()
+            except SlotUnavailable as e:
+                patient.status = False
+                context['error'] = str(e)
+            else:
+                messages.success(request, f'Patient {patient.get_name} approved and appointment scheduled for {appointment_date} at {appointment_time:%H:%M}.')
+                return redirect('admin-dashboard')
     
-    return render(request, 'hospital/approve_patient.html', {
-        'patient': patient,
-        'today_date': date.today().isoformat()
-    })
+    if doctor is not None:
+        context['free_slots'] = next_free_slots(doctor=doctor)
+    return render(request, 'hospital/approve_patient.html', context)
 
 # Doctor Views
 @login_required
-def doctor_dashboard(request):
-    try:
-        doctor = Doctor.objects.get(user=request.user)
-        
-        # Get appointments for this doctor
-        appointments = Appointment.objects.filter(doctorId=doctor.user.id).order_by('-createdDate')
-        pending_appointments = appointments.filter(is_accepted_by_doctor=False)
-        accepted_appointments = appointments.filter(is_accepted_by_doctor=True)
-        
-        context = {
-            'doctor': doctor,
-            'appointments': appointments,
-            'pending_appointments': pending_appointments,
-            'accepted_appointments': accepted_appointments,
-        }
-        context['alert_message'] = request.session.pop('alert_message', None)
-        return render(request, 'hospital/doctor_dashboard.html', context)
-    except Doctor.DoesNotExist:
-        request.session['alert_message'] = 'Doctor profile not found. Please contact support.'
+async def doctor_dashboard(request):
+    doctor = await Doctor.objects.select_related('user').filter(user_id=request.user.pk).afirst()
+    if doctor is None:
+        messages.error(request, 'Doctor profile not found. Please contact support.')
         return redirect('doctorlogin')
 
+    # Get appointments for this doctor, unless their cached block is still fresh
+    version = await afragment_version('doctor', doctor.id)
+    cached, = await acached_fragments(('doctor_appointments', doctor.id, version))
+    appointments = []
+    if cached is None:
+        appointments = [appointment async for appointment in
+                        doctor.appointments.select_related('patient__user').order_by('-createdDate')]
+
+    context = {
+        'doctor': doctor,
+        'appointments': appointments,
+        'frag': _fragment(version),
+        'cached': {'doctor_appointments': cached},
+    }
+    return await _arender(request, 'hospital/doctor_dashboard.html', context)
+
+@use_primary
 @login_required
 def accept_appointment(request, appointment_id):
     try:
         doctor = Doctor.objects.get(user=request.user)
-        appointment = get_object_or_404(Appointment, id=appointment_id, doctorId=doctor.user.id)
+        appointment = get_object_or_404(
+            Appointment.objects.select_related('patient__user', 'doctor__user'), id=appointment_id, doctor=doctor
+        )
         
         if request.method == 'POST':
             form = DoctorScheduleForm(request.POST)
             if form.is_valid():
-                appointment.is_accepted_by_doctor = True
-                appointment.accepted_date = datetime.now()
-                appointment.doctor_scheduled_date = form.cleaned_data['doctor_scheduled_date']
-                appointment.doctor_scheduled_time = form.cleaned_data['doctor_scheduled_time']
-                appointment.save()
-                
-                messages.success(request, 'Appointment accepted and scheduled successfully.')
-                return redirect('doctor-dashboard')
+                scheduled_date = form.cleaned_data['doctor_scheduled_date']
+                scheduled_time = form.cleaned_data['doctor_scheduled_time']
+                try:
+                    # The doctor's choice becomes the booked slot
+                    reserve_slot(
+                        appointment, doctor, scheduled_date, scheduled_time,
+                        is_accepted_by_doctor=True,
+                        accepted_date=timezone.now(),
+                        doctor_scheduled_date=scheduled_date,
+                        doctor_scheduled_time=scheduled_time,
+                    )
+                except SlotUnavailable as e:
+                    messages.error(request, str(e))
+                else:
+                    messages.success(request, 'Appointment accepted and scheduled successfully.')
+                    return redirect('doctor-dashboard')
         else:
             form = DoctorScheduleForm()
         
         return render(request, 'hospital/schedule_appointment.html', {
             'form': form,
-            'appointment': appointment
+            'appointment': appointment,
+            'free_slots': next_free_slots(doctor=doctor),
         })
     except Doctor.DoesNotExist:
         messages.error(request, 'Doctor profile not found.')
         return redirect('home')
 
+@login_required
+def free_slots(request):
+    """Next free slots for ?doctor=<id> or ?department=<name>, as JSON"""
+    try:
+        count = min(max(int(request.GET.get('count', 5)), 1), 50)
+    except ValueError:
+        count = 5
+    doctor_id = request.GET.get('doctor')
+    if doctor_id:
+        try:
+            doctor_id = int(doctor_id)
+        except ValueError:
+            return JsonResponse({'error': 'doctor must be a number.'}, status=400)
+        doctor = get_object_or_404(Doctor.objects.select_related('user'), id=doctor_id, status=True, is_approved=True)
+        slots = next_free_slots(doctor=doctor, count=count)
+    else:
+        slots = next_free_slots(department=request.GET.get('department'), count=count)
+    return JsonResponse({'slots': [
+        {'date': day.isoformat(), 'time': at.strftime('%H:%M'), 'doctor_id': slot_doctor.id, 'doctor': slot_doctor.get_name}
+        for day, at, slot_doctor in slots
+    ]})
+
+@login_required
+def autocomplete_doctors(request):
+    """Bookable doctors matching ?q=, as JSON"""
+    return JsonResponse({'results': choices.search_doctors(request.GET.get('q', ''))})
+
+@login_required
+def autocomplete_patients(request):
+    """Active patients matching ?q=, as JSON; only staff may look patients up"""
+    roles = get_roles(request)
+    if not (roles.is_admin or roles.is_approved_doctor):
+        return JsonResponse({'error': 'Not allowed.'}, status=403)
+    return JsonResponse({'results': choices.search_patients(request.GET.get('q', ''))})
+
+@login_required
+@admin_required
+def site_search(request):
+    """Ranked matches for ?q= across doctors, patients and appointments, or one ?kind=, as JSON"""
+    kind = request.GET.get('kind') or None
+    if kind is not None and kind not in search.SOURCES:
+        return JsonResponse({'error': 'Unknown kind.'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return JsonResponse({'results': [
+        {'kind': kind, 'id': pk, 'title': title,
+         'url': reverse(f'admin:hospital_{search.SOURCES[kind][0]._meta.model_name}_change', args=[pk])}
+        for kind, pk, title in search.search(request.GET.get('q', ''), kind, limit)
+    ]})
+
+@login_required
+def profile_derivative(request, digest, size, ext):
+    """A resized profile picture; the URL holds the content hash, so it never changes"""
+    path = derivatives.ensure(digest, int(size), ext)
+    if path is None:
+        raise Http404('No such picture.')
+    response = FileResponse(open(path, 'rb'), content_type=derivatives.content_type(ext))
+    # Private: profile pictures belong to patients and staff, not shared caches
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@login_required
+@admin_required
+def export_data(request, dataset):
+    """Stream appointments or discharge billing as CSV, NDJSON or Parquet"""
+    if dataset not in exports.DATASETS:
+        raise Http404('No such export.')
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponse(form.errors.as_text(), status=400, content_type='text/plain; charset=utf-8')
+    data = form.cleaned_data
+    chunks = exports.export(dataset, data['format'], data['date_from'], data['date_to'], data['doctor'])
+    return exports.streaming_response(request, chunks, data['format'], f'{dataset}-{date.today().isoformat()}')
+
+# Bulk CSV imports
+@use_primary
+@login_required
+@admin_required
+def admin_import(request):
+    """Queue a CSV of patients, doctors or appointments for the import_records worker"""
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            job = imports.stage_upload(form.cleaned_data['kind'], form.cleaned_data['file'], request.user)
+            messages.success(request, f'{job.original_name} is queued as import {job.id}.')
+            return redirect('admin-import')
+    else:
+        form = ImportForm()
+    jobs = ImportJob.objects.select_related('created_by').order_by('-id')[:20]
+    return render(request, 'hospital/admin_import.html', {'form': form, 'jobs': jobs})
+
+@use_primary
+@login_required
+@admin_required
+def retry_import(request, job_id):
+    """Queue a failed import again; it resumes after its last committed batch"""
+    if request.method == 'POST':
+        if ImportJob.objects.filter(id=job_id, state=ImportJob.FAILED).update(state=ImportJob.PENDING):
+            messages.success(request, f'Import {job_id} is queued again.')
+    return redirect('admin-import')
+
+@login_required
+@admin_required
+def import_errors(request, job_id):
+    job = get_object_or_404(ImportJob, id=job_id)
+    try:
+        report = open(imports.error_report_path(job), 'rb')
+    except FileNotFoundError:
+        raise Http404('This import has no rejected rows.')
+    return FileResponse(report, as_attachment=True, filename=f'import-{job.id}-errors.csv',
+                        content_type='text/csv; charset=utf-8')
+
+# Versioned JSON API
+@api.api_view
+def api_list(request, resource):
+    """A page of doctors, patients, appointments or discharges the user may see"""
+    return api.list_response(request, resource)
+
+@api.api_view
+def api_detail(request, resource, pk):
+    return api.detail_response(request, resource, pk)
+
 # Role-based redirection views
 def admin_click(request):
     if request.user.is_authenticated:
-        return redirect('admin-dashboard')
+        return redirect(dashboard_url_name(get_roles(request)))
     return redirect('adminlogin')
 
 def doctor_click(request):
     if request.user.is_authenticated:
-        return redirect('doctor-dashboard')
+        return redirect(dashboard_url_name(get_roles(request)))
     return redirect('doctorlogin')
 
 def patient_click(request):
     if request.user.is_authenticated:
-        return redirect('patient-dashboard')
+        return redirect(dashboard_url_name(get_roles(request)))
     return redirect('patientlogin')
 
 # Logout view
@@ -502,4 +727,28 @@ def patient_click(request):
 def logout_view(request):
     logout(request)
     messages.success(request, 'You have been logged out successfully.')
-    return redirect('home')
\ No newline at end of file
+    return redirect('home')
+
+
+# Instrumentation
+def _metrics_allowed(request):
+    """Staff/admin sessions, or a scraper presenting HOSPITAL_METRICS_TOKEN"""
+    token = getattr(settings, 'HOSPITAL_METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        return True
+    return request.user.is_authenticated and (request.user.is_staff or get_roles(request).is_admin)
+
+def metrics(request):
+    if not instrumentation.is_enabled():
+        raise Http404
+    if not _metrics_allowed(request):
+        return HttpResponse(status=403)
+    return HttpResponse(instrumentation.registry.prometheus(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def slow_requests(request):
+    if not instrumentation.is_enabled():
+        raise Http404
+    if not _metrics_allowed(request):
+        return HttpResponse(status=403)
+    return JsonResponse({'slow_requests': instrumentation.registry.slow_log()})
@@ -11,8 +11,12 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 
+import django
+from django.core.exceptions import ImproperlyConfigured
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,7 +47,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so it times the whole stack; a no-op unless HOSPITAL_INSTRUMENTATION is set
+    'hospital.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Sends safe requests' reads to HOSPITAL_DB_REPLICAS; a no-op without replicas
+    'hospital.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,7 +64,8 @@ ROOT_URLCONF = 'hospital_management.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, plus render timing for the request instrumentation
+        'BACKEND': 'hospital.instrumentation.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +73,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'hospital.context_processors.alert_message',
             ],
         },
     },
@@ -75,11 +85,78 @@ WSGI_APPLICATION = 'hospital_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# HOSPITAL_DB_ENGINE picks sqlite (the default, tuned for concurrent
+# requests by hospital.database) or postgres. PostgreSQL connections are kept
+# open for HOSPITAL_DB_CONN_MAX_AGE seconds and health-checked before reuse;
+# on Django 5.1+ with psycopg 3, HOSPITAL_DB_POOL_MAX_SIZE > 0 switches to the
+# driver's connection pool instead.
+HOSPITAL_DB_ENGINE = os.environ.get('HOSPITAL_DB_ENGINE', 'sqlite')
+
+if HOSPITAL_DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('HOSPITAL_DB_NAME', 'hospital'),
+            'USER': os.environ.get('HOSPITAL_DB_USER', 'hospital'),
+            'PASSWORD': os.environ.get('HOSPITAL_DB_PASSWORD', ''),
+            'HOST': os.environ.get('HOSPITAL_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('HOSPITAL_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('HOSPITAL_DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('HOSPITAL_DB_CONNECT_TIMEOUT', '5')),
+            },
+        }
+    }
+    _pool_max_size = int(os.environ.get('HOSPITAL_DB_POOL_MAX_SIZE', '0'))
+    if _pool_max_size and django.VERSION >= (5, 1):
+        # The pool owns connection reuse, which Django requires CONN_MAX_AGE = 0 for
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('HOSPITAL_DB_POOL_MIN_SIZE', '2')),
+            'max_size': _pool_max_size,
+            'timeout': int(os.environ.get('HOSPITAL_DB_POOL_TIMEOUT', '10')),
+        }
+elif HOSPITAL_DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            # Stock backend, except transactions take the write lock up front
+            'ENGINE': 'hospital.backends.sqlite3',
+            'NAME': os.environ.get('HOSPITAL_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked"
+                'timeout': int(os.environ.get('HOSPITAL_DB_BUSY_TIMEOUT', '20')),
+            },
+        }
     }
+else:
+    raise ImproperlyConfigured('HOSPITAL_DB_ENGINE must be sqlite or postgres')
+
+# Read replicas: comma separated hosts (postgres) or database files (sqlite,
+# e.g. a copy kept fresh by refresh_sqlite_replicas for local testing).
+# hospital.routers sends safe requests' reads to them; writes, approval
+# flows and the same browser for HOSPITAL_READ_YOUR_WRITES_SECONDS after a
+# write stay on the primary.
+HOSPITAL_DB_REPLICAS = [replica.strip() for replica in os.environ.get('HOSPITAL_DB_REPLICAS', '').split(',') if replica.strip()]
+for _number, _replica in enumerate(HOSPITAL_DB_REPLICAS, start=1):
+    _replica_settings = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if HOSPITAL_DB_ENGINE == 'postgres':
+        _host, _, _port = _replica.partition(':')
+        _replica_settings.update(HOST=_host, PORT=_port or DATABASES['default']['PORT'])
+    else:
+        _replica_settings['NAME'] = _replica
+    DATABASES[f'replica{_number}'] = _replica_settings
+DATABASE_ROUTERS = ['hospital.routers.PrimaryReplicaRouter']
+HOSPITAL_READ_YOUR_WRITES_SECONDS = int(os.environ.get('HOSPITAL_READ_YOUR_WRITES_SECONDS', '10'))
+
+# Pragmas hospital.database applies to every new SQLite connection
+HOSPITAL_SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('HOSPITAL_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': 'normal',
+    'busy_timeout': int(os.environ.get('HOSPITAL_DB_BUSY_TIMEOUT', '20')) * 1000,
+    'temp_store': 'memory',
+    'cache_size': -20000,  # KiB
+    'mmap_size': 128 * 1024 * 1024,
 }
 
 
@@ -102,6 +179,57 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Sessions and flash messages. Alerts travel in a signed cookie through the
+# messages framework, so showing one never writes the session. The session
+# engine is picked by HOSPITAL_SESSION_ENGINE: cached_db (reads from the cache,
+# writes through to the database), cache, signed_cookies or db.
+_SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+HOSPITAL_SESSION_ENGINE = os.environ.get('HOSPITAL_SESSION_ENGINE', 'cached_db')
+if HOSPITAL_SESSION_ENGINE not in _SESSION_ENGINES:
+    raise ImproperlyConfigured(f'HOSPITAL_SESSION_ENGINE must be one of {", ".join(_SESSION_ENGINES)}')
+SESSION_ENGINE = _SESSION_ENGINES[HOSPITAL_SESSION_ENGINE]
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# login_required sends anonymous users to the unified login page
+LOGIN_URL = 'login'
+
+# Password hashing. HOSPITAL_PASSWORD_HASHER picks the hasher for new and
+# upgraded passwords: argon2 (the default, from argon2-cffi in requirements.txt;
+# scrypt where it is not installed), scrypt or pbkdf2. The others
+# stay listed so existing hashes keep verifying; Django rehashes them with the
+# preferred one when their owner next logs in.
+_PASSWORD_HASHERS = {
+    'argon2': 'hospital.hashers.Argon2PasswordHasher',
+    'scrypt': 'hospital.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+HOSPITAL_PASSWORD_HASHER = os.environ.get(
+    'HOSPITAL_PASSWORD_HASHER', 'argon2' if importlib.util.find_spec('argon2') else 'scrypt')
+if HOSPITAL_PASSWORD_HASHER not in _PASSWORD_HASHERS:
+    raise ImproperlyConfigured(f'HOSPITAL_PASSWORD_HASHER must be one of {", ".join(_PASSWORD_HASHERS)}')
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[HOSPITAL_PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != HOSPITAL_PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+HOSPITAL_ARGON2_TIME_COST = int(os.environ.get('HOSPITAL_ARGON2_TIME_COST', '2'))
+HOSPITAL_ARGON2_MEMORY_COST = int(os.environ.get('HOSPITAL_ARGON2_MEMORY_COST', '102400'))  # KiB
+HOSPITAL_ARGON2_PARALLELISM = int(os.environ.get('HOSPITAL_ARGON2_PARALLELISM', '8'))
+HOSPITAL_SCRYPT_WORK_FACTOR = int(os.environ.get('HOSPITAL_SCRYPT_WORK_FACTOR', str(2 ** 14)))
+
+# Login hashing runs on a bounded thread pool (hospital.hashers): at most
+# HOSPITAL_LOGIN_HASH_THREADS hashes at once (0 means one per CPU), and
+# logins beyond HOSPITAL_LOGIN_HASH_QUEUE waiting are turned away
+HOSPITAL_LOGIN_HASH_THREADS = int(os.environ.get('HOSPITAL_LOGIN_HASH_THREADS', '0'))
+HOSPITAL_LOGIN_HASH_QUEUE = int(os.environ.get('HOSPITAL_LOGIN_HASH_QUEUE', '64'))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -124,6 +252,41 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, "static"),]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Profile picture uploads wait here, outside MEDIA_ROOT, until the
+# process_profile_images command has validated and re-encoded them
+HOSPITAL_UPLOAD_STAGING_ROOT = os.environ.get('HOSPITAL_UPLOAD_STAGING_ROOT', os.path.join(BASE_DIR, 'uploads-staging'))
+HOSPITAL_MAX_UPLOAD_BYTES = int(os.environ.get('HOSPITAL_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+HOSPITAL_PROFILE_IMAGE_SIZE = int(os.environ.get('HOSPITAL_PROFILE_IMAGE_SIZE', '1024'))
+HOSPITAL_PROFILE_THUMBNAIL_SIZE = int(os.environ.get('HOSPITAL_PROFILE_THUMBNAIL_SIZE', '160'))
+HOSPITAL_PROFILE_IMAGE_QUALITY = int(os.environ.get('HOSPITAL_PROFILE_IMAGE_QUALITY', '85'))
+
+# Content-hashed resized copies of profile pictures (hospital.derivatives)
+HOSPITAL_DERIVATIVE_ROOT = os.environ.get('HOSPITAL_DERIVATIVE_ROOT', os.path.join(MEDIA_ROOT, 'derivatives'))
+
+# Rows the streaming exports fetch per database round trip; also the size of
+# each CSV/NDJSON write and Parquet row group (hospital.exports). Parquet is
+# offered only where pyarrow from requirements-optional.txt is installed
+HOSPITAL_EXPORT_CHUNK_SIZE = int(os.environ.get('HOSPITAL_EXPORT_CHUNK_SIZE', '2000'))
+
+# CSV rows validated, hashed and inserted per transaction by the bulk imports;
+# also how far a failed import rolls back before it resumes (hospital.imports)
+HOSPITAL_IMPORT_BATCH_SIZE = int(os.environ.get('HOSPITAL_IMPORT_BATCH_SIZE', '500'))
+
+# Daily room charge and doctor fee billed for a discharge, by the department of
+# the patient's assigned doctor (hospital.billing); other patients pay the default
+HOSPITAL_BILLING_TARIFFS = {
+    'Cardiologist': {'room': 2500, 'doctor_fee': 1200},
+    'Dermatologists': {'room': 1200, 'doctor_fee': 600},
+    'Emergency Medicine Specialists': {'room': 3000, 'doctor_fee': 1500},
+    'Allergists/Immunologists': {'room': 1500, 'doctor_fee': 700},
+    'Anesthesiologists': {'room': 2000, 'doctor_fee': 1000},
+    'Colon and Rectal Surgeons': {'room': 2800, 'doctor_fee': 1400},
+}
+HOSPITAL_BILLING_DEFAULT_TARIFF = {'room': 1500, 'doctor_fee': 800}
+# Discharges computed and written back per transaction; each batch is billed as
+# whole columns where numpy from requirements-optional.txt is installed
+HOSPITAL_BILLING_BATCH_SIZE = int(os.environ.get('HOSPITAL_BILLING_BATCH_SIZE', '5000'))
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
@@ -131,3 +294,53 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Cache used for role lookups, booked slots and dashboard fragments.
+# HOSPITAL_CACHE_BACKEND picks locmem (per process, the default), file
+# (shared by the workers on one host) or redis (any Redis-compatible
+# server; needs the redis package). locmem cannot see invalidations made by
+# other processes, so multi-worker deployments should use file or redis.
+HOSPITAL_CACHE_BACKEND = os.environ.get('HOSPITAL_CACHE_BACKEND', 'locmem')
+HOSPITAL_CACHE_LOCATION = os.environ.get('HOSPITAL_CACHE_LOCATION', '')
+
+if HOSPITAL_CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': HOSPITAL_CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+            'KEY_PREFIX': 'hospital',
+        }
+    }
+elif HOSPITAL_CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': HOSPITAL_CACHE_LOCATION or os.path.join(BASE_DIR, '.cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': HOSPITAL_CACHE_LOCATION or 'hospital',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Seconds a rendered dashboard fragment may be served; signals invalidate
+# them sooner whenever the underlying rows change
+HOSPITAL_FRAGMENT_TIMEOUT = int(os.environ.get('HOSPITAL_FRAGMENT_TIMEOUT', '600'))
+
+# Seconds the doctor select choices stay cached; signals clear them on
+# approvals, status changes and renames. Patients are looked up in the database
+HOSPITAL_CHOICES_TIMEOUT = int(os.environ.get('HOSPITAL_CHOICES_TIMEOUT', '3600'))
+
+
+# Request instrumentation: per-view timings served at /metrics/ (Prometheus
+# text format) and a rolling log of slow requests at /metrics/slow/
+HOSPITAL_INSTRUMENTATION = os.environ.get('HOSPITAL_INSTRUMENTATION', '') == '1'
+HOSPITAL_SLOW_REQUEST_MS = int(os.environ.get('HOSPITAL_SLOW_REQUEST_MS', '500'))
+HOSPITAL_SLOW_REQUEST_LOG_SIZE = 100
+HOSPITAL_METRICS_TOKEN = os.environ.get('HOSPITAL_METRICS_TOKEN', '')
@@ -15,7 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from hospital import views
 from django.conf import settings
 from django.conf.urls.static import static
@@ -37,7 +37,9 @@ urlpatterns = [
     path('admin-doctors/', views.admin_doctors, name='admin-doctors'),
     path('admin-patients/', views.admin_patients, name='admin-patients'),
     path('admin-appointments/', views.admin_appointments, name='admin-appointments'),
+    path('admin-reports/', views.admin_reports, name='admin-reports'),
     path('admin-pending-approvals/', views.admin_pending_approvals, name='admin-pending-approvals'),
+    path('admin-pending-approvals/bulk/', views.bulk_pending_approvals, name='bulk-pending-approvals'),
     
     # Admin approval actions
     path('approve-appointment/<int:appointment_id>/', views.approve_appointment, name='approve-appointment'),
@@ -52,6 +54,23 @@ urlpatterns = [
     path('doctorsignup/', views.doctorsignup, name='doctorsignup'),
     path('doctor-dashboard/', views.doctor_dashboard, name='doctor-dashboard'),
     path('accept-appointment/<int:appointment_id>/', views.accept_appointment, name='accept-appointment'),
+    path('free-slots/', views.free_slots, name='free-slots'),
+    path('autocomplete/doctors/', views.autocomplete_doctors, name='autocomplete-doctors'),
+    path('autocomplete/patients/', views.autocomplete_patients, name='autocomplete-patients'),
+    path('search/', views.site_search, name='search'),
+    re_path(r'^derivatives/(?P<digest>[0-9a-f]{20})-(?P<size>[0-9]+)\.(?P<ext>webp|jpg)$', views.profile_derivative, name='profile-derivative'),
+    
+    # Streaming exports
+    path('export/<slug:dataset>/', views.export_data, name='export-data'),
+    
+    # Bulk CSV imports
+    path('admin-import/', views.admin_import, name='admin-import'),
+    path('admin-import/<int:job_id>/retry/', views.retry_import, name='retry-import'),
+    path('admin-import/<int:job_id>/errors/', views.import_errors, name='import-errors'),
+    
+    # JSON API
+    path('api/v1/<slug:resource>/', views.api_list, name='api-list'),
+    path('api/v1/<slug:resource>/<int:pk>/', views.api_detail, name='api-detail'),
     
     # Role-based redirection
     path('adminclick/', views.admin_click, name='admin-click'),
@@ -60,9 +79,14 @@ urlpatterns = [
     
     # Logout
     path('logout/', views.logout_view, name='logout'),
+    path('login/', views.login_view, name='login'),
     path('patientlogin/', views.patientlogin, name='patientlogin'),
     path('adminlogin/', views.adminlogin, name='adminlogin'),
     path('doctorlogin/', views.doctorlogin, name='doctorlogin'),
+
+    # Instrumentation (only served when HOSPITAL_INSTRUMENTATION is on)
+    path('metrics/', views.metrics, name='metrics'),
+    path('metrics/slow/', views.slow_requests, name='slow-requests'),
 ]
 
 # Add static files serving during development
@@ -0,0 +1,34 @@
+// Search box for <select data-autocomplete-url="...">: options are fetched
+// from the JSON endpoint as the user types instead of rendered inline.
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('select[data-autocomplete-url]').forEach(function (select) {
+    var search = document.createElement('input');
+    search.type = 'search';
+    search.placeholder = 'Type a name to search';
+    search.className = select.className;
+    select.parentNode.insertBefore(search, select);
+
+    var placeholder = select.options.length ? select.options[0].text : '';
+    var timer = null;
+
+    function fill(results) {
+      var current = select.value;
+      select.innerHTML = '';
+      select.add(new Option(placeholder, ''));
+      results.forEach(function (result) {
+        var value = String(result.id);
+        select.add(new Option(result.text, value, false, value === current));
+      });
+    }
+
+    search.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var url = select.dataset.autocompleteUrl + '?q=' + encodeURIComponent(search.value.trim());
+        fetch(url, {credentials: 'same-origin'})
+          .then(function (response) { return response.ok ? response.json() : {results: []}; })
+          .then(function (data) { fill(data.results); });
+      }, 250);
+    });
+  });
+});
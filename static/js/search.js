@@ -0,0 +1,36 @@
+// Suggestions for <input data-search-url="..." data-search-kind="...">: the
+// best matches from the search endpoint are offered as the user types.
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('input[data-search-url]').forEach(function (input, index) {
+    var list = document.createElement('datalist');
+    list.id = 'search-suggestions-' + index;
+    input.parentNode.appendChild(list);
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+
+    var timer = null;
+
+    function fill(results) {
+      list.innerHTML = '';
+      results.forEach(function (result) {
+        list.appendChild(new Option(result.title));
+      });
+    }
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      var query = input.value.trim();
+      if (query.length < 2) {
+        fill([]);
+        return;
+      }
+      timer = setTimeout(function () {
+        var url = input.dataset.searchUrl + '?q=' + encodeURIComponent(query) +
+          '&kind=' + encodeURIComponent(input.dataset.searchKind || '');
+        fetch(url, {credentials: 'same-origin'})
+          .then(function (response) { return response.ok ? response.json() : {results: []}; })
+          .then(function (data) { fill(data.results); });
+      }, 250);
+    });
+  });
+});